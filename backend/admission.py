@@ -0,0 +1,274 @@
+"""
+Admission control and per-client rate limiting for the chat routes
+Two independent guards, both rejecting fast instead of letting requests
+pile up:
+
+- AdmissionGate bounds model calls in flight (LLM_MAX_IN_FLIGHT) per worker
+  process. Up to LLM_MAX_QUEUE more requests wait, for at most
+  LLM_QUEUE_TIMEOUT seconds; beyond that requests are turned away at once
+  with a 503.
+- Token buckets limit each client (IP address) to RATE_LIMIT_RATE chat
+  requests a second with bursts of RATE_LIMIT_BURST, answering 429 when the
+  bucket is empty. RATE_LIMIT_BACKEND picks an in-process store ('memory')
+  or a MongoDB collection every worker shares ('mongo'); RATE_LIMIT_RATE=0
+  turns limiting off. When MongoDB doesn't answer within
+  RATE_LIMIT_TIMEOUT_MS, requests are let through unlimited rather than
+  failed.
+
+Behind reverse proxies, set RATE_LIMIT_TRUST_PROXY to how many of them sit in
+front of the app (1 for a single load balancer). Clients are then told apart
+by the X-Forwarded-For entry the outermost trusted proxy added; entries to
+its left come from the client and are ignored.
+"""
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from prometheus_client import Counter, Gauge
+import pymongo
+from pymongo import ReturnDocument
+
+LLM_MAX_IN_FLIGHT = int(os.getenv('LLM_MAX_IN_FLIGHT', '16'))
+LLM_MAX_QUEUE = int(os.getenv('LLM_MAX_QUEUE', '32'))
+LLM_QUEUE_TIMEOUT = float(os.getenv('LLM_QUEUE_TIMEOUT', '5'))
+
+RATE_LIMIT_RATE = float(os.getenv('RATE_LIMIT_RATE', '1'))
+RATE_LIMIT_BURST = float(os.getenv('RATE_LIMIT_BURST', '10'))
+# Reverse proxies in front of the app, each appending to X-Forwarded-For
+RATE_LIMIT_TRUST_PROXY = int(os.getenv('RATE_LIMIT_TRUST_PROXY', '0'))
+# Longest a shared bucket lookup may take before the request is let through
+RATE_LIMIT_TIMEOUT = int(os.getenv('RATE_LIMIT_TIMEOUT_MS', '500')) / 1000
+# Clients tracked in memory before the least recently seen one is dropped
+RATE_LIMIT_MAX_CLIENTS = 100000
+
+OVERLOADED_MESSAGE = "We're getting a lot of requests right now. Please try again in a few seconds."
+RATE_LIMITED_MESSAGE = "You're sending messages faster than we can answer them. Please wait a moment and try again."
+
+REJECTIONS = Counter('dwed_rejections', 'Requests turned away by admission control or rate limiting', ['reason'])
+LLM_IN_FLIGHT = Gauge('dwed_llm_in_flight', 'Model calls in flight in this process', multiprocess_mode='livesum')
+LLM_QUEUED = Gauge(
+    'dwed_llm_queued', 'Requests waiting for a model call slot in this process', multiprocess_mode='livesum'
+)
+
+
+class Rejected(Exception):
+    """A request turned away before doing any work; carries its HTTP status and Retry-After."""
+
+    def __init__(self, message, status, retry_after, reason):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+        self.reason = reason
+
+    def body(self):
+        return {'error': str(self), 'retry_after': self.retry_after}
+
+
+class AdmissionGate:
+    """Bounded concurrency with a bounded, time-limited wait queue."""
+
+    def __init__(self, max_in_flight=LLM_MAX_IN_FLIGHT, max_queue=LLM_MAX_QUEUE, queue_timeout=LLM_QUEUE_TIMEOUT):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.reset()
+
+    def reset(self):
+        """Start empty with fresh locks (used in forked workers)."""
+        self._condition = threading.Condition()
+        self._in_flight = 0
+        self._waiting = 0
+        self._async_condition = None
+
+    def _reject(self, reason):
+        REJECTIONS.labels(reason).inc()
+        return Rejected(OVERLOADED_MESSAGE, 503, max(1, int(self.queue_timeout)), reason)
+
+    def _admit(self):
+        self._in_flight += 1
+        LLM_IN_FLIGHT.set(self._in_flight)
+
+    def _leave(self):
+        self._in_flight -= 1
+        LLM_IN_FLIGHT.set(self._in_flight)
+
+    def acquire(self):
+        """Take a slot, waiting in the queue if needed; raises Rejected when full or timed out."""
+        with self._condition:
+            if self._in_flight < self.max_in_flight:
+                self._admit()
+                return
+            if self._waiting >= self.max_queue:
+                raise self._reject('queue_full')
+            self._waiting += 1
+            LLM_QUEUED.set(self._waiting)
+            try:
+                admitted = self._condition.wait_for(lambda: self._in_flight < self.max_in_flight, self.queue_timeout)
+            finally:
+                self._waiting -= 1
+                LLM_QUEUED.set(self._waiting)
+            if not admitted:
+                raise self._reject('queue_timeout')
+            self._admit()
+
+    def release(self):
+        with self._condition:
+            self._leave()
+            self._condition.notify()
+
+    async def acquire_async(self):
+        """acquire() for the event loop; waiting doesn't block it."""
+        if self._async_condition is None:
+            self._async_condition = asyncio.Condition()
+        condition = self._async_condition
+        async with condition:
+            if self._in_flight < self.max_in_flight:
+                self._admit()
+                return
+            if self._waiting >= self.max_queue:
+                raise self._reject('queue_full')
+            self._waiting += 1
+            LLM_QUEUED.set(self._waiting)
+            try:
+                await asyncio.wait_for(
+                    condition.wait_for(lambda: self._in_flight < self.max_in_flight), self.queue_timeout
+                )
+            except asyncio.TimeoutError:
+                raise self._reject('queue_timeout')
+            finally:
+                self._waiting -= 1
+                LLM_QUEUED.set(self._waiting)
+            self._admit()
+
+    async def release_async(self):
+        async with self._async_condition:
+            self._leave()
+            self._async_condition.notify()
+
+    def call(self, produce):
+        """produce() run in a slot."""
+        self.acquire()
+        try:
+            return produce()
+        finally:
+            self.release()
+
+    async def call_async(self, produce):
+        """await produce() run in a slot."""
+        await self.acquire_async()
+        try:
+            return await produce()
+        finally:
+            await self.release_async()
+
+
+# ---- Per-client token buckets ----
+
+def _retry_after(tokens, rate):
+    # Whole seconds until the bucket holds a token again
+    return max(1, math.ceil((1 - tokens) / rate))
+
+
+class MemoryRateLimiter:
+    """Token buckets in this process, least recently seen clients dropped first."""
+
+    def __init__(self, rate=RATE_LIMIT_RATE, burst=RATE_LIMIT_BURST, max_clients=RATE_LIMIT_MAX_CLIENTS):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()  # client -> (tokens, updated)
+        self._lock = threading.Lock()
+
+    def take(self, client):
+        """Spend a token for client; returns None if allowed, else seconds until the next one."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[client] = (tokens, now)
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        return None if allowed else _retry_after(tokens, self.rate)
+
+
+class MongoRateLimiter:
+    """Token buckets in a MongoDB collection so every worker shares each client's limit.
+
+    Refill and spend happen in one pipeline update, so concurrent requests
+    from different workers can't both take the last token.
+    """
+
+    def __init__(self, collection, rate=RATE_LIMIT_RATE, burst=RATE_LIMIT_BURST, timeout=RATE_LIMIT_TIMEOUT):
+        # Full buckets expire through the TTL index in indexes.STORE_INDEXES
+        self.collection = collection
+        self.rate = rate
+        self.burst = burst
+        self.timeout = timeout
+
+    def take(self, client):
+        now = time.time()
+        refilled = {'$min': [self.burst, {'$add': [
+            {'$ifNull': ['$tokens', self.burst]},
+            {'$multiply': [{'$subtract': [now, {'$ifNull': ['$updated', now]}]}, self.rate]},
+        ]}]}
+        # Bounds server selection too, so an outage fails open quickly instead of stalling every request
+        with pymongo.timeout(self.timeout):
+            bucket = self.collection.find_one_and_update(
+                {'_id': client},
+                [
+                    {'$set': {'tokens': refilled, 'updated': now}},
+                    {'$set': {
+                        'allowed': {'$gte': ['$tokens', 1]},
+                        'tokens': {'$cond': [{'$gte': ['$tokens', 1]}, {'$subtract': ['$tokens', 1]}, '$tokens']},
+                        'expires_at': datetime.now(timezone.utc) + timedelta(seconds=self.burst / self.rate),
+                    }},
+                ],
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        return None if bucket['allowed'] else _retry_after(bucket['tokens'], self.rate)
+
+
+def create_rate_limiter(rate_limits_collection):
+    """Build the limiter selected by RATE_LIMIT_BACKEND ('memory' or 'mongo'), or None when off."""
+    if RATE_LIMIT_RATE <= 0:
+        return None
+    backend = os.getenv('RATE_LIMIT_BACKEND', 'memory').lower()
+    if backend == 'mongo':
+        return MongoRateLimiter(rate_limits_collection)
+    if backend != 'memory':
+        raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {backend}")
+    return MemoryRateLimiter()
+
+
+def client_address(request):
+    """The address a request's rate limit is counted against."""
+    if RATE_LIMIT_TRUST_PROXY:
+        hops = [hop.strip() for hop in request.headers.get('X-Forwarded-For', '').split(',')]
+        # Each trusted proxy appended one entry; anything further left is the client's to forge
+        if len(hops) >= RATE_LIMIT_TRUST_PROXY and hops[-RATE_LIMIT_TRUST_PROXY]:
+            return hops[-RATE_LIMIT_TRUST_PROXY]
+    return request.remote_addr or 'unknown'
+
+
+def check_rate_limit(limiter, client):
+    """Raise Rejected (429) when client has no tokens left."""
+    if limiter is None:
+        return
+    retry_after = limiter.take(client)
+    if retry_after is not None:
+        REJECTIONS.labels('rate_limited').inc()
+        raise Rejected(RATE_LIMITED_MESSAGE, 429, retry_after, 'rate_limited')
+
+
+# Shared by every chat request in the process
+llm_gate = AdmissionGate()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=llm_gate.reset)
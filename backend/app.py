@@ -1,361 +1,291 @@
-from flask import Flask, jsonify, request
+import time
+# Set before the imports below, so the startup report includes them
+_import_started = time.perf_counter()
+
+from flask import Blueprint, Flask, Response, jsonify, request, g, stream_with_context
 from flask_cors import CORS
 import os
-import google.generativeai as genai
-import pymongo
 from dotenv import load_dotenv
-from bson.objectid import ObjectId
-import json
-from datetime import datetime
+from pymongo.errors import PyMongoError
+from search import decode_cursor, page_size, InvalidCursor
+from json_provider import FastJSONProvider
+from tasks import content_parts
+import tasks
+import metrics
+from metrics import span
+from resilience import LLM_DEADLINE, llm_calls
+from reply_cache import reply_cache
+from admission import Rejected, check_rate_limit, client_address, llm_gate
+from resources import resources
+import chat_core
+from chat_core import StreamedReply
 
 # Load environment variables
 load_dotenv()
 
-# Database Setup
-MONGO_URI = os.getenv('MONGO_URI')
-client = pymongo.MongoClient(MONGO_URI)
-db = client['venue_db']
-venues_collection = db['venues']
-event_planners_collection = db['event_planners']
-conversations_collection = db['conversations']
-
-# Initialize Flask
-app = Flask(__name__)
-CORS(app)
-
-# Store conversation history in memory for this session
-conversation_history = []
-
-def get_event_planners_response(query=None):
-    try:
-        # Query MongoDB
-        mongo_query = query if query else {}
-        planners = list(event_planners_collection.find(mongo_query))
-
-        # Convert ObjectId to string for JSON serialization
-        for planner in planners:
-            planner["_id"] = str(planner["_id"])
+# Every route; create_app() registers it on a new Flask app
+api = Blueprint('api', __name__)
 
-        if not planners:
-            return "I couldn't find any event planners matching your criteria. Would you like to see all available event planners?"
+# create_app() connects to MongoDB and builds the chat model up front; with
+# WARM_UP=0 (or warm_up=False) both wait until a request needs them
+WARM_UP = os.getenv('WARM_UP', '1') != '0'
 
-        # Format response
-        response = "Here are some event planners that might interest you:\n\n"
+RATE_LIMITED_ENDPOINTS = {'api.chat', 'api.chat_stream'}
 
-        for planner in planners:
-            response += f"🎯 {planner['name']} ({planner['city']})\n"
-            response += f"⭐ Rating: {planner['rating']}/5.0 | Experience: {planner['experience_years']} years\n\n"
-            response += "Services include:\n"
+def respond(body, status=200, headers=None):
+    return jsonify(body), status, headers or {}
 
-            # Add a sample of services from each category
-            for category, services in planner['services'].items():
-                category_name = category.replace('_', ' ').title()
-                response += f"- {category_name}: {', '.join(services[:2])}...\n"
+def get_session_id():
+    return chat_core.get_session_id(request, g)
 
-            response += f"\n📞 Contact: {planner['contact']['phone']}\n"
-            response += f"📧 Email: {planner['contact']['email']}\n"
-            response += "\n---\n\n"
-
-        response += "Would you like more specific information about any of these planners or their services?"
-        return response
-    except Exception as e:
-        print(f"Error in get_event_planners_response: {str(e)}")
-        return "I encountered an error while fetching event planner information. Please try again."
+@api.before_app_request
+def start_timing():
+    g.request_started = metrics.start_request()
 
-@app.route('/', methods=['GET'])
+@api.before_app_request
+def limit_chat_rate():
+    if request.endpoint in RATE_LIMITED_ENDPOINTS:
+        try:
+            check_rate_limit(resources.rate_limiter, client_address(request))
+        except Rejected as e:
+            return respond(*chat_core.rejection(e))
+        except PyMongoError as e:
+            # Fail open: an unreachable limits store shouldn't take the chat down with it
+            print(f"Error checking rate limit: {str(e)}")
+
+@api.after_app_request
+def record_timing(response):
+    # Per-route latency, plus this request's stages in a Server-Timing header
+    rule = request.url_rule.rule if request.url_rule else None
+    return metrics.finish_request(response, request.method, rule, g.pop('request_started', None))
+
+@api.after_app_request
+def send_session_id(response):
+    return chat_core.send_session_id(response, g)
+
+def search(kind, filters, after=None, limit=None):
+    find = resources.catalog.find_venues if kind == 'venues' else resources.catalog.find_planners
+    return find(filters, after, limit) if limit else find(filters, after)
+
+def task_payload(task, source):
+    """Run a find_venue / find_planner task and return its response body, or None for other replies."""
+    found = chat_core.task_search(task)
+    if found is None:
+        return None
+    kind, filters = found
+    return chat_core.search_body(kind, *search(kind, filters), source=source)
+
+def reply_payload(task, response_text):
+    """Body for a finished Gemini reply: search results for a task, else the text."""
+    payload = task_payload(task, source=chat_core.LLM_BACKEND) or chat_core.text_body(response_text)
+    metrics.count_response(payload)
+    return payload
+
+def answer_locally(session_id, user_turn):
+    """Fast path for formulaic searches; returns the response body or None."""
+    task = chat_core.local_task(user_turn['content'])
+    if not task:
+        return None
+    resources.conversation_store.append(session_id, user_turn, chat_core.task_turn(task))
+    payload = task_payload(task, source='local')
+    metrics.count_response(payload)
+    return payload
+
+def prepare_messages(session_id, user_turn, model):
+    # This session's compacted history plus the new message
+    with span('history'):
+        conversation = resources.conversation_store.get(session_id)
+        return resources.history_compactor.build(session_id, conversation, user_turn, model)
+
+def observe_reply(messages, response):
+    if response is not None:
+        metrics.count_tokens(response)
+        resources.history_compactor.observe_usage(messages, response)
+
+@api.route('/', methods=['GET'])
 def home():
-    return jsonify({
-        'message': 'DWed Venue Finder API is running!',
-        'status': 'OK',
-        'endpoints': {
-            '/api/chat': 'POST - Send chat messages to the bot'
-        }
-    })
-
-@app.route('/api/chat', methods=['POST'])
+    return jsonify(chat_core.home_body())
+
+@api.route('/api/chat', methods=['POST'])
 def chat():
-    global conversation_history
     try:
-        # Get API key and message
-        GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
-        data = request.get_json()
-        message = data.get('message', '')
-        
+        message = chat_core.read_message(request.get_json())
         if not message:
-            return jsonify({'error': 'Message is required'}), 400
-        
-        # Add user message to history
-        conversation_history.append({
-            'role': 'user',
-            'content': message
-        })
-        
-        # Configure Gemini
-        genai.configure(api_key=GEMINI_API_KEY)
-        
-        # Define System Prompt with personality and tasks
-        system_instruction = """You are DWed, a sophisticated and empathetic AI wedding expert with a deep understanding of Indian weddings and event planning. Your personality is warm, engaging, and creative. You use varied, natural language and never repeat responses in the same way.
-
-PERSONALITY TRAITS:
-- Enthusiastic and positive
-- Creative in suggesting alternatives
-- Understanding of wedding planning stress
-- Knowledgeable about Indian wedding customs and event planning
-- Professional yet friendly tone
-- Remember previous conversations and build upon them
-
-RESPONSE VARIATIONS:
-When no venues or planners match the criteria, provide one of these response styles (vary them naturally):
-1. "I've explored our collection, but haven't found exact matches. However, I'd love to suggest some beautiful alternatives! Would you like to explore [suggestion1] or [suggestion2]?"
-2. "While I don't have exact matches, I'm curious - what's the most important aspect you're looking for? We can focus on that and find your perfect match!"
-3. "Let's get creative with your search! The exact match isn't available, but I know some hidden gems that might surprise you. Shall we explore different [areas/styles/options]?"
-4. "Though these specific criteria aren't matching right now, I'm excited to help you discover something even better! What aspects are non-negotiable for you?"
-
-CRITICAL INSTRUCTIONS:
-
-Task 1 (Venue Finding): 
-When the user wants to find a venue (e.g., "I need a venue in Delhi", "Show me venues for 500 people"), you MUST respond with ONLY a pure JSON object:
-{"task": "find_venue", "filters": {...}}
-
-Task 2 (Event Planner Finding):
-When the user wants to find an event planner (e.g., "I need a planner in Mumbai", "Show me wedding planners"), you MUST respond with ONLY a pure JSON object:
-{"task": "find_planner", "filters": {...}}
-
-The venue filters can include:
-- "location": (string) city name
-- "capacity": (integer) exact capacity requested
-- "price_min": (integer) minimum price per head
-- "price_max": (integer) maximum price per head
-
-The planner filters can include:
-- "location": (string) city name
-- "budget_min": (integer) minimum budget
-- "budget_max": (integer) maximum budget
-- "style": (string) traditional/modern/luxury
-
-Examples:
-User: "venue in Delhi" → {"task": "find_venue", "filters": {"location": "Delhi"}}
-User: "Show venues for 500 people" → {"task": "find_venue", "filters": {"capacity": 500}}
-User: "Find me a wedding planner in Mumbai" → {"task": "find_planner", "filters": {"location": "Mumbai"}}"""
-        
-        # Initialize model with system instruction and conversation history
-        model = genai.GenerativeModel(
-            model_name='gemini-2.5-flash',
-            system_instruction=system_instruction
-        )
-        
-        # Prepare messages for API (including history)
-        messages = [
-            {'role': msg['role'], 'parts': [msg['content']]} 
-            for msg in conversation_history
-        ]
-        
-        # Generate response
-        response = model.generate_content(messages)
-        response_text = response.text.strip()
-        
-        # Add bot response to history
-        conversation_history.append({
-            'role': 'model',
-            'content': response_text
-        })
-        
-        # Try to parse as JSON (Task 1 - Venue Finding)
-        try:
-            parsed_response = json.loads(response_text)
-            
-            # Check if this is a venue finding task
-            if parsed_response.get('task') == 'find_venue':
-                filters = parsed_response.get('filters', {})
-                
-                # Build MongoDB query
-                mongo_query = {}
-                
-                # Location filter
-                if 'location' in filters:
-                    mongo_query['location'] = {'$regex': filters['location'], '$options': 'i'}
-                
-                # Capacity filter for appropriate venue size
-                if 'capacity' in filters:
-                    requested_capacity = filters['capacity']
-                    # Only show venues that can actually accommodate all guests
-                    # Either with a single banquet hall or combined halls
-                    mongo_query['$or'] = [
-                        # Single banquet hall that can fit all guests
-                        {
-                            'banquets': {
-                                '$elemMatch': {
-                                    'capacity': {'$gte': requested_capacity}
-                                }
-                            }
-                        },
-                        # Or total venue capacity sufficient for all guests
-                        {
-                            'total_capacity': {'$gte': requested_capacity}
-                        }
-                    ]
-                
-                # Price filter - check banquets array
-                price_query = {}
-                if 'price_min' in filters:
-                    price_query['$gte'] = filters['price_min']
-                if 'price_max' in filters:
-                    price_query['$lte'] = filters['price_max']
-                if price_query:
-                    if 'banquets' not in mongo_query:
-                        mongo_query['banquets'] = {'$elemMatch': {}}
-                    mongo_query['banquets']['$elemMatch']['price'] = price_query
-                
-                # Query database
-                results = venues_collection.find(mongo_query)
-
-                # Convert results to list and handle ObjectId
-                matching_venues = []
-                requested_capacity = filters.get('capacity', 0)
-
-                for venue in results:
-                    venue['_id'] = str(venue['_id'])
-                    # Add the requested capacity to the venue object
-                    venue['requestedCapacity'] = requested_capacity
-
-                    # Only include venues that have at least one suitable banquet hall
-                    has_suitable_hall = False
-                    if requested_capacity > 0:
-                        for banquet in venue.get('banquets', []):
-                            if (banquet['capacity'] >= requested_capacity and
-                                banquet['capacity'] <= requested_capacity + 100):
-                                has_suitable_hall = True
-                                break
-                        if has_suitable_hall:
-                            matching_venues.append(venue)
-                    else:
-                        matching_venues.append(venue)
-
-                return jsonify({
-                    'type': 'venues',
-                    'data': matching_venues
-                })
-            
-            # Check if this is an event planner finding task
-            elif parsed_response.get('task') == 'find_planner':
-                filters = parsed_response.get('filters', {})
-
-                # Build MongoDB query for event planners
-                mongo_query = {}
-
-                # Location filter
-                if 'location' in filters:
-                    mongo_query['city'] = {'$regex': filters['location'], '$options': 'i'}
-
-                # Budget filter
-                budget_query = {}
-                if 'budget_min' in filters:
-                    budget_query['$gte'] = filters['budget_min']
-                if 'budget_max' in filters:
-                    budget_query['$lte'] = filters['budget_max']
-                if budget_query:
-                    mongo_query['min_budget'] = budget_query
-
-                # Style/Event type filter
-                if 'style' in filters:
-                    style = filters['style'].lower()
-                    if style == 'traditional':
-                        mongo_query['event_types'] = {'$in': ['Traditional Ceremonies', 'Wedding']}
-                    elif style == 'modern':
-                        mongo_query['event_types'] = {'$in': ['Birthday Parties', 'Corporate Events']}
-                    elif style == 'luxury':
-                        mongo_query['event_types'] = {'$in': ['Destination Weddings', 'Beach Weddings']}
-
-                # Query database
-                results = event_planners_collection.find(mongo_query)
-
-                # Convert results to list and handle ObjectId
-                matching_planners = []
-                for planner in results:
-                    planner['_id'] = str(planner['_id'])
-                    matching_planners.append(planner)
-
-                return jsonify({
-                    'type': 'event_planners',
-                    'data': matching_planners
-                })
-        
-        except json.JSONDecodeError:
-            # Not JSON, so it's a text response (Task 2 or Task 3)
-            pass
-        
-        # Return text response
-        return jsonify({
-            'type': 'text',
-            'data': response_text
-        })
-    
+            return respond(*chat_core.missing_message())
+
+        session_id = get_session_id()
+        user_turn = chat_core.user_turn(message)
+        payload = answer_locally(session_id, user_turn)
+        if payload is not None:
+            return jsonify(payload)
+
+        # Shared model, configured once per process
+        model = resources.chat_model()
+        messages = prepare_messages(session_id, user_turn, model)
+
+        # Generate response: from the reply cache, shared with an identical request
+        # in flight, or a model call under the deadline, retry and breaker policy
+        key = chat_core.chat_reply_key(messages)
+        with span('llm'):
+            parts, response = reply_cache.fetch(key, lambda: llm_gate.call(lambda: llm_calls.call(
+                lambda timeout: model.generate_content(messages, request_options={'timeout': timeout})
+            )), timeout=LLM_DEADLINE)
+        observe_reply(messages, response)
+
+        # A find_venue / find_planner function call (or a task object in the reply text)
+        task, response_text = chat_core.read_reply(parts, response)
+        resources.conversation_store.append(session_id, user_turn, chat_core.reply_turn(task, response_text))
+        return jsonify(reply_payload(task, response_text))
+
     except Exception as e:
-        print(f"Error: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+        return respond(*chat_core.failure(e, 'chat'))
+
+def stream_chunks(cached_parts, response):
+    """Parts of each streamed chunk; a cached (or coalesced) reply arrives as one chunk."""
+    if cached_parts is not None:
+        yield cached_parts
+        return
+    for chunk in response:
+        yield content_parts(chunk)
+
+@api.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """Server-Sent Events version of /api/chat.
+
+    Emits 'token' events ({"text": ...}) while a conversational reply is being
+    generated, a single 'result' event with the same body /api/chat would return
+    once the reply is complete, then 'done'. Failures are reported as an 'error'
+    event since the status line has already been sent.
+    """
+    message = chat_core.read_message(request.get_json())
+    if not message:
+        return respond(*chat_core.missing_message())
+
+    session_id = get_session_id()
+    user_turn = chat_core.user_turn(message)
+
+    def generate():
+        try:
+            payload = answer_locally(session_id, user_turn)
+            if payload is not None:
+                yield from chat_core.local_events(payload)
+                return
+
+            model = resources.chat_model()
+            messages = prepare_messages(session_id, user_turn, model)
+            reply = StreamedReply()
+            key = chat_core.chat_reply_key(messages)
+            cached_parts, flight = reply_cache.claim(key, LLM_DEADLINE)
+            response = None
+            if cached_parts is None:
+                try:
+                    # The call's admission slot is held until the stream has been read
+                    llm_gate.acquire()
+                    try:
+                        # Not hedged: two streams would both be sending tokens
+                        response = llm_calls.call(
+                            lambda timeout: model.generate_content(messages, stream=True, request_options={'timeout': timeout}),
+                            hedge=False, settle=False
+                        )
+                    except BaseException:
+                        llm_gate.release()
+                        raise
+                except Exception as e:
+                    reply_cache.abandon(key, e, flight)
+                    raise
+
+            try:
+                for chunk_parts in stream_chunks(cached_parts, response):
+                    yield from reply.feed(chunk_parts)
+            except BaseException as e:
+                # Waiting requests make their own calls rather than share a broken stream
+                if response is not None:
+                    reply_cache.abandon(key, token=flight)
+                    llm_calls.settle(e)
+                raise
+            finally:
+                if response is not None:
+                    llm_gate.release()
+
+            if response is not None:
+                # The call only succeeded once the whole stream arrived
+                llm_calls.settle()
+                reply_cache.finish(key, reply.parts, flight)
+            observe_reply(messages, response)
+            task, response_text = chat_core.read_reply(reply.parts, response, reply.text)
+            resources.conversation_store.append(session_id, user_turn, chat_core.reply_turn(task, response_text))
+            yield from reply.final_events(reply_payload(task, response_text))
+
+        except Exception as e:
+            yield chat_core.error_event(e)
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers=chat_core.STREAM_HEADERS)
+
+# Later pages of a search; the first page comes back from the chat call with its next_cursor
+@api.route('/api/venues', methods=['GET'])
+def venue_page():
+    try:
+        filters, after = decode_cursor(request.args.get('cursor', ''), 'venues')
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(chat_core.search_body('venues', *search('venues', filters, after, page_size(request.args.get('limit')))))
 
-def get_event_planners(message):
+@api.route('/api/planners', methods=['GET'])
+def planner_page():
     try:
-        # Extract city from message if mentioned
-        city = None
-        cities = ['Mumbai', 'Delhi', 'Bangalore', 'Jaipur']
-        for c in cities:
-            if c.lower() in message.lower():
-                city = c
-                break
-
-        # Build query
-        query = {}
-        if city:
-            query['city'] = city
-
-        # Get event planners
-        planners = list(event_planners_collection.find(query))
-        
-        # Convert ObjectId to string
-        for planner in planners:
-            planner['_id'] = str(planner['_id'])
-
-        if planners:
-            response = "Here are some event planners that can help with your wedding:\n\n"
-            for planner in planners:
-                response += f"🎉 {planner['name']}\n"
-                response += f"📍 {planner['location']}\n"
-                response += f"⭐ Rating: {planner['rating']}/5\n"
-                response += f"💫 Experience: {planner['experience_years']} years\n"
-                response += f"💰 Price Range: {planner['price_range']} (Min. Budget: ₹{planner['min_budget']:,})\n\n"
-                response += "Key Services:\n"
-                for category, services in planner['services'].items():
-                    if category == 'pre_wedding':
-                        response += "🎯 Pre-Wedding: " + ", ".join(services[:3]) + "\n"
-                    elif category == 'design_decor':
-                        response += "🎨 Design & Décor: " + ", ".join(services[:3]) + "\n"
-                    elif category == 'entertainment':
-                        response += "🎵 Entertainment: " + ", ".join(services[:3]) + "\n"
-                    elif category == 'catering':
-                        response += "🍽️ Catering: " + ", ".join(services[:3]) + "\n"
-                    elif category == 'photography':
-                        response += "📸 Photography: " + ", ".join(services[:3]) + "\n"
-                response += f"\n📞 Contact: {planner['contact']['phone']}\n"
-                response += f"📧 Email: {planner['contact']['email']}\n"
-                response += "\n-------------------\n\n"
-        else:
-            response = "I couldn't find any event planners matching your criteria. Would you like to search in a different city?"
-
-        return {
-            'type': 'text',
-            'data': response
-        }
-    except Exception as e:
-        print(f"Error getting event planners: {str(e)}")
-@app.route('/api/chat/reset', methods=['POST'])
+        filters, after = decode_cursor(request.args.get('cursor', ''), 'event_planners')
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(chat_core.search_body(
+        'event_planners', *search('event_planners', filters, after, page_size(request.args.get('limit')))
+    ))
+
+# Search results only carry card fields; full documents are fetched when a card is opened
+@api.route('/api/venues/<venue_id>', methods=['GET'])
+def venue_details(venue_id):
+    venue = resources.catalog.get_venue(venue_id)
+    if venue is None:
+        return jsonify({'error': 'Venue not found'}), 404
+    return jsonify(venue)
+
+@api.route('/api/planners/<planner_id>', methods=['GET'])
+def planner_details(planner_id):
+    planner = resources.catalog.get_planner(planner_id)
+    if planner is None:
+        return jsonify({'error': 'Event planner not found'}), 404
+    return jsonify(planner)
+
+# How Gemini replies were turned into tasks, including the parse failure rate
+@api.route('/api/stats', methods=['GET'])
+def reply_stats():
+    return jsonify(tasks.stats())
+
+@api.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    body, content_type = metrics.exposition()
+    return Response(body, content_type=content_type)
+
+@api.route('/api/chat/reset', methods=['POST'])
 def reset_conversation():
-    global conversation_history
-    conversation_history = []
-    return jsonify({
-        'message': 'Conversation history cleared',
-        'status': 'OK'
-    })
+    resources.conversation_store.clear(get_session_id())
+    return jsonify(chat_core.reset_body())
+
+def create_app(warm_up=WARM_UP):
+    """Build the Flask app; with warm_up, connect to MongoDB and build the chat model now too."""
+    started = time.perf_counter()
+    app = Flask(__name__)
+    app.json = FastJSONProvider(app)
+    CORS(app, expose_headers=['X-Session-Id'])
+    app.register_blueprint(api)
+    resources.record('import', _imported - _import_started)
+    resources.record('create_app', time.perf_counter() - started)
+    if warm_up:
+        resources.warm_up()
+    print(f"Startup: {resources.startup_report()}")
+    return app
+
+_imported = time.perf_counter()
 
 if __name__ == '__main__':
-    app.run(debug=True, port=5000)
+    # Flask's single-process development server; use serve.py in production
+    create_app().run(debug=os.getenv('FLASK_DEBUG', '0') != '0', port=int(os.getenv('PORT', '5000')))
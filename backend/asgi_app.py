@@ -0,0 +1,373 @@
+"""
+Asyncio serving mode for the DWed API
+Exposes the same routes as app.py on Quart, awaiting Gemini through the SDK's
+async API and MongoDB through pymongo's AsyncMongoClient, so a single process
+can hold many chats in flight instead of one per worker thread.
+
+Run with: uvicorn asgi_app:app --port 5000   (or SERVER=asgi python serve.py)
+"""
+import time
+# Set before the imports below, so the startup report includes them
+_import_started = time.perf_counter()
+
+import asyncio
+import os
+from quart import Quart, Response, g, jsonify, request
+from quart_cors import cors
+from pymongo import AsyncMongoClient
+from pymongo.errors import PyMongoError
+
+# Request parsing, response bodies and stream events shared with the WSGI app
+from app import WARM_UP
+import chat_core
+from chat_core import StreamedReply
+from resources import DATABASE, mongo_options, resources
+from admission import MongoRateLimiter, Rejected, check_rate_limit, client_address, llm_gate
+from llm import LLM_BACKEND
+from conversation_store import MongoConversationStore
+from json_provider import FastJSONProvider
+from search import (
+    find_venues_async, find_planners_async, get_venue_async, get_planner_async,
+    decode_cursor, page_size, InvalidCursor, PAGE_SIZE
+)
+from tasks import content_parts
+import tasks
+import metrics
+from metrics import span
+from resilience import LLM_DEADLINE, llm_calls
+from reply_cache import reply_cache
+
+# Database Setup: opened once the server starts, on its event loop
+async_client = None
+venues_collection = None
+event_planners_collection = None
+
+RATE_LIMITED_ENDPOINTS = {'chat', 'chat_stream'}
+
+# Initialize Quart
+app = cors(Quart(__name__), expose_headers=['X-Session-Id'])
+app.json = FastJSONProvider(app)
+
+
+@app.before_serving
+async def start_resources():
+    global async_client, venues_collection, event_planners_collection
+    started = time.perf_counter()
+    async_client = AsyncMongoClient(os.getenv('MONGO_URI'), **mongo_options())
+    venues_collection = async_client[DATABASE]['venues']
+    event_planners_collection = async_client[DATABASE]['event_planners']
+    resources.record('import', _imported - _import_started)
+    resources.record('async_mongo_client', time.perf_counter() - started)
+    # Connecting and building the chat model block, so keep them off the event loop (WARM_UP=0 to skip)
+    if WARM_UP:
+        await asyncio.to_thread(resources.warm_up)
+    print(f"Startup: {resources.startup_report()}")
+
+
+@app.after_serving
+async def close_resources():
+    await async_client.close()
+    resources.close()
+
+
+async def resource(name):
+    """resources.<name>, created off the event loop the first time (building may read files or start threads)."""
+    if resources.is_built(name):
+        return getattr(resources, name)
+    return await asyncio.to_thread(getattr, resources, name)
+
+
+async def store_call(method, *args):
+    # The Mongo-backed store does network I/O, so keep it off the event loop
+    store = await resource('conversation_store')
+    if isinstance(store, MongoConversationStore):
+        return await asyncio.to_thread(getattr(store, method), *args)
+    return getattr(store, method)(*args)
+
+
+async def chat_model():
+    # With CONTEXT_CACHE=gemini, creating or renewing the context cache is a blocking API call
+    return await asyncio.to_thread(resources.chat_model)
+
+
+# The in-memory catalog answers without I/O once loaded; until then go to MongoDB
+async def search_venues(filters, after=None, limit=PAGE_SIZE):
+    if resources.catalog.ready:
+        return resources.catalog.find_venues(filters, after, limit)
+    return await find_venues_async(venues_collection, filters, after, limit)
+
+
+async def search_planners(filters, after=None, limit=PAGE_SIZE):
+    if resources.catalog.ready:
+        return resources.catalog.find_planners(filters, after, limit)
+    return await find_planners_async(event_planners_collection, filters, after, limit)
+
+
+async def search(kind, filters, after=None, limit=PAGE_SIZE):
+    find = search_venues if kind == 'venues' else search_planners
+    return await find(filters, after, limit)
+
+
+def respond(body, status=200, headers=None):
+    return jsonify(body), status, headers or {}
+
+
+def get_session_id():
+    return chat_core.get_session_id(request, g)
+
+
+@app.before_request
+async def start_timing():
+    g.request_started = metrics.start_request()
+
+
+@app.before_request
+async def limit_chat_rate():
+    if request.endpoint in RATE_LIMITED_ENDPOINTS:
+        try:
+            rate_limiter = await resource('rate_limiter')
+            if isinstance(rate_limiter, MongoRateLimiter):
+                await asyncio.to_thread(check_rate_limit, rate_limiter, client_address(request))
+            else:
+                check_rate_limit(rate_limiter, client_address(request))
+        except Rejected as e:
+            return respond(*chat_core.rejection(e))
+        except PyMongoError as e:
+            # Fail open: an unreachable limits store shouldn't take the chat down with it
+            print(f"Error checking rate limit: {str(e)}")
+
+
+@app.after_request
+async def record_timing(response):
+    # Per-route latency, plus this request's stages in a Server-Timing header
+    rule = request.url_rule.rule if request.url_rule else None
+    return metrics.finish_request(response, request.method, rule, g.pop('request_started', None))
+
+
+@app.after_request
+async def send_session_id(response):
+    return chat_core.send_session_id(response, g)
+
+
+async def task_payload(task, source):
+    """Run a find_venue / find_planner task and return its response body, or None for other replies."""
+    found = chat_core.task_search(task)
+    if found is None:
+        return None
+    kind, filters = found
+    return chat_core.search_body(kind, *await search(kind, filters), source=source)
+
+
+async def reply_payload(task, response_text):
+    """Body for a finished Gemini reply: search results for a task, else the text."""
+    payload = await task_payload(task, source=LLM_BACKEND) or chat_core.text_body(response_text)
+    metrics.count_response(payload)
+    return payload
+
+
+async def reply_chunks(cached_parts, response):
+    """Parts of each streamed chunk; a cached (or coalesced) reply arrives as one chunk."""
+    if cached_parts is not None:
+        yield cached_parts
+        return
+    async for chunk in response:
+        yield content_parts(chunk)
+
+
+async def read_message():
+    return chat_core.read_message(await request.get_json())
+
+
+async def answer_locally(session_id, user_turn):
+    """Fast path for formulaic searches; returns the response body or None."""
+    task = chat_core.local_task(user_turn['content'])
+    if not task:
+        return None
+    await store_call('append', session_id, user_turn, chat_core.task_turn(task))
+    payload = await task_payload(task, source='local')
+    metrics.count_response(payload)
+    return payload
+
+
+async def prepare_messages(session_id, user_turn, model):
+    with span('history'):
+        conversation = await store_call('get', session_id)
+        compactor = await resource('history_compactor')
+        # Counts tokens with a blocking API call when HISTORY_EXACT_TOKENS=1
+        return await asyncio.to_thread(compactor.build, session_id, conversation, user_turn, model)
+
+
+def observe_reply(messages, response):
+    if response is not None:
+        metrics.count_tokens(response)
+        resources.history_compactor.observe_usage(messages, response)
+
+
+@app.route('/', methods=['GET'])
+async def home():
+    return jsonify(chat_core.home_body())
+
+
+@app.route('/api/chat', methods=['POST'])
+async def chat():
+    try:
+        message = await read_message()
+        if not message:
+            return respond(*chat_core.missing_message())
+
+        session_id = get_session_id()
+        user_turn = chat_core.user_turn(message)
+        payload = await answer_locally(session_id, user_turn)
+        if payload is not None:
+            return jsonify(payload)
+
+        model = await chat_model()
+        messages = await prepare_messages(session_id, user_turn, model)
+
+        # Cached, shared with an identical request in flight, or a guarded model call
+        key = chat_core.chat_reply_key(messages)
+        with span('llm'):
+            parts, response = await reply_cache.fetch_async(key, lambda: llm_gate.call_async(lambda: llm_calls.call_async(
+                lambda timeout: model.generate_content_async(messages, request_options={'timeout': timeout})
+            )), timeout=LLM_DEADLINE)
+        observe_reply(messages, response)
+
+        task, response_text = chat_core.read_reply(parts, response)
+        await store_call('append', session_id, user_turn, chat_core.reply_turn(task, response_text))
+        return jsonify(await reply_payload(task, response_text))
+
+    except Exception as e:
+        return respond(*chat_core.failure(e, 'chat'))
+
+
+@app.route('/api/chat/stream', methods=['POST'])
+async def chat_stream():
+    """Server-Sent Events version of /api/chat (same events as app.chat_stream)."""
+    message = await read_message()
+    if not message:
+        return respond(*chat_core.missing_message())
+
+    session_id = get_session_id()
+    user_turn = chat_core.user_turn(message)
+
+    async def generate():
+        try:
+            payload = await answer_locally(session_id, user_turn)
+            if payload is not None:
+                for event in chat_core.local_events(payload):
+                    yield event
+                return
+
+            model = await chat_model()
+            messages = await prepare_messages(session_id, user_turn, model)
+            reply = StreamedReply()
+            key = chat_core.chat_reply_key(messages)
+            cached_parts, flight = await reply_cache.claim_async(key, LLM_DEADLINE)
+            response = None
+            if cached_parts is None:
+                try:
+                    # The call's admission slot is held until the stream has been read
+                    await llm_gate.acquire_async()
+                    try:
+                        response = await llm_calls.call_async(
+                            lambda timeout: model.generate_content_async(messages, stream=True, request_options={'timeout': timeout}),
+                            hedge=False, settle=False
+                        )
+                    except BaseException:
+                        await llm_gate.release_async()
+                        raise
+                except BaseException as e:
+                    reply_cache.abandon_async(key, e if isinstance(e, Exception) else None, flight)
+                    raise
+
+            try:
+                async for chunk_parts in reply_chunks(cached_parts, response):
+                    for event in reply.feed(chunk_parts):
+                        yield event
+            except BaseException as e:
+                # Waiting requests make their own calls rather than share a broken stream
+                if response is not None:
+                    reply_cache.abandon_async(key, token=flight)
+                    llm_calls.settle(e)
+                raise
+            finally:
+                if response is not None:
+                    await llm_gate.release_async()
+
+            if response is not None:
+                # The call only succeeded once the whole stream arrived
+                llm_calls.settle()
+                reply_cache.finish_async(key, reply.parts, flight)
+            observe_reply(messages, response)
+            task, response_text = chat_core.read_reply(reply.parts, response, reply.text)
+            await store_call('append', session_id, user_turn, chat_core.reply_turn(task, response_text))
+            for event in reply.final_events(await reply_payload(task, response_text)):
+                yield event
+
+        except Exception as e:
+            yield chat_core.error_event(e)
+
+    return Response(generate(), mimetype='text/event-stream', headers=chat_core.STREAM_HEADERS)
+
+
+# Later pages of a search; the first page comes back from the chat call with its next_cursor
+@app.route('/api/venues', methods=['GET'])
+async def venue_page():
+    try:
+        filters, after = decode_cursor(request.args.get('cursor', ''), 'venues')
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(chat_core.search_body('venues', *await search('venues', filters, after, page_size(request.args.get('limit')))))
+
+
+@app.route('/api/planners', methods=['GET'])
+async def planner_page():
+    try:
+        filters, after = decode_cursor(request.args.get('cursor', ''), 'event_planners')
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(chat_core.search_body(
+        'event_planners', *await search('event_planners', filters, after, page_size(request.args.get('limit')))
+    ))
+
+
+@app.route('/api/venues/<venue_id>', methods=['GET'])
+async def venue_details(venue_id):
+    catalog = resources.catalog
+    venue = catalog.get_venue(venue_id) if catalog.ready else await get_venue_async(venues_collection, venue_id)
+    if venue is None:
+        return jsonify({'error': 'Venue not found'}), 404
+    return jsonify(venue)
+
+
+@app.route('/api/planners/<planner_id>', methods=['GET'])
+async def planner_details(planner_id):
+    catalog = resources.catalog
+    planner = catalog.get_planner(planner_id) if catalog.ready else await get_planner_async(event_planners_collection, planner_id)
+    if planner is None:
+        return jsonify({'error': 'Event planner not found'}), 404
+    return jsonify(planner)
+
+
+@app.route('/api/stats', methods=['GET'])
+async def reply_stats():
+    return jsonify(tasks.stats())
+
+
+@app.route('/metrics', methods=['GET'])
+async def prometheus_metrics():
+    body, content_type = metrics.exposition()
+    return Response(body, content_type=content_type)
+
+
+@app.route('/api/chat/reset', methods=['POST'])
+async def reset_conversation():
+    await store_call('clear', get_session_id())
+    return jsonify(chat_core.reset_body())
+
+
+_imported = time.perf_counter()
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, port=int(os.getenv('PORT', '5000')))
@@ -0,0 +1,452 @@
+"""
+End-to-end load and latency benchmark for the chat API
+Boots app.py in-process against mongomock (or a real MongoDB with --mongo-uri)
+and the stub LLM backend, seeds a synthetic catalog, then replays a corpus of
+venue, planner and chit-chat messages - plus the result page and detail
+requests a user makes after a search - from --concurrency worker threads.
+Reports throughput and p50/p95/p99 latency per route, and per stage for any
+stages the app reports in a Server-Timing header, and writes everything to a
+JSON file so runs before and after a change can be compared.
+
+Run with:  python benchmark.py --requests 2000 --concurrency 16 --output before.json
+Compare:   python benchmark.py --compare before.json after.json
+
+Needs the dev requirements (pip install -r requirements-dev.txt). With
+--mongo-uri the existing venue_db data is used as-is and nothing is seeded.
+CATALOG_CACHE=0 needs --mongo-uri: searches then run search.py's aggregation
+pipelines, which mongomock can't execute.
+"""
+import argparse
+import copy
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+CITIES = ('Delhi', 'Mumbai', 'Bangalore', 'Jaipur', 'Hyderabad', 'Chennai', 'Kolkata', 'Pune', 'Goa', 'Udaipur')
+LOCALITIES = ('Central', 'North', 'South', 'East', 'West', 'Old Town', 'Lakeside', 'Airport Road')
+HALL_NAMES = ('Grand Ballroom', 'Crystal Hall', 'Garden Lawn', 'Terrace', 'Royal Court', 'Poolside')
+STYLES = ('traditional', 'modern', 'luxury')
+
+CHIT_CHAT = (
+    "What is a sangeet ceremony?",
+    "How far in advance should we book a wedding venue?",
+    "Tips for choosing between a banquet hall and a lawn?",
+    "Explain the haldi ceremony to me",
+    "What questions should I ask a wedding planner?",
+    "How do we keep a big fat wedding within budget?",
+    "Which months are best for a destination wedding in Goa?",
+)
+
+# Share of each kind of request in the generated corpus
+MIX = (
+    ('venue', 0.30),
+    ('planner', 0.20),
+    ('chat', 0.15),
+    ('stream', 0.15),
+    ('page', 0.10),
+    ('detail', 0.10),
+)
+
+SERVER_TIMING = re.compile(r'\s*([\w.-]+)\s*(?:;[^,]*?dur=([\d.]+))?[^,]*')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--requests', type=int, default=1000, help='measured requests (default 1000)')
+    parser.add_argument('--concurrency', type=int, default=8, help='worker threads (default 8)')
+    parser.add_argument('--warmup', type=int, default=50, help='unmeasured requests sent first (default 50)')
+    parser.add_argument('--venues', type=int, default=2000, help='synthetic venues to seed (default 2000)')
+    parser.add_argument('--planners', type=int, default=500, help='synthetic planners to seed (default 500)')
+    parser.add_argument('--session-turns', type=int, default=10,
+                        help='chat turns before a worker starts a new session (default 10)')
+    parser.add_argument('--corpus', help='JSONL file of {"message": ..., "stream": false} lines to replay instead')
+    parser.add_argument('--mongo-uri', help='benchmark against this MongoDB instead of mongomock')
+    parser.add_argument('--llm', default='stub', help='LLM_BACKEND to use (default stub)')
+    parser.add_argument('--seed', type=int, default=42, help='random seed for data and corpus (default 42)')
+    parser.add_argument('--output', default='benchmark_results.json', help='JSON result file')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help='compare two result files and exit')
+    return parser.parse_args()
+
+
+# ---- Data and corpus ----
+
+def synthetic_venues(rng, count):
+    from cities import city_key
+    venues = []
+    for i in range(count):
+        city = rng.choice(CITIES)
+        halls = []
+        for name in rng.sample(HALL_NAMES, rng.randint(1, 4)):
+            capacity = rng.randrange(50, 1501, 25)
+            halls.append({
+                'name': name,
+                'capacity': capacity,
+                'sitting_capacity': int(capacity * 0.7),
+                'floating_space': capacity,
+                'price': rng.randrange(600, 4001, 50),
+                'image': f'/images/halls/{i}-{len(halls)}.jpg',
+            })
+        venues.append({
+            'name': f'Benchmark Venue {i}',
+            'location': f'{rng.choice(LOCALITIES)}, {city}',
+            'city_key': city_key(city),
+            'rating': round(rng.uniform(3.0, 5.0), 1),
+            'total_capacity': sum(hall['capacity'] for hall in halls),
+            'banquets': halls,
+            'description': f'Benchmark Venue {i} is a wedding venue in {city}. ' * 8,
+        })
+    return venues
+
+
+def synthetic_planners(rng, count):
+    from cities import city_key
+    from event_planner_data import event_planners_data
+    planners = []
+    for i in range(count):
+        planner = copy.deepcopy(event_planners_data[i % len(event_planners_data)])
+        planner.pop('_id', None)
+        city = rng.choice(CITIES)
+        planner.update({
+            'name': f'Benchmark Planner {i}',
+            'city': city,
+            'location': f'{rng.choice(LOCALITIES)}, {city}',
+            'city_key': city_key(city),
+            'rating': round(rng.uniform(3.0, 5.0), 1),
+            'min_budget': rng.randrange(200000, 5000001, 50000),
+        })
+        planners.append(planner)
+    return planners
+
+
+def seed_database(db, args):
+    rng = random.Random(args.seed)
+    db.venues.delete_many({})
+    db.event_planners.delete_many({})
+    db.venues.insert_many(synthetic_venues(rng, args.venues))
+    db.event_planners.insert_many(synthetic_planners(rng, args.planners))
+
+
+def generated_corpus(rng, count):
+    kinds, weights = zip(*MIX)
+    corpus = []
+    for kind in rng.choices(kinds, weights, k=count):
+        city = rng.choice(CITIES)
+        if kind == 'venue':
+            message = rng.choice((
+                f'Show me venues in {city} for {rng.randrange(100, 1001, 50)} guests',
+                f'Find banquet halls in {city} under {rng.randrange(1000, 3001, 500)} per plate',
+                f'venues in {city}',
+            ))
+        elif kind == 'planner':
+            message = rng.choice((
+                f'Find wedding planners in {city}',
+                f'{rng.choice(STYLES)} wedding planners in {city} under {rng.randrange(10, 51, 5)} lakh',
+            ))
+        elif kind in ('chat', 'stream'):
+            message = rng.choice(CHIT_CHAT + (f'Show me venues in {city}',))
+        else:
+            message = None
+        corpus.append({'kind': kind, 'message': message})
+    return corpus
+
+
+def file_corpus(path):
+    corpus = []
+    with open(path, encoding='utf-8') as file:
+        for line in file:
+            if line.strip():
+                entry = json.loads(line)
+                corpus.append({'kind': 'stream' if entry.get('stream') else 'chat', 'message': entry['message']})
+    return corpus
+
+
+# ---- Replay ----
+
+def sse_events(body):
+    """Event names in a text/event-stream body, in order."""
+    events = []
+    for block in body.decode('utf-8', 'replace').split('\n\n'):
+        for line in block.splitlines():
+            if line.startswith('event:'):
+                events.append(line[len('event:'):].strip())
+    return events
+
+
+def server_timing(header):
+    """{stage: milliseconds} from a Server-Timing header."""
+    stages = {}
+    for match in SERVER_TIMING.finditer(header or ''):
+        if match.group(1) and match.group(2):
+            stages[match.group(1)] = float(match.group(2))
+    return stages
+
+
+class Worker:
+    """One simulated user: its own test client and session, following up on its last search."""
+
+    def __init__(self, app, session_turns, rng):
+        self.client = app.test_client()
+        self.rng = rng
+        self.session_turns = session_turns
+        self.turns = 0
+        self.session_id = None
+        self.last_results = None
+
+    def _headers(self):
+        if self.session_id is None or self.turns >= self.session_turns:
+            self.session_id = str(uuid.uuid4())
+            self.turns = 0
+        self.turns += 1
+        return {'X-Session-Id': self.session_id}
+
+    def _request(self, entry):
+        kind = entry['kind']
+        if kind in ('page', 'detail') and self.last_results:
+            result_type, cards, cursor = self.last_results
+            base = '/api/venues' if result_type == 'venues' else '/api/planners'
+            if kind == 'page' and cursor:
+                return f'GET {base}', lambda: self.client.get(base, query_string={'cursor': cursor})
+            if kind == 'detail' and cards:
+                card_id = self.rng.choice(cards)['_id']
+                return f'GET {base}/<id>', lambda: self.client.get(f'{base}/{card_id}')
+        # Nothing to follow up on yet: ask for something instead
+        message = entry['message'] or f'Show me venues in {self.rng.choice(CITIES)}'
+        if kind == 'stream':
+            return 'POST /api/chat/stream', lambda: self.client.post(
+                '/api/chat/stream', json={'message': message}, headers=self._headers(), buffered=False
+            )
+        return 'POST /api/chat', lambda: self.client.post(
+            '/api/chat', json={'message': message}, headers=self._headers()
+        )
+
+    def run(self, entry):
+        route, send = self._request(entry)
+        start = time.perf_counter()
+        first_byte = None
+        try:
+            response = send()
+            if route == 'POST /api/chat/stream':
+                chunks = []
+                for chunk in response.response:
+                    if first_byte is None:
+                        first_byte = (time.perf_counter() - start) * 1000
+                    chunks.append(chunk)
+                response.close()
+                elapsed = (time.perf_counter() - start) * 1000
+                # Failures after the headers arrive as an error event on a 200 stream
+                events = sse_events(b''.join(chunks))
+                ok = response.status_code < 400 and 'error' not in events and 'done' in events
+            else:
+                response.get_data()
+                elapsed = (time.perf_counter() - start) * 1000
+                ok = response.status_code < 400
+        except Exception as e:
+            print(f"Error sending {route}: {str(e)}")
+            return route, (time.perf_counter() - start) * 1000, False, {}
+
+        stages = server_timing(response.headers.get('Server-Timing'))
+        if first_byte is not None:
+            stages['first_byte'] = first_byte
+        if ok and route == 'POST /api/chat':
+            data = response.get_json(silent=True) or {}
+            if data.get('type') in ('venues', 'event_planners') and data.get('data'):
+                self.last_results = (data['type'], data['data'], data.get('next_cursor'))
+        return route, elapsed, ok, stages
+
+
+def replay(app, corpus, concurrency, session_turns, seed):
+    workers = [Worker(app, session_turns, random.Random(seed + index)) for index in range(concurrency)]
+    free = list(workers)
+    free_lock = threading.Lock()
+    samples = []
+
+    def send(entry):
+        with free_lock:
+            worker = free.pop()
+        try:
+            return worker.run(entry)
+        finally:
+            with free_lock:
+                free.append(worker)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        samples = list(pool.map(send, corpus))
+    return samples, time.perf_counter() - start
+
+
+# ---- Reporting ----
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return None
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarise(latencies, duration):
+    ordered = sorted(latencies)
+    return {
+        'count': len(ordered),
+        'throughput_rps': len(ordered) / duration if duration else 0.0,
+        'mean_ms': sum(ordered) / len(ordered) if ordered else None,
+        'p50_ms': percentile(ordered, 0.50),
+        'p95_ms': percentile(ordered, 0.95),
+        'p99_ms': percentile(ordered, 0.99),
+        'max_ms': ordered[-1] if ordered else None,
+    }
+
+
+def report(samples, duration):
+    by_route = defaultdict(list)
+    errors = defaultdict(int)
+    by_stage = defaultdict(lambda: defaultdict(list))
+    for route, elapsed, ok, stages in samples:
+        by_route[route].append(elapsed)
+        if not ok:
+            errors[route] += 1
+        for stage, milliseconds in stages.items():
+            by_stage[route][stage].append(milliseconds)
+
+    routes = {}
+    for route in sorted(by_route):
+        routes[route] = summarise(by_route[route], duration)
+        routes[route]['errors'] = errors[route]
+    return {
+        'duration_s': duration,
+        'throughput_rps': len(samples) / duration if duration else 0.0,
+        'errors': sum(errors.values()),
+        'routes': routes,
+        'stages': {
+            route: {stage: summarise(values, duration) for stage, values in sorted(stages.items())}
+            for route, stages in sorted(by_stage.items())
+        },
+    }
+
+
+def _ms(value):
+    return '-' if value is None else f'{value:.1f}'
+
+
+def print_report(result):
+    print(f"\n{result['throughput_rps']:.1f} req/s over {result['duration_s']:.1f}s, {result['errors']} errors\n")
+    print(f"{'route':<28} {'count':>6} {'rps':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8} {'errors':>6}")
+    for route, stats in result['routes'].items():
+        print(f"{route:<28} {stats['count']:>6} {stats['throughput_rps']:>7.1f} {_ms(stats['p50_ms']):>8} "
+              f"{_ms(stats['p95_ms']):>8} {_ms(stats['p99_ms']):>8} {_ms(stats['max_ms']):>8} {stats['errors']:>6}")
+    for route, stages in result['stages'].items():
+        print(f"\n{route} stages")
+        for stage, stats in stages.items():
+            print(f"  {stage:<26} {stats['count']:>6} {'':>7} {_ms(stats['p50_ms']):>8} "
+                  f"{_ms(stats['p95_ms']):>8} {_ms(stats['p99_ms']):>8} {_ms(stats['max_ms']):>8}")
+
+
+def _change(before, after):
+    if before is None or after is None or not before:
+        return '-'
+    return f'{(after - before) / before * 100:+.1f}%'
+
+
+def compare(before_path, after_path):
+    with open(before_path, encoding='utf-8') as file:
+        before = json.load(file)
+    with open(after_path, encoding='utf-8') as file:
+        after = json.load(file)
+    print(f"throughput: {before['throughput_rps']:.1f} -> {after['throughput_rps']:.1f} req/s "
+          f"({_change(before['throughput_rps'], after['throughput_rps'])})\n")
+    print(f"{'route':<28} {'p50':>16} {'p95':>16} {'p99':>16}")
+    for route in sorted(set(before['routes']) | set(after['routes'])):
+        old, new = before['routes'].get(route, {}), after['routes'].get(route, {})
+        cells = [
+            f"{_ms(new.get(key))} ({_change(old.get(key), new.get(key))})"
+            for key in ('p50_ms', 'p95_ms', 'p99_ms')
+        ]
+        print(f"{route:<28} {cells[0]:>16} {cells[1]:>16} {cells[2]:>16}")
+
+
+# ---- Setup ----
+
+def boot_app(args):
+    """Import app.py against the chosen database and LLM backend, seeding mongomock first."""
+    os.environ['LLM_BACKEND'] = args.llm
+    # Every simulated user shares one address, so per-client limits would reject most of the run
+    os.environ.setdefault('RATE_LIMIT_RATE', '0')
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    if backend_dir not in sys.path:
+        sys.path.insert(0, backend_dir)
+
+    if args.mongo_uri:
+        os.environ['MONGO_URI'] = args.mongo_uri
+    elif os.getenv('CATALOG_CACHE', '1') == '0':
+        sys.exit("CATALOG_CACHE=0 needs --mongo-uri: mongomock can't run the search pipelines ($reduce)")
+    else:
+        try:
+            import mongomock
+        except ImportError:
+            sys.exit("mongomock is not installed: pip install -r requirements-dev.txt")
+        import pymongo
+        # Every MongoClient the app creates shares one in-memory server
+        client = mongomock.MongoClient()
+        pymongo.MongoClient = lambda *args, **kwargs: client
+        os.environ.setdefault('MONGO_URI', 'mongodb://localhost')
+        seed_database(client['venue_db'], args)
+
+    from app import create_app
+    from resources import resources
+    app = create_app(warm_up=True)
+    # Let the catalog finish its first load so the run measures steady state
+    deadline = time.monotonic() + 30
+    while resources.catalog._thread is not None and not resources.catalog.ready and time.monotonic() < deadline:
+        time.sleep(0.1)
+    return app
+
+
+def main():
+    args = parse_args()
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    flask_app = boot_app(args)
+    rng = random.Random(args.seed)
+    corpus = file_corpus(args.corpus) if args.corpus else generated_corpus(rng, args.requests)
+
+    if args.warmup:
+        print(f"Warming up with {args.warmup} requests...")
+        warmup = generated_corpus(random.Random(args.seed + 1), args.warmup)
+        replay(flask_app, warmup, args.concurrency, args.session_turns, args.seed)
+
+    print(f"Replaying {len(corpus)} requests at concurrency {args.concurrency}...")
+    samples, duration = replay(flask_app, corpus, args.concurrency, args.session_turns, args.seed)
+    result = report(samples, duration)
+    result['config'] = {
+        key: getattr(args, key) for key in (
+            'requests', 'concurrency', 'warmup', 'venues', 'planners', 'session_turns',
+            'corpus', 'llm', 'seed',
+        )
+    }
+    result['config']['mongo'] = 'external' if args.mongo_uri else 'mongomock'
+    result['config']['env'] = {
+        key: value for key, value in os.environ.items()
+        if key.startswith(('LLM_', 'CATALOG_', 'LOCAL_INTENT', 'CONTEXT_CACHE', 'SEARCH_', 'CONVERSATION_'))
+    }
+    result['finished_at'] = datetime.now().isoformat()
+
+    print_report(result)
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump(result, file, indent=2)
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
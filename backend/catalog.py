@@ -0,0 +1,310 @@
+"""
+In-memory venue and event planner catalog
+Both collections are small and only change when an import/update script runs,
+so each process keeps a full copy and answers searches, pages and detail
+lookups from it with the same results search.py's queries would give. The copy
+is held as records.Venue / records.EventPlanner records over the raw BSON, so
+only the fields searches read are decoded; documents that fail the records'
+validation are reported and left out. Venue hall conditions are evaluated
+column-wise by hall_index.HallIndex.
+
+The copy is loaded on a background thread and then kept current from a
+MongoDB change stream. Standalone servers have no change streams, so there it
+polls a dbHash version stamp instead (or simply reloads when dbHash isn't
+permitted). Until the first load finishes every call falls through to MongoDB;
+afterwards a MongoDB outage only makes the copy stale, not unavailable.
+"""
+import bisect
+import os
+import threading
+import time
+import pymongo
+from bson.objectid import ObjectId
+import search
+from cities import city_key
+from hall_index import HallIndex, NUMPY_AVAILABLE
+from metrics import span
+from records import RAW_BSON, EventPlanner, RecordError, Venue, build_records, find_raw
+from search import CAPACITY_WINDOW, PAGE_SIZE, STYLE_EVENT_TYPES, split_page
+
+COLLECTIONS = ('venues', 'event_planners')
+RECORD_TYPES = {'venues': Venue, 'event_planners': EventPlanner}
+
+POLL_INTERVAL = float(os.getenv('CATALOG_POLL_INTERVAL', '30'))
+RETRY_DELAY = 5
+
+
+def position(rating, doc_id):
+    """Sort key under search.SORT: rating descending, unrated last, then _id."""
+    if isinstance(rating, (int, float)):
+        return (0, -rating, doc_id)
+    return (1, 0, doc_id)
+
+
+def sort_key(record):
+    return position(record.rating, record.id)
+
+
+class _Snapshot:
+    """One collection's records, ordered for searching; replaced whole, never mutated."""
+    __slots__ = ('by_id', 'ordered', 'keys', '_hall_index')
+
+    def __init__(self, by_id, ordered, keys):
+        self.by_id = by_id
+        self.ordered = ordered
+        self.keys = keys
+        self._hall_index = None
+
+    def hall_index(self):
+        # Built on first venue search rather than on every change-stream update
+        if self._hall_index is None:
+            self._hall_index = HallIndex(self.ordered)
+        return self._hall_index
+
+    @classmethod
+    def of(cls, records):
+        ordered = sorted(records, key=sort_key)
+        return cls({record.id: record for record in ordered}, ordered, [sort_key(record) for record in ordered])
+
+    def replace(self, doc_id, record=None):
+        """Copy with the record for doc_id replaced by record, or removed when record is None."""
+        by_id, ordered, keys = dict(self.by_id), list(self.ordered), list(self.keys)
+        old = by_id.pop(doc_id, None)
+        if old is not None:
+            index = bisect.bisect_left(keys, sort_key(old))
+            del keys[index], ordered[index]
+        if record is not None:
+            key = sort_key(record)
+            index = bisect.bisect_left(keys, key)
+            keys.insert(index, key)
+            ordered.insert(index, record)
+            by_id[doc_id] = record
+        return _Snapshot(by_id, ordered, keys)
+
+
+def _between(value, low=None, high=None):
+    # Booleans are not numbers to MongoDB's range operators
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return False
+    return (low is None or value >= low) and (high is None or value <= high)
+
+
+def venue_matcher(filters, capacity_window=CAPACITY_WINDOW):
+    """Function turning a Venue record into its search card, or None if it doesn't match filters."""
+    wanted_city = city_key(filters['location']) if 'location' in filters else None
+    capacity = filters.get('capacity')
+    price_min, price_max = filters.get('price_min'), filters.get('price_max')
+    has_hall_filter = capacity is not None or price_min is not None or price_max is not None
+
+    def hall_fits(hall):
+        if capacity is not None and not _between(hall.capacity, capacity, capacity + capacity_window):
+            return False
+        if (price_min is not None or price_max is not None) and not _between(hall.price, price_min, price_max):
+            return False
+        return True
+
+    def card(venue):
+        if 'location' in filters and venue.city_key != wanted_city:
+            return None
+        halls = [hall for hall in venue.banquets if hall_fits(hall)]
+        if has_hall_filter and not halls:
+            return None
+
+        if not halls:
+            best_hall = None
+        elif capacity is not None:
+            # Tightest fit: the smallest hall that still seats everyone
+            best_hall = min(halls, key=lambda hall: hall.capacity)
+        else:
+            best_hall = halls[0]
+
+        result = {'_id': str(venue.id)}
+        result.update(venue.card_fields())
+        prices = [hall.price for hall in venue.banquets if hall.price is not None]
+        result['price_range'] = {'min': min(prices, default=None), 'max': max(prices, default=None)}
+        result['best_hall'] = best_hall.card_fields() if best_hall is not None else {}
+        image = best_hall.image if best_hall is not None else None
+        if image is None:
+            image = next((hall.image for hall in venue.banquets if hall.image is not None), None)
+        if image is not None:
+            result['image'] = image
+        result['requestedCapacity'] = filters.get('capacity', 0)
+        return result
+
+    return card
+
+
+def planner_matcher(filters):
+    """Function turning an EventPlanner record into its search card, or None if it doesn't match filters."""
+    wanted_city = city_key(filters['location']) if 'location' in filters else None
+    budget_min, budget_max = filters.get('budget_min'), filters.get('budget_max')
+    event_types = STYLE_EVENT_TYPES.get(filters['style'].lower()) if 'style' in filters else None
+
+    def card(planner):
+        if 'location' in filters and planner.city_key != wanted_city:
+            return None
+        if (budget_min is not None or budget_max is not None) and not _between(planner.min_budget, budget_min, budget_max):
+            return None
+        if event_types and not any(event_type in planner.event_types for event_type in event_types):
+            return None
+
+        result = {'_id': str(planner.id)}
+        result.update(planner.card_fields())
+        if planner.image is not None:
+            result['image'] = planner.image
+        return result
+
+    return card
+
+
+class Catalog:
+    def __init__(self, db, poll_interval=POLL_INTERVAL):
+        self.db = db
+        self.poll_interval = poll_interval
+        self.ready = False
+        self._snapshots = {name: _Snapshot.of([]) for name in COLLECTIONS}
+        self._thread = None
+
+    def start(self):
+        """Load and then keep the catalog current on a daemon thread."""
+        self._thread = threading.Thread(target=self._run, name='catalog-refresh', daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def after_fork(self, db):
+        """Use a forked worker's own database handle, restarting the refresh thread if one was running.
+
+        The snapshots loaded before the fork carry over, so the worker can serve
+        from them straight away.
+        """
+        self.db = db
+        if self._thread is not None:
+            self.start()
+
+    def load(self):
+        """Read both collections in full and swap the new copies in."""
+        snapshots = {
+            name: _Snapshot.of(build_records(RECORD_TYPES[name], find_raw(self.db[name])))
+            for name in COLLECTIONS
+        }
+        self._snapshots = snapshots
+        if not self.ready:
+            print(f"Catalog loaded: {', '.join(f'{len(s.by_id)} {name}' for name, s in snapshots.items())}")
+        self.ready = True
+
+    def _run(self):
+        watching = True
+        while True:
+            try:
+                if watching:
+                    watching = self._watch()
+                else:
+                    self._poll()
+            except Exception as e:
+                # Keep serving the last good copy; reload once MongoDB is back
+                print(f"Error refreshing catalog: {str(e)}")
+                time.sleep(RETRY_DELAY)
+
+    def _watch(self):
+        """Follow the change stream until it ends; returns False if change streams aren't supported."""
+        try:
+            # Raw, like load(): full documents are only decoded as far as records read them
+            stream = self.db.with_options(codec_options=RAW_BSON).watch(
+                [{'$match': {'ns.coll': {'$in': list(COLLECTIONS)}}}],
+                full_document='updateLookup'
+            )
+        except pymongo.errors.ConnectionFailure:
+            raise
+        except Exception as e:
+            print(f"Change streams unavailable ({str(e)}), polling every {self.poll_interval}s")
+            return False
+
+        with stream:
+            # Opened before loading, so nothing written in between is missed
+            self.load()
+            for change in stream:
+                self._apply(change)
+        return True
+
+    def _apply(self, change):
+        operation = change['operationType']
+        name = change.get('ns', {}).get('coll')
+        if operation in ('insert', 'update', 'replace', 'delete') and name in self._snapshots:
+            # fullDocument is None for deletes and for updates to since-deleted documents
+            doc_id = change['documentKey']['_id']
+            doc = change.get('fullDocument')
+            record = None
+            if doc is not None:
+                try:
+                    record = RECORD_TYPES[name].from_document(doc)
+                except RecordError as e:
+                    # Now invalid: drop the old copy rather than keep serving it
+                    print(f"Skipping invalid document: {str(e)}")
+            self._snapshots[name] = self._snapshots[name].replace(doc_id, record)
+        elif operation in ('drop', 'rename', 'dropDatabase', 'invalidate'):
+            self.load()
+
+    def _version_stamp(self):
+        try:
+            return self.db.command('dbHash', collections=list(COLLECTIONS))['collections']
+        except pymongo.errors.ConnectionFailure:
+            raise
+        except Exception:
+            # dbHash needs dbAdmin-style privileges on some hosted tiers
+            return None
+
+    def _poll(self):
+        stamp = None
+        while True:
+            latest = self._version_stamp()
+            if latest is None or latest != stamp:
+                self.load()
+                stamp = latest
+            time.sleep(self.poll_interval)
+
+    def _search(self, name, kind, card, filters, after, limit):
+        with span('catalog'):
+            return self._search_snapshot(name, kind, card, filters, after, limit)
+
+    def _search_snapshot(self, name, kind, card, filters, after, limit):
+        snapshot = self._snapshots[name]
+        start = bisect.bisect_right(snapshot.keys, position(*after)) if after else 0
+        if name == 'venues' and NUMPY_AVAILABLE:
+            # Narrow to matching venues with vectorised hall filters, then build cards for one page
+            rows = snapshot.hall_index().rows(filters, CAPACITY_WINDOW, start).tolist()
+        else:
+            rows = range(start, len(snapshot.ordered))
+        cards = []
+        for index in rows:
+            result = card(snapshot.ordered[index])
+            if result is not None:
+                cards.append(result)
+                if len(cards) > limit:
+                    break
+        return split_page(cards, kind, filters, limit)
+
+    def _get(self, name, doc_id):
+        record = self._snapshots[name].by_id.get(ObjectId(doc_id)) if ObjectId.is_valid(doc_id) else None
+        return record.document() if record is not None else None
+
+    def find_venues(self, filters, after=None, limit=PAGE_SIZE):
+        """Same result as search.find_venues, from memory once loaded."""
+        if not self.ready:
+            return search.find_venues(self.db['venues'], filters, after, limit)
+        return self._search('venues', 'venues', venue_matcher(filters), filters, after, limit)
+
+    def find_planners(self, filters, after=None, limit=PAGE_SIZE):
+        """Same result as search.find_planners, from memory once loaded."""
+        if not self.ready:
+            return search.find_planners(self.db['event_planners'], filters, after, limit)
+        return self._search('event_planners', 'event_planners', planner_matcher(filters), filters, after, limit)
+
+    def get_venue(self, venue_id):
+        if not self.ready:
+            return search.get_venue(self.db['venues'], venue_id)
+        return self._get('venues', venue_id)
+
+    def get_planner(self, planner_id):
+        if not self.ready:
+            return search.get_planner(self.db['event_planners'], planner_id)
+        return self._get('event_planners', planner_id)
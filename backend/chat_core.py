@@ -0,0 +1,236 @@
+"""
+Chat request handling shared by the WSGI (app.py) and ASGI (asgi_app.py) servers
+Everything here is free of I/O: reading the request, turning replies into
+response bodies and history turns, mapping failures to responses and building
+the streamed events. The two apps only add the blocking or awaiting calls to
+MongoDB, the reply cache and the model around it.
+
+Functions that build a response return (body, status, headers) for the app to
+pass through its own jsonify.
+"""
+import json
+import os
+import time
+import uuid
+import metrics
+from gemini_client import GEMINI_MODEL
+from intent import extract_intent
+from llm import LLM_BACKEND
+from metrics import span
+from prompts import CHAT_PROMPT
+from reply_cache import reply_key
+from resilience import LLMUnavailable, unavailable_body
+from admission import Rejected
+from streaming import ReplySplitter, sse_event
+from tasks import history_text, parse_reply, parts_text
+
+SESSION_HEADER = 'X-Session-Id'
+SESSION_COOKIE = 'session_id'
+
+INTERNAL_ERROR_MESSAGE = "Something went wrong on our side. Please try again."
+
+# Answer obvious searches locally instead of asking Gemini (set LOCAL_INTENT=0 to disable)
+LOCAL_INTENT = os.getenv('LOCAL_INTENT', '1') != '0'
+
+# The collection each search task reads, and the type its response body carries
+TASK_KINDS = {
+    'find_venue': 'venues',
+    'find_planner': 'event_planners',
+}
+
+ENDPOINTS = {
+    '/api/chat': 'POST - Send chat messages to the bot',
+    '/api/chat/stream': 'POST - Same as /api/chat, streamed as Server-Sent Events',
+    '/api/venues?cursor=': 'GET - Next page of a venue search',
+    '/api/planners?cursor=': 'GET - Next page of an event planner search',
+    '/api/venues/<id>': 'GET - Full details of one venue',
+    '/api/planners/<id>': 'GET - Full details of one event planner',
+    '/api/stats': 'GET - Task extraction counts and parse failure rate',
+    '/metrics': 'GET - Prometheus metrics'
+}
+
+STREAM_HEADERS = {
+    'Cache-Control': 'no-cache',
+    # Stop nginx-style proxies from buffering the stream
+    'X-Accel-Buffering': 'no'
+}
+
+
+def home_body():
+    return {
+        'message': 'DWed Venue Finder API is running!',
+        'status': 'OK',
+        'endpoints': ENDPOINTS
+    }
+
+
+def reset_body():
+    return {
+        'message': 'Conversation history cleared',
+        'status': 'OK'
+    }
+
+
+def get_session_id(request, g):
+    """Session id from the X-Session-Id header or session_id cookie, minting one if absent."""
+    session_id = request.headers.get(SESSION_HEADER) or request.cookies.get(SESSION_COOKIE)
+    if not session_id:
+        session_id = uuid.uuid4().hex
+        g.new_session_id = session_id
+    return session_id
+
+
+def send_session_id(response, g):
+    # Hand freshly minted ids back so the client can send them on the next turn
+    session_id = g.pop('new_session_id', None)
+    if session_id:
+        response.headers[SESSION_HEADER] = session_id
+        response.set_cookie(SESSION_COOKIE, session_id, httponly=True, samesite='Lax')
+    return response
+
+
+def read_message(data):
+    """The chat message from a request's JSON body ('' when missing)."""
+    return (data or {}).get('message', '')
+
+
+def missing_message():
+    return {'error': 'Message is required'}, 400, {}
+
+
+def user_turn(message):
+    return {
+        'role': 'user',
+        'content': message
+    }
+
+
+def local_task(message):
+    """Fast path: the task for a formulaic search, answered without the LLM round trip."""
+    return extract_intent(message) if LOCAL_INTENT else None
+
+
+def task_turn(task):
+    # Recorded exactly as Gemini would have replied so later turns keep their context
+    return {
+        'role': 'model',
+        'content': json.dumps(task)
+    }
+
+
+def reply_turn(task, response_text):
+    return {
+        'role': 'model',
+        'content': history_text(task, response_text)
+    }
+
+
+def chat_reply_key(messages):
+    return reply_key(LLM_BACKEND, GEMINI_MODEL, CHAT_PROMPT, messages)
+
+
+def read_reply(parts, response, response_text=None):
+    """(task, text) for a finished reply; response is None when it came from the reply cache."""
+    with span('parse'):
+        if response_text is None:
+            response_text = parts_text(parts).strip()
+        return parse_reply(parts, response_text, count=response is not None), response_text
+
+
+def task_search(task):
+    """(kind, filters) for a find_venue / find_planner task, or None for other replies."""
+    if not isinstance(task, dict):
+        return None
+    kind = TASK_KINDS.get(task.get('task'))
+    if kind is None:
+        return None
+    return kind, task.get('filters', {})
+
+
+def search_body(kind, cards, next_cursor, source=None):
+    """Body for one page of search results; chat replies also say where the task came from."""
+    body = {
+        'type': kind,
+        'data': cards,
+        'next_cursor': next_cursor
+    }
+    if source is not None:
+        body['source'] = source
+    return body
+
+
+def text_body(response_text):
+    return {
+        'type': 'text',
+        'data': response_text,
+        'source': LLM_BACKEND
+    }
+
+
+def failure(error, where):
+    """(body, status, headers) for an exception raised while answering a chat request."""
+    if isinstance(error, LLMUnavailable):
+        print(f"Error: {str(error)}")
+        metrics.count_response({'type': 'unavailable'})
+        return unavailable_body(error), 503, {'Retry-After': str(error.retry_after)}
+    if isinstance(error, Rejected):
+        metrics.count_response({'type': 'rejected'})
+        return rejection(error)
+    # The details (MongoDB topology, SDK internals) are for the log, not the client
+    print(f"Error in {where}: {str(error)}")
+    metrics.count_response({'type': 'error'})
+    return {'error': INTERNAL_ERROR_MESSAGE}, 500, {}
+
+
+def rejection(error):
+    """429 / 503 response for a request turned away by rate limiting or admission control."""
+    return error.body(), error.status, {'Retry-After': str(error.retry_after)}
+
+
+def local_events(payload):
+    return [sse_event('result', payload), sse_event('done', {'source': 'local'})]
+
+
+def error_event(error):
+    body, _, _ = failure(error, 'chat stream')
+    return sse_event('error', body)
+
+
+class StreamedReply:
+    """A reply being streamed to the client as Server-Sent Events.
+
+    feed() takes each chunk's parts and returns the 'token' events to send
+    now: function calls and JSON-looking text are held back until complete,
+    conversational text is forwarded as it arrives.
+    """
+
+    def __init__(self):
+        self.splitter = ReplySplitter()
+        self.parts = []
+        self._started = time.perf_counter()
+
+    @property
+    def text(self):
+        return self.splitter.text
+
+    def feed(self, chunk_parts):
+        if self._started is not None:
+            metrics.observe('llm_first_token', time.perf_counter() - self._started)
+            self._started = None
+        events = []
+        for part in chunk_parts:
+            self.parts.append(part)
+            text = self.splitter.feed(part.text) if part.text else ''
+            if text:
+                events.append(sse_event('token', {'text': text}))
+        return events
+
+    def final_events(self, payload):
+        """The 'result' and 'done' events for the reply's response body."""
+        events = []
+        if self.splitter.structured and payload['type'] == 'text':
+            # Looked like JSON but wasn't a task; send it as text after all
+            events.append(sse_event('token', {'text': self.text}))
+        events.append(sse_event('result', payload))
+        events.append(sse_event('done', {'source': LLM_BACKEND}))
+        return events
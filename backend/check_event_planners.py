@@ -2,6 +2,7 @@ from pymongo import MongoClient
 from dotenv import load_dotenv
 import os
 from event_planner_data import event_planners_data
+from cities import add_city_key
 
 # Load environment variables
 load_dotenv()
@@ -27,7 +28,7 @@ try:
         event_planners_collection.drop()
 
         # Insert event planner data
-        result = event_planners_collection.insert_many(event_planners_data)
+        result = event_planners_collection.insert_many([add_city_key(planner, 'city') for planner in event_planners_data])
         print(f"✅ Successfully imported {len(result.inserted_ids)} event planners")
     else:
         print("✅ Event planner data already exists")
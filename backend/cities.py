@@ -0,0 +1,111 @@
+"""
+City normalisation
+Maps the many ways a city gets written ("Bengaluru", "New Delhi", "Bandra,
+Mumbai") to one lowercase city_key, which venues and planners store and
+searches match exactly.
+"""
+import re
+
+# alias -> city_key
+CITY_ALIASES = {
+    'mumbai': 'mumbai',
+    'bombay': 'mumbai',
+    'delhi': 'delhi',
+    'new delhi': 'delhi',
+    'bangalore': 'bangalore',
+    'bengaluru': 'bangalore',
+    'jaipur': 'jaipur',
+    'hyderabad': 'hyderabad',
+    'chennai': 'chennai',
+    'madras': 'chennai',
+    'kolkata': 'kolkata',
+    'calcutta': 'kolkata',
+    'pune': 'pune',
+    'ahmedabad': 'ahmedabad',
+    'goa': 'goa',
+    'udaipur': 'udaipur',
+    'jodhpur': 'jodhpur',
+    'chandigarh': 'chandigarh',
+    'lucknow': 'lucknow',
+    'agra': 'agra',
+    'gurgaon': 'gurgaon',
+    'gurugram': 'gurgaon',
+    'noida': 'noida',
+    'kochi': 'kochi',
+    'cochin': 'kochi',
+}
+
+# city_key -> display name used in the catalog
+CITY_NAMES = {
+    'mumbai': 'Mumbai',
+    'delhi': 'Delhi',
+    'bangalore': 'Bangalore',
+    'jaipur': 'Jaipur',
+    'hyderabad': 'Hyderabad',
+    'chennai': 'Chennai',
+    'kolkata': 'Kolkata',
+    'pune': 'Pune',
+    'ahmedabad': 'Ahmedabad',
+    'goa': 'Goa',
+    'udaipur': 'Udaipur',
+    'jodhpur': 'Jodhpur',
+    'chandigarh': 'Chandigarh',
+    'lucknow': 'Lucknow',
+    'agra': 'Agra',
+    'gurgaon': 'Gurgaon',
+    'noida': 'Noida',
+    'kochi': 'Kochi',
+}
+
+# Trailing address parts that are never the city; states that share their name
+# with a known city (Goa, Delhi, Chandigarh) are matched as cities first
+REGION_NAMES = {
+    'india', 'andhra pradesh', 'arunachal pradesh', 'assam', 'bihar', 'chhattisgarh', 'gujarat',
+    'haryana', 'himachal pradesh', 'jharkhand', 'karnataka', 'kerala', 'madhya pradesh',
+    'maharashtra', 'manipur', 'meghalaya', 'mizoram', 'nagaland', 'odisha', 'orissa', 'punjab',
+    'rajasthan', 'sikkim', 'tamil nadu', 'telangana', 'tripura', 'uttar pradesh', 'uttarakhand',
+    'west bengal', 'jammu and kashmir', 'ladakh', 'puducherry', 'pondicherry', 'nct of delhi',
+    'andaman and nicobar islands', 'dadra and nagar haveli', 'daman and diu', 'lakshadweep',
+}
+
+# A PIN code, alone or after the state ("Maharashtra 410401")
+_PIN_PATTERN = re.compile(r'[\s-]*\b\d{3}\s?\d{3}\b\s*$')
+
+# Longest first so "new delhi" wins over "delhi"
+_ALIAS_PATTERN = re.compile(
+    r'\b(' + '|'.join(re.escape(alias) for alias in sorted(CITY_ALIASES, key=len, reverse=True)) + r')\b'
+)
+
+
+def find_city_key(text):
+    """city_key of the first known city mentioned in text, or None."""
+    match = _ALIAS_PATTERN.search(text.lower())
+    return CITY_ALIASES[match.group(1)] if match else None
+
+
+def city_key(name):
+    """Normalise a city name or address ("Indiranagar, Bengaluru") to its city_key.
+
+    Addresses end with the city, then maybe the state, PIN code and country,
+    so the city is the last part that isn't one of those. Earlier parts are
+    ignored: "Old Mumbai-Pune Hwy, Lonavala, Maharashtra" is in Lonavala.
+    """
+    if not name:
+        return None
+    for part in reversed(name.split(',')):
+        part = ' '.join(_PIN_PATTERN.sub('', part).lower().split())
+        if not part:
+            continue
+        if part in CITY_ALIASES:
+            return CITY_ALIASES[part]
+        if part in REGION_NAMES:
+            continue
+        # "Delhi NCR", "Bandra West Mumbai"; an unknown city is kept as written
+        return find_city_key(part) or part
+    return None
+
+
+def add_city_key(doc, field):
+    """Set doc['city_key'] from doc[field]; used by every script that writes venues or planners."""
+    doc['city_key'] = city_key(doc.get(field))
+    return doc
@@ -0,0 +1,140 @@
+"""
+Per-session conversation storage
+Keeps each chat session's turns separately, capped per session, with either an
+in-process LRU store or a MongoDB collection shared between workers.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timezone
+
+# Messages kept per session (user and model turns both count)
+MAX_TURNS = int(os.getenv('CONVERSATION_MAX_TURNS', '40'))
+# Sessions kept in memory before the least recently used one is dropped
+MAX_SESSIONS = int(os.getenv('CONVERSATION_MAX_SESSIONS', '10000'))
+# Seconds a session may sit idle before it is forgotten
+IDLE_TTL = int(os.getenv('CONVERSATION_IDLE_TTL', '3600'))
+
+# turns: the kept messages; total: messages ever appended to the session;
+# summary / summary_covers: rolling summary of the first summary_covers messages
+Conversation = namedtuple('Conversation', ['turns', 'total', 'summary', 'summary_covers'])
+EMPTY_CONVERSATION = Conversation([], 0, None, 0)
+
+
+def _check_max_turns(max_turns):
+    # A session has to keep at least the turn just added
+    if max_turns < 1:
+        raise ValueError(f"CONVERSATION_MAX_TURNS must be at least 1, got {max_turns}")
+    return max_turns
+
+
+class _Session:
+    __slots__ = ('last_access', 'turns', 'total', 'summary', 'summary_covers')
+
+    def __init__(self):
+        self.last_access = 0
+        self.turns = []
+        self.total = 0
+        self.summary = None
+        self.summary_covers = 0
+
+
+class MemoryConversationStore:
+    """Thread-safe in-process store with LRU and idle-time eviction."""
+
+    def __init__(self, max_turns=MAX_TURNS, max_sessions=MAX_SESSIONS, idle_ttl=IDLE_TTL):
+        self.max_turns = _check_max_turns(max_turns)
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self._sessions = OrderedDict()  # session id -> _Session
+        self._lock = threading.Lock()
+
+    def _evict(self, now):
+        # Entries are kept in access order, so idle ones are always at the front
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.last_access <= self.idle_ttl and len(self._sessions) <= self.max_sessions:
+                break
+            del self._sessions[session_id]
+
+    def get(self, session_id):
+        now = time.monotonic()
+        with self._lock:
+            self._evict(now)
+            session = self._sessions.get(session_id)
+            if session is None:
+                return EMPTY_CONVERSATION
+            session.last_access = now
+            self._sessions.move_to_end(session_id)
+            return Conversation(list(session.turns), session.total, session.summary, session.summary_covers)
+
+    def append(self, session_id, *turns):
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.pop(session_id, None) or _Session()
+            session.last_access = now
+            session.turns.extend(turns)
+            session.total += len(turns)
+            del session.turns[:-self.max_turns]
+            self._sessions[session_id] = session
+            self._evict(now)
+
+    def set_summary(self, session_id, summary, covers):
+        with self._lock:
+            session = self._sessions.get(session_id)
+            # Never replace a summary with an older one
+            if session is not None and covers > session.summary_covers:
+                session.summary = summary
+                session.summary_covers = covers
+
+    def clear(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+
+class MongoConversationStore:
+    """Store backed by a MongoDB collection so every worker sees the same sessions."""
+
+    def __init__(self, collection, max_turns=MAX_TURNS):
+        # Idle sessions expire through the TTL index in indexes.STORE_INDEXES
+        self.collection = collection
+        self.max_turns = _check_max_turns(max_turns)
+
+    def get(self, session_id):
+        doc = self.collection.find_one({'_id': session_id})
+        if not doc:
+            return EMPTY_CONVERSATION
+        return Conversation(doc.get('turns', []), doc.get('total', 0),
+                            doc.get('summary'), doc.get('summary_covers', 0))
+
+    def append(self, session_id, *turns):
+        self.collection.update_one(
+            {'_id': session_id},
+            {
+                '$push': {'turns': {'$each': list(turns), '$slice': -self.max_turns}},
+                '$inc': {'total': len(turns)},
+                '$set': {'updated_at': datetime.now(timezone.utc)}
+            },
+            upsert=True
+        )
+
+    def set_summary(self, session_id, summary, covers):
+        # Never replace a summary with an older one
+        self.collection.update_one(
+            {'_id': session_id, 'summary_covers': {'$not': {'$gte': covers}}},
+            {'$set': {'summary': summary, 'summary_covers': covers}}
+        )
+
+    def clear(self, session_id):
+        self.collection.delete_one({'_id': session_id})
+
+
+def create_store(conversations_collection):
+    """Build the store selected by CONVERSATION_STORE ('memory' or 'mongo')."""
+    backend = os.getenv('CONVERSATION_STORE', 'memory').lower()
+    if backend == 'mongo':
+        return MongoConversationStore(conversations_collection)
+    if backend != 'memory':
+        raise ValueError(f"Unknown CONVERSATION_STORE: {backend}")
+    return MemoryConversationStore()
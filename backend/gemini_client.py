@@ -0,0 +1,189 @@
+"""
+Process-wide Gemini client
+Configures the SDK once per process and hands out cached GenerativeModel
+instances, so requests reuse the same transport instead of re-reading the key,
+re-configuring and rebuilding the model every time.
+
+The SDK takes most of a second to import, so it is only imported once a model
+is actually needed; importing this module for GEMINI_MODEL stays cheap.
+
+With CONTEXT_CACHE=gemini, model_for() registers a prompt's static prefix
+(system instruction and tools) as a Gemini CachedContent once and sends only
+its handle with each request. CONTEXT_CACHE=local runs the same lookup, renew
+and create steps against LocalCachedContent, an in-process stand-in that
+records every call, for tests and offline development; requests then send the
+prompt inline as with CONTEXT_CACHE=off.
+"""
+import copy
+import datetime
+import os
+import threading
+import time
+
+GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'gemini-2.5-flash')
+
+# off | gemini | local
+CONTEXT_CACHE = os.getenv('CONTEXT_CACHE', 'off')
+CONTEXT_CACHE_TTL = int(os.getenv('CONTEXT_CACHE_TTL', '3600'))
+# Renew this long before the cache expires; failed creations are retried after it
+CONTEXT_CACHE_REFRESH = 300
+
+_lock = threading.Lock()
+_configured = False
+_models = {}
+_cache_lock = threading.Lock()
+# (model name, prompt name, version) -> (model, renew at)
+_cached_models = {}
+
+
+def configure():
+    """Configure the SDK with GEMINI_API_KEY; safe to call repeatedly."""
+    global _configured
+    with _lock:
+        if not _configured:
+            import google.generativeai as genai
+            genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
+            _configured = True
+
+
+def get_model(system_instruction, model_name=GEMINI_MODEL, tools=None, tool_config=None):
+    """Return the shared model for this model name, system instruction and tool set.
+
+    tools / tool_config are expected to be module-level constants, so they are
+    keyed by identity.
+    """
+    key = (model_name, system_instruction, id(tools), id(tool_config))
+    model = _models.get(key)
+    if model is not None:
+        return model
+
+    configure()
+    import google.generativeai as genai
+    with _lock:
+        model = _models.get(key)
+        if model is None:
+            # The SDK converts tool_config in place; keep the shared constant plain JSON
+            model = genai.GenerativeModel(
+                model_name=model_name,
+                system_instruction=system_instruction,
+                tools=tools,
+                tool_config=copy.deepcopy(tool_config)
+            )
+            _models[key] = model
+    return model
+
+
+def _cache_name(prompt):
+    return f"dwed-{prompt.name}-v{prompt.version}"
+
+
+class LocalCachedContent:
+    """In-process stand-in for caching.CachedContent, recording each call in calls."""
+
+    # Shared like the server-side caches are: (call, display name) in call order
+    calls = []
+    caches = []
+
+    def __init__(self, model, display_name, ttl):
+        self.name = f"cachedContents/local-{display_name}"
+        self.model = f"models/{model}"
+        self.display_name = display_name
+        self.expire_time = datetime.datetime.now(datetime.timezone.utc) + ttl
+
+    @classmethod
+    def list(cls):
+        cls.calls.append(('lookup', None))
+        return list(cls.caches)
+
+    @classmethod
+    def create(cls, model, display_name, ttl, **content):
+        cls.calls.append(('create', display_name))
+        cache = cls(model, display_name, ttl)
+        cls.caches.append(cache)
+        return cache
+
+    def update(self, ttl):
+        self.calls.append(('update', self.display_name))
+        self.expire_time = datetime.datetime.now(datetime.timezone.utc) + ttl
+
+    @classmethod
+    def clear(cls):
+        cls.calls.clear()
+        cls.caches.clear()
+
+
+def _register(cached_content, prompt, model_name):
+    """The context cache for prompt, extending another worker's when it has registered one."""
+    ttl = datetime.timedelta(seconds=CONTEXT_CACHE_TTL)
+    for cache in cached_content.list():
+        if cache.display_name == _cache_name(prompt) and cache.model.endswith(model_name):
+            cache.update(ttl=ttl)
+            return cache
+    return cached_content.create(
+        model=model_name,
+        display_name=_cache_name(prompt),
+        system_instruction=prompt.text,
+        tools=prompt.tools,
+        tool_config=copy.deepcopy(prompt.tool_config),
+        ttl=ttl
+    )
+
+
+def _gemini_cached_model(prompt, model_name):
+    import google.generativeai as genai
+    from google.generativeai import caching
+    return genai.GenerativeModel.from_cached_content(_register(caching.CachedContent, prompt, model_name))
+
+
+def _local_cached_model(prompt, model_name):
+    _register(LocalCachedContent, prompt, model_name)
+    return get_model(prompt.text, model_name, prompt.tools, prompt.tool_config)
+
+
+CACHED_MODELS = {
+    'gemini': _gemini_cached_model,
+    'local': _local_cached_model,
+}
+
+
+def model_for(prompt, model_name=GEMINI_MODEL):
+    """Model for a prompts.Prompt, through the context cache when CONTEXT_CACHE is on."""
+    if CONTEXT_CACHE not in CACHED_MODELS:
+        return get_model(prompt.text, model_name, prompt.tools, prompt.tool_config)
+
+    key = (model_name, prompt.name, prompt.version)
+    entry = _cached_models.get(key)
+    if entry is not None and entry[1] > time.monotonic():
+        return entry[0]
+
+    configure()
+    with _cache_lock:
+        entry = _cached_models.get(key)
+        if entry is not None and entry[1] > time.monotonic():
+            return entry[0]
+        try:
+            model = CACHED_MODELS[CONTEXT_CACHE](prompt, model_name)
+            renew_at = time.monotonic() + max(CONTEXT_CACHE_TTL - CONTEXT_CACHE_REFRESH, 1)
+        except Exception as e:
+            # e.g. the prompt is below the model's minimum cacheable size; send it inline
+            print(f"Error creating context cache for {_cache_name(prompt)}: {str(e)}")
+            model = get_model(prompt.text, model_name, prompt.tools, prompt.tool_config)
+            renew_at = time.monotonic() + CONTEXT_CACHE_REFRESH
+        _cached_models[key] = (model, renew_at)
+    return model
+
+
+def reset():
+    """Drop the configured client and cached models (used in forked workers)."""
+    global _configured, _lock, _cache_lock
+    # The parent's locks may have been held at fork time, so start with fresh ones
+    _lock = threading.Lock()
+    _cache_lock = threading.Lock()
+    _configured = False
+    _models.clear()
+    _cached_models.clear()
+
+
+# gRPC channels must not be shared across fork(), so each worker builds its own
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=reset)
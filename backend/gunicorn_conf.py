@@ -0,0 +1,99 @@
+"""
+Gunicorn settings for the DWed API
+Preforked worker processes, each serving requests on a pool of threads
+(SSE streams and model calls spend most of their time waiting, so threads
+rather than processes carry the concurrency). The app is imported once in the
+master and forked, so workers start fast and share the catalog loaded before
+the fork; post_fork then gives each worker its own MongoDB client and
+background threads.
+
+Run with: gunicorn -c gunicorn_conf.py 'app:create_app()'   (or python serve.py)
+
+  HOST, PORT                   address to listen on (0.0.0.0:5000)
+  WEB_CONCURRENCY              worker processes (one per CPU with CONVERSATION_STORE=mongo,
+                               otherwise 1)
+  SERVER_THREADS               threads per worker (8)
+  SERVER_PRELOAD               import the app before forking (1)
+  SERVER_KEEPALIVE             seconds an idle keep-alive connection stays open (5);
+                               set above a load balancer's idle timeout
+  SERVER_TIMEOUT               seconds before a worker that stops responding is restarted (60)
+  SERVER_GRACEFUL_TIMEOUT      seconds in-flight requests get to finish on shutdown (30)
+  SERVER_MAX_REQUESTS          restart a worker after this many requests, 0 for never (0)
+  SERVER_MAX_REQUESTS_JITTER   random extra requests so workers don't restart together (0)
+  SERVER_ACCESS_LOG            1 to log every request to stdout (0)
+
+Every worker keeps its own in-memory state. Running more than one needs
+CONVERSATION_STORE=mongo, or a session's follow-up questions land on workers
+that never saw its earlier turns; RATE_LIMIT_BACKEND=mongo too, or each
+worker allows a client the full rate. The reply cache stays per worker. So
+WEB_CONCURRENCY defaults to 1 with the memory conversation store, and boot
+warns when it is raised without the MongoDB stores.
+
+With more than one worker, set PROMETHEUS_MULTIPROC_DIR to a directory so
+/metrics adds up every worker instead of reporting whichever one answered.
+serve.py empties it before starting; it must be empty at startup.
+"""
+import os
+import sys
+
+HOST = os.getenv('HOST', '0.0.0.0')
+PORT = int(os.getenv('PORT', '5000'))
+
+# Sessions only survive moving between workers when they are kept in MongoDB
+SHARED_SESSIONS = os.getenv('CONVERSATION_STORE', 'memory').lower() == 'mongo'
+
+bind = f'{HOST}:{PORT}'
+workers = int(os.getenv('WEB_CONCURRENCY', str(os.cpu_count() or 1) if SHARED_SESSIONS else '1'))
+worker_class = 'gthread'
+threads = int(os.getenv('SERVER_THREADS', '8'))
+preload_app = os.getenv('SERVER_PRELOAD', '1') != '0'
+keepalive = int(os.getenv('SERVER_KEEPALIVE', '5'))
+timeout = int(os.getenv('SERVER_TIMEOUT', '60'))
+graceful_timeout = int(os.getenv('SERVER_GRACEFUL_TIMEOUT', '30'))
+max_requests = int(os.getenv('SERVER_MAX_REQUESTS', '0'))
+max_requests_jitter = int(os.getenv('SERVER_MAX_REQUESTS_JITTER', '0'))
+accesslog = '-' if os.getenv('SERVER_ACCESS_LOG', '0') != '0' else None
+
+
+def worker_warnings():
+    """Problems with running this many workers on per-process state, one line each."""
+    if workers <= 1:
+        return []
+    problems = []
+    if not SHARED_SESSIONS:
+        problems.append(
+            f"{workers} workers with CONVERSATION_STORE=memory: each worker has its own sessions, "
+            "so follow-up turns lose their history. Set CONVERSATION_STORE=mongo or WEB_CONCURRENCY=1"
+        )
+    shared_limits = os.getenv('RATE_LIMIT_BACKEND', 'memory').lower() == 'mongo'
+    if not shared_limits and float(os.getenv('RATE_LIMIT_RATE', '1')) > 0:
+        problems.append(
+            f"{workers} workers with RATE_LIMIT_BACKEND=memory: each worker keeps its own buckets, "
+            f"so clients get up to {workers}x RATE_LIMIT_RATE. Set RATE_LIMIT_BACKEND=mongo"
+        )
+    return problems
+
+
+def on_starting(server):
+    for problem in worker_warnings():
+        print(f"⚠️ Warning: {problem}")
+
+
+def post_fork(server, worker):
+    # Without preloading the worker imports the app itself and has nothing to redo
+    resources_module = sys.modules.get('resources')
+    if resources_module is not None:
+        resources_module.resources.after_fork()
+
+
+def worker_exit(server, worker):
+    # In-flight requests have finished by now; close MongoDB connections cleanly
+    resources_module = sys.modules.get('resources')
+    if resources_module is not None:
+        resources_module.resources.close()
+
+
+def child_exit(server, worker):
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,79 @@
+"""
+Columnar index over banquet halls
+Parallel NumPy arrays (one entry per hall: capacity, price, owning venue row,
+city code) so the catalog can apply capacity windows, price bounds and the
+city filter to every hall at once and only build cards for one page of venues.
+
+NumPy is optional; catalog.py falls back to checking venues one at a time
+when it isn't installed.
+"""
+import math
+from cities import city_key
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+NUMPY_AVAILABLE = np is not None
+
+
+def _number(value):
+    # records.Venue has already rejected non-numbers, so only missing values remain
+    return math.nan if value is None else float(value)
+
+
+class HallIndex:
+    def __init__(self, venues):
+        """Index the halls of venues, records.Venue records already in search order (row = position)."""
+        self.venue_count = len(venues)
+        self.city_codes = {}
+        self.venue_city = np.fromiter(
+            (self.city_codes.setdefault(venue.city_key, len(self.city_codes)) for venue in venues),
+            dtype=np.int32, count=len(venues)
+        )
+
+        capacity, price, rows = [], [], []
+        for row, venue in enumerate(venues):
+            for hall in venue.banquets:
+                capacity.append(_number(hall.capacity))
+                price.append(_number(hall.price))
+                rows.append(row)
+
+        # Missing values are NaN, which fails every comparison, just as
+        # MongoDB's range operators skip halls without the field
+        self.hall_capacity = np.array(capacity, dtype=np.float64)
+        self.hall_price = np.array(price, dtype=np.float64)
+        self.hall_venue = np.array(rows, dtype=np.int32)
+        self.hall_city = self.venue_city[self.hall_venue]
+
+    def rows(self, filters, capacity_window, start=0):
+        """Rows of the venues matching filters, in order, from row start on."""
+        code = None
+        if 'location' in filters:
+            code = self.city_codes.get(city_key(filters['location']))
+            if code is None:
+                return np.empty(0, dtype=np.int32)
+
+        capacity = filters.get('capacity')
+        price_min, price_max = filters.get('price_min'), filters.get('price_max')
+
+        if capacity is None and price_min is None and price_max is None:
+            # No hall condition: venues without any halls still count
+            if code is None:
+                return np.arange(start, self.venue_count)
+            rows = np.flatnonzero(self.venue_city == code)
+        else:
+            # One hall has to satisfy every condition (the $elemMatch in search.py)
+            mask = np.ones(len(self.hall_venue), dtype=bool)
+            if code is not None:
+                mask &= self.hall_city == code
+            if capacity is not None:
+                mask &= (self.hall_capacity >= capacity) & (self.hall_capacity <= capacity + capacity_window)
+            if price_min is not None:
+                mask &= self.hall_price >= price_min
+            if price_max is not None:
+                mask &= self.hall_price <= price_max
+            rows = np.unique(self.hall_venue[mask])
+
+        return rows[np.searchsorted(rows, start):]
@@ -0,0 +1,146 @@
+"""
+Prompt history compaction
+Builds the message list sent to Gemini from a session's stored conversation:
+the most recent turns go verbatim, older turns are folded into a rolling summary
+(written in the background, off the request path), structured task replies are
+shrunk to their filters, and the whole history is kept under a token budget.
+"""
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Most recent messages always sent verbatim
+VERBATIM_TURNS = int(os.getenv('HISTORY_VERBATIM_TURNS', '8'))
+# Upper bound on history tokens per prompt (system instruction not included)
+TOKEN_BUDGET = int(os.getenv('HISTORY_TOKEN_BUDGET', '3000'))
+# Use the SDK's count_tokens call instead of the calibrated estimate (costs a round trip)
+EXACT_TOKEN_COUNT = os.getenv('HISTORY_EXACT_TOKENS', '0') == '1'
+
+
+def compact_turn(turn):
+    """Reduce structured task replies to just their task and filters."""
+    if turn['role'] != 'model':
+        return turn
+    try:
+        parsed = json.loads(turn['content'])
+    except (TypeError, ValueError):
+        return turn
+    if not isinstance(parsed, dict) or 'task' not in parsed:
+        return turn
+    compact = {'task': parsed['task'], 'filters': parsed.get('filters', {})}
+    return {'role': 'model', 'content': json.dumps(compact, separators=(',', ':'))}
+
+
+def to_messages(turns):
+    return [{'role': turn['role'], 'parts': [turn['content']]} for turn in turns]
+
+
+class TokenCounter:
+    """Estimates prompt tokens from character counts, calibrated by real usage.
+
+    Gemini reports prompt_token_count on every response; observe() feeds those
+    numbers back so the chars-per-token ratio tracks the real tokenizer without
+    an extra count_tokens round trip per request.
+    """
+
+    def __init__(self, chars_per_token=4.0):
+        self.chars_per_token = chars_per_token
+        self._lock = threading.Lock()
+
+    def estimate(self, messages):
+        chars = sum(len(part) for message in messages for part in message['parts'])
+        return int(chars / self.chars_per_token) + 4 * len(messages)
+
+    def count(self, model, messages, static_tokens=0):
+        if EXACT_TOKEN_COUNT and model is not None:
+            # count_tokens includes the model's system instruction and tools
+            return model.count_tokens(messages).total_tokens - static_tokens
+        return self.estimate(messages)
+
+    def observe(self, chars, prompt_tokens):
+        if chars <= 0 or (prompt_tokens or 0) <= 0:
+            return
+        with self._lock:
+            # Exponential moving average keeps one odd response from skewing the ratio
+            self.chars_per_token = 0.9 * self.chars_per_token + 0.1 * (chars / prompt_tokens)
+
+
+class HistoryCompactor:
+    def __init__(self, store, summary_model_factory, verbatim_turns=VERBATIM_TURNS,
+                 token_budget=TOKEN_BUDGET, static_tokens=0):
+        """static_tokens is the chat model's system prompt size (prompts.static_tokens)."""
+        self.store = store
+        self.summary_model_factory = summary_model_factory
+        self.verbatim_turns = verbatim_turns
+        self.token_budget = token_budget
+        self.static_tokens = static_tokens
+        self.tokens = TokenCounter()
+        self.reset()
+
+    def reset(self):
+        """Fresh summary threads and locks (used in forked workers)."""
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='history-summary')
+        self._pending = set()
+        self._pending_lock = threading.Lock()
+
+    def build(self, session_id, conversation, user_turn, model=None):
+        """Return Gemini messages for this session's history plus the new user turn."""
+        turns = conversation.turns
+        first_index = conversation.total - len(turns)
+        split = max(len(turns) - self.verbatim_turns, 0)
+
+        # Older turns the summary doesn't cover yet still go verbatim until it catches up
+        covered = max(conversation.summary_covers - first_index, 0)
+        unsummarised = turns[covered:split]
+        if unsummarised:
+            self._schedule_summary(session_id, conversation.summary, unsummarised,
+                                   first_index + split)
+
+        history = [compact_turn(turn) for turn in turns[covered:]]
+        prefix = []
+        if conversation.summary:
+            prefix = [
+                {'role': 'user', 'content': 'Summary of our conversation so far: ' + conversation.summary},
+                {'role': 'model', 'content': 'Thanks, I have that context.'},
+            ]
+
+        messages = to_messages(prefix + history + [user_turn])
+        start = len(prefix)
+        # Drop the oldest turns (never the summary or the new message) until within budget
+        while len(messages) > start + 1 and self.tokens.count(model, messages, self.static_tokens) > self.token_budget:
+            del messages[start]
+            # Keep user/model alternation: history after the prefix starts with a user turn
+            while len(messages) > start + 1 and messages[start]['role'] != 'user':
+                del messages[start]
+        return messages
+
+    def observe_usage(self, messages, response):
+        usage = getattr(response, 'usage_metadata', None)
+        if usage is not None:
+            chars = sum(len(part) for message in messages for part in message['parts'])
+            prompt_tokens = getattr(usage, 'prompt_token_count', 0)
+            # The reported count includes the system prompt, which the estimate doesn't cover
+            self.tokens.observe(chars, prompt_tokens - self.static_tokens if prompt_tokens else 0)
+
+    def _schedule_summary(self, session_id, previous_summary, turns, covers):
+        with self._pending_lock:
+            if session_id in self._pending:
+                return
+            self._pending.add(session_id)
+        self._executor.submit(self._summarise, session_id, previous_summary, list(turns), covers)
+
+    def _summarise(self, session_id, previous_summary, turns, covers):
+        try:
+            transcript = '\n'.join(
+                f"{'User' if turn['role'] == 'user' else 'DWed'}: {compact_turn(turn)['content']}"
+                for turn in turns
+            )
+            prompt = f"Existing summary:\n{previous_summary or '(none)'}\n\nNew messages:\n{transcript}\n\nUpdated summary:"
+            response = self.summary_model_factory().generate_content(prompt)
+            self.store.set_summary(session_id, response.text.strip(), covers)
+        except Exception as e:
+            print(f"Error summarising conversation {session_id}: {str(e)}")
+        finally:
+            with self._pending_lock:
+                self._pending.discard(session_id)
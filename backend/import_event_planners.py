@@ -2,6 +2,7 @@ from pymongo import MongoClient
 from dotenv import load_dotenv
 import os
 from event_planner_data import event_planners_data
+from cities import add_city_key
 
 # Load environment variables
 load_dotenv()
@@ -18,6 +19,6 @@ event_planners_collection = db['event_planners']
 event_planners_collection.drop()
 
 # Insert event planner data
-event_planners_collection.insert_many(event_planners_data)
+event_planners_collection.insert_many([add_city_key(planner, 'city') for planner in event_planners_data])
 
 print("Event planner data added successfully!")
\ No newline at end of file
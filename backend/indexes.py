@@ -0,0 +1,137 @@
+"""
+MongoDB index provisioning for the venues and event_planners collections
+Declares the indexes matching the query shapes search.py builds, creates any
+that are missing (idempotent, so it is safe at every startup) and reports on
+missing or unused ones.
+
+Run with: python indexes.py           (create missing indexes)
+          python indexes.py --check   (report only)
+"""
+import argparse
+import os
+import sys
+import threading
+import pymongo
+from dotenv import load_dotenv
+from pymongo import IndexModel, ASCENDING, DESCENDING
+from conversation_store import IDLE_TTL
+
+# collection -> indexes used by the queries and sort order in search.py
+INDEXES = {
+    'venues': [
+        # City search in result order (rating, then _id for keyset paging)
+        IndexModel([('city_key', ASCENDING), ('rating', DESCENDING), ('_id', ASCENDING)],
+                   name='city_rating_id'),
+        # City search, optionally narrowed to a hall's capacity and price
+        IndexModel([('city_key', ASCENDING), ('banquets.capacity', ASCENDING), ('banquets.price', ASCENDING)],
+                   name='city_hall_capacity_price'),
+        # Capacity / price searches without a city
+        IndexModel([('banquets.capacity', ASCENDING), ('banquets.price', ASCENDING)],
+                   name='hall_capacity_price'),
+    ],
+    'event_planners': [
+        IndexModel([('city_key', ASCENDING), ('rating', DESCENDING), ('_id', ASCENDING)],
+                   name='city_rating_id'),
+        IndexModel([('city_key', ASCENDING), ('min_budget', ASCENDING)], name='city_key_min_budget'),
+        IndexModel([('event_types', ASCENDING), ('min_budget', ASCENDING)], name='event_types_min_budget'),
+    ],
+}
+
+
+# Indexes for the MongoDB-backed session stores, created when that store is in use
+STORE_INDEXES = {
+    # MongoDB drops sessions on its own once updated_at is older than the idle TTL
+    'conversations': [
+        IndexModel([('updated_at', ASCENDING)], name='updated_at_ttl', expireAfterSeconds=IDLE_TTL),
+    ],
+    # A bucket left alone until it would be full again carries no state worth keeping
+    'rate_limits': [
+        IndexModel([('expires_at', ASCENDING)], name='expires_at_ttl', expireAfterSeconds=0),
+    ],
+}
+
+
+def _key(spec):
+    return tuple((field, int(direction)) for field, direction in spec)
+
+
+def ensure_indexes(db, indexes=INDEXES):
+    """Create every declared index that is missing; returns the names created."""
+    created = []
+    for collection_name, models in indexes.items():
+        collection = db[collection_name]
+        existing = {_key(info['key'].items()) for info in collection.list_indexes()}
+        missing = [model for model in models if _key(model.document['key'].items()) not in existing]
+        if missing:
+            created.extend(collection.create_indexes(missing))
+    return created
+
+
+def ensure_indexes_in_background(db, indexes=INDEXES):
+    """Run ensure_indexes on a daemon thread so startup doesn't wait for index builds."""
+    def run():
+        try:
+            created = ensure_indexes(db, indexes)
+            if created:
+                print(f"Created indexes: {', '.join(created)}")
+        except Exception as e:
+            print(f"Error ensuring indexes: {str(e)}")
+
+    thread = threading.Thread(target=run, name='ensure-indexes', daemon=True)
+    thread.start()
+    return thread
+
+
+def index_report(db):
+    """Declared indexes that are missing, plus existing ones with no recorded use.
+
+    Usage counts come from $indexStats and reset when mongod restarts, so an
+    "unused" index is only a candidate for removal after a representative uptime.
+    """
+    report = {}
+    for collection_name, models in INDEXES.items():
+        collection = db[collection_name]
+        existing = {info['name']: _key(info['key'].items()) for info in collection.list_indexes()}
+        declared = {_key(model.document['key'].items()): model.document['name'] for model in models}
+
+        try:
+            usage = {stat['name']: stat['accesses']['ops'] for stat in collection.aggregate([{'$indexStats': {}}])}
+        except pymongo.errors.OperationFailure:
+            # $indexStats needs clusterMonitor-style privileges on some hosted tiers
+            usage = {}
+
+        report[collection_name] = {
+            'missing': [name for key, name in declared.items() if key not in existing.values()],
+            'undeclared': [name for name, key in existing.items() if name != '_id_' and key not in declared],
+            'unused': [name for name in existing if name != '_id_' and usage.get(name) == 0],
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Create or check MongoDB indexes for DWed')
+    parser.add_argument('--check', action='store_true', help='only report missing / unused indexes')
+    args = parser.parse_args()
+
+    load_dotenv()
+    client = pymongo.MongoClient(os.getenv('MONGO_URI'))
+    db = client['venue_db']
+
+    if not args.check:
+        created = ensure_indexes(db)
+        print(f"✅ Created {len(created)} index(es){': ' + ', '.join(created) if created else ''}")
+
+    problems = False
+    for collection_name, entry in index_report(db).items():
+        print(f"\n📦 {collection_name}")
+        for label, names in entry.items():
+            print(f"  {label}: {', '.join(names) if names else '-'}")
+        problems = problems or bool(entry['missing'])
+
+    client.close()
+    # Non-zero exit lets deploy scripts fail on missing indexes in --check mode
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,202 @@
+"""
+Local intent and slot extraction
+Recognises formulaic venue / planner searches ("venue in Delhi for 500 people")
+and turns them into the same {"task": ..., "filters": ...} object Gemini would
+return, so they can skip the LLM round trip. Anything ambiguous or
+conversational returns None and goes to Gemini as before.
+"""
+import re
+from cities import CITY_ALIASES, CITY_NAMES, find_city_key
+
+VENUE_WORDS = {
+    'venue', 'venues', 'banquet', 'banquets', 'hall', 'halls', 'hotel', 'hotels',
+    'resort', 'resorts', 'lawn', 'lawns', 'farmhouse', 'farmhouses',
+}
+PLANNER_WORDS = {
+    'planner', 'planners', 'organiser', 'organisers', 'organizer', 'organizers',
+    'coordinator', 'coordinators',
+}
+SEARCH_WORDS = {'find', 'show', 'search', 'list', 'need', 'want', 'looking', 'get', 'book', 'suggest'}
+
+STYLE_WORDS = {
+    'traditional': 'traditional',
+    'classic': 'traditional',
+    'modern': 'modern',
+    'contemporary': 'modern',
+    'luxury': 'luxury',
+    'luxurious': 'luxury',
+    'premium': 'luxury',
+    'lavish': 'luxury',
+}
+
+# Anything that refers back to earlier turns or asks for advice needs Gemini
+CONVERSATIONAL_WORDS = {
+    'what', 'why', 'how', 'which', 'who', 'when', 'tell', 'explain', 'compare',
+    'vs', 'versus', 'better', 'best', 'difference', 'idea', 'ideas', 'tips',
+    'those', 'them', 'that', 'these', 'it', 'same', 'instead', 'also', 'more',
+    'another', 'other', 'else', 'cheaper', 'bigger', 'smaller', 'not', 'no',
+    'without', 'except', 'thanks', 'thank',
+}
+
+# Words that may legitimately follow "in"/"at" without being a city
+PLACE_STOPWORDS = {'the', 'a', 'an', 'my', 'our', 'your', 'budget', 'total', 'range', 'india'}
+
+GUEST_WORDS = r'(?:people|guests?|persons?|pax|attendees|heads)'
+PRICE_WORDS = r'(?:per\s+plate|per\s+head|a\s+plate|a\s+head|/\s*plate|/\s*head|per\s+person)'
+
+UNITS = {
+    'k': 1000, 'thousand': 1000,
+    'l': 100000, 'lakh': 100000, 'lakhs': 100000, 'lac': 100000, 'lacs': 100000,
+    'cr': 10000000, 'crore': 10000000, 'crores': 10000000,
+}
+
+NUMBER = r'(?:rs\.?|inr|₹)?\s*(\d[\d,]*(?:\.\d+)?)\s*(k|thousand|lakhs?|lacs?|l|crores?|cr)?\b'
+UPPER_BOUND = r'(?:under|below|less\s+than|upto|up\s+to|max(?:imum)?|within|at\s+most)'
+LOWER_BOUND = r'(?:above|over|more\s+than|min(?:imum)?|at\s+least|from|starting\s+at)'
+
+# A bare "for 2" followed by one of these is a duration, not a head count
+DURATION_WORDS = r'(?:days?|nights?|hours?|hrs?|weeks?|months?|years?)'
+
+# Amounts of money rather than head counts
+CURRENCY = r'(?:rs\.?|inr|₹|rupees?)'
+
+# More guests than any hall seats; a number this large after "for" is money
+MAX_GUESTS = 10000
+
+# Venue prices are per plate; an amount this large is a total budget, which
+# venue filters can't express, so such messages go to Gemini
+PER_PLATE_LIMIT = 100000
+
+MAX_WORDS = 20
+
+
+def _to_number(digits, unit):
+    value = float(digits.replace(',', ''))
+    if unit:
+        value *= UNITS[unit.lower()]
+    return int(value)
+
+
+def _find_city(text):
+    key = find_city_key(text)
+    return CITY_NAMES[key] if key else None
+
+
+def _has_unknown_place(text):
+    for match in re.finditer(r'\b(?:in|at|near|around)\s+([a-z]+)', text):
+        if match.group(1) in PLACE_STOPWORDS:
+            continue
+        # Multi-word aliases like "new delhi" start at the captured word
+        rest = text[match.start(1):]
+        if not any(re.match(re.escape(alias) + r'\b', rest) for alias in CITY_ALIASES):
+            return True
+    return False
+
+
+def _extract_numbers(text, task):
+    """Pull capacity and money bounds out of the message.
+
+    Returns (filters, leftover) where leftover is the text with every
+    recognised number removed, so callers can tell whether anything numeric
+    was left unexplained, or None when the numbers don't fit the task's
+    filters.
+    """
+    filters = {}
+    venue = task == 'find_venue'
+    low_key, high_key = ('price_min', 'price_max') if venue else ('budget_min', 'budget_max')
+
+    # Guest counts: "500 people", "for 300 guests", "over 200 pax"; planner
+    # filters have no capacity, so for planners the count is just consumed
+    match = re.search(r'(?:' + LOWER_BOUND + r'\s+)?' + NUMBER + r'\s*' + GUEST_WORDS, text)
+    if match:
+        if venue:
+            filters['capacity'] = _to_number(match.group(1), match.group(2))
+        text = text[:match.start()] + ' ' + text[match.end():]
+
+    # Ranges: "between 1000 and 2000", "1000-2000", "10 to 15 lakhs"
+    match = re.search(r'(?:between\s+)?' + NUMBER + r'\s*(?:-|to|and)\s*' + NUMBER, text)
+    if match:
+        unit = match.group(4)
+        filters[low_key] = _to_number(match.group(1), match.group(2) or unit)
+        filters[high_key] = _to_number(match.group(3), unit)
+        text = text[:match.start()] + ' ' + text[match.end():]
+
+    for bound, key in ((UPPER_BOUND, high_key), (LOWER_BOUND, low_key)):
+        match = re.search(bound + r'\s+' + NUMBER, text)
+        if match and key not in filters:
+            filters[key] = _to_number(match.group(1), match.group(2))
+            text = text[:match.start()] + ' ' + text[match.end():]
+
+    # "1500 per plate" / (planners) "budget of 10 lakhs" without an explicit bound
+    match = re.search(NUMBER + r'\s*' + PRICE_WORDS, text)
+    if not match and not venue:
+        match = re.search(r'budget\s+(?:of\s+|is\s+)?' + NUMBER, text)
+    if match and high_key not in filters:
+        filters[high_key] = _to_number(match.group(1), match.group(2))
+        text = text[:match.start()] + ' ' + text[match.end():]
+
+    # A venue search with a bare "for 500" means a head count, but "for 2 days"
+    # doesn't, and "for 2 lakh" / "for ₹50000" is a total budget
+    if venue and 'capacity' not in filters:
+        match = re.search(r'\bfor\s+(?:about\s+|around\s+)?' + NUMBER + r'(?!\s*' + DURATION_WORDS + r'\b)', text)
+        if match:
+            money = match.group(2) or re.match(r'for\s+(?:about\s+|around\s+)?' + CURRENCY, match.group(0))
+            if money or re.match(r'\s*' + CURRENCY, text[match.end():]):
+                return None
+            filters['capacity'] = _to_number(match.group(1), None)
+            text = text[:match.start()] + ' ' + text[match.end():]
+
+    if filters.get('capacity', 0) > MAX_GUESTS:
+        return None
+
+    # "under 2 lakh" for a venue is a total budget, not a plate price ("budget of
+    # 10 lakhs" isn't consumed above, so its digits are left over and rejected too)
+    if venue and any(filters.get(key, 0) >= PER_PLATE_LIMIT for key in (low_key, high_key)):
+        return None
+
+    return filters, text
+
+
+def extract_intent(message):
+    """Return a {"task", "filters"} dict for an obvious search, else None."""
+    text = message.lower().strip()
+    words = re.findall(r"[a-z']+", text)
+
+    if not words or len(words) > MAX_WORDS or '?' in text:
+        return None
+    if CONVERSATIONAL_WORDS & set(words):
+        return None
+
+    wants_venue = bool(VENUE_WORDS & set(words))
+    wants_planner = bool(PLANNER_WORDS & set(words))
+    if wants_venue == wants_planner:
+        return None
+    task = 'find_venue' if wants_venue else 'find_planner'
+
+    if _has_unknown_place(text):
+        return None
+
+    extracted = _extract_numbers(text, task)
+    if extracted is None:
+        return None
+    filters, leftover = extracted
+    # Any digit we could not attribute to a slot makes the message ambiguous
+    if re.search(r'\d', leftover):
+        return None
+
+    city = _find_city(text)
+    if city:
+        filters['location'] = city
+
+    styles = {STYLE_WORDS[word] for word in words if word in STYLE_WORDS}
+    if styles:
+        # Venue filters have no style slot, and two styles is a question for Gemini
+        if task == 'find_venue' or len(styles) > 1:
+            return None
+        filters['style'] = styles.pop()
+
+    # "wedding planners" alone is fine as long as it is phrased as a search
+    if not filters and not (SEARCH_WORDS & set(words)):
+        return None
+
+    return {'task': task, 'filters': filters}
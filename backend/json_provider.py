@@ -0,0 +1,71 @@
+"""
+JSON encoding for API responses
+FastJSONProvider replaces Flask's (and Quart's) stdlib-based provider so every
+jsonify call encodes with orjson when it is installed. ObjectId, datetime and
+Decimal / Decimal128 values are encoded directly, so documents can be returned without
+first rewriting their _id fields.
+"""
+import datetime
+import decimal
+import json
+from bson.decimal128 import Decimal128
+from bson.objectid import ObjectId
+from flask.json.provider import JSONProvider
+from metrics import span
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        # As Flask's default provider does, keeping full precision
+        return str(value)
+    if isinstance(value, Decimal128):
+        # What MongoDB returns for decimal fields; encoded like Decimal
+        return str(value.to_decimal())
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def dumps_bytes(obj):
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+
+    def dumps(obj):
+        return dumps_bytes(obj).decode()
+
+    loads = orjson.loads
+
+else:
+    def dumps(obj):
+        return json.dumps(obj, default=_default, ensure_ascii=False, separators=(',', ':'))
+
+    def dumps_bytes(obj):
+        return dumps(obj).encode()
+
+    loads = json.loads
+
+
+class FastJSONProvider(JSONProvider):
+    mimetype = 'application/json'
+
+    def dumps(self, obj, **kwargs):
+        # Formatting options (indent, sort_keys) are not supported; responses are always compact
+        return dumps(obj)
+
+    def loads(self, s, **kwargs):
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        with span('serialize'):
+            body = dumps_bytes(obj) + b'\n'
+        return self._app.response_class(body, mimetype=self.mimetype)
@@ -0,0 +1,285 @@
+"""
+LLM backends
+Chat code gets its models from model_for(prompt) and never imports a vendor
+SDK itself. LLM_BACKEND picks the implementation:
+
+  gemini  Google Gemini through gemini_client (default)
+  stub    Deterministic local stand-in for load tests and offline development.
+          Searches are answered with function calls from the same rules as the
+          local intent fast path, anything else with canned text; replies can
+          also be pinned from a JSONL recording (LLM_STUB_RECORDINGS) of
+          {"message": ..., "text": ...} or {"message": ..., "task": {...}} lines.
+          LLM_STUB_LATENCY_MS delays the first token and LLM_STUB_TOKEN_MS
+          each streamed chunk after it; LLM_STUB_ERROR_RATE makes that share
+          of calls fail as an unreachable upstream would.
+
+Whatever the backend, a model has generate_content(messages, stream=False),
+generate_content_async(messages, stream=False) and count_tokens(messages), and
+its responses look like google.generativeai's: candidates[0].content.parts
+(each with .text and .function_call) plus usage_metadata.
+"""
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+import zlib
+from intent import extract_intent
+
+LLM_BACKEND = os.getenv('LLM_BACKEND', 'gemini')
+
+STUB_LATENCY_MS = float(os.getenv('LLM_STUB_LATENCY_MS', '0'))
+STUB_TOKEN_MS = float(os.getenv('LLM_STUB_TOKEN_MS', '0'))
+STUB_ERROR_RATE = float(os.getenv('LLM_STUB_ERROR_RATE', '0'))
+STUB_RECORDINGS = os.getenv('LLM_STUB_RECORDINGS')
+# Words per streamed chunk, roughly what Gemini sends
+STUB_CHUNK_WORDS = 8
+
+STUB_REPLIES = (
+    "Congratulations on your upcoming wedding! Every couple's celebration is unique, so let's start with the "
+    "essentials: which city are you planning in, roughly how many guests are you expecting, and do you have a "
+    "per-plate budget in mind? With those three details I can shortlist venues and planners that truly fit.",
+    "A Mehndi ceremony is usually held a day or two before the wedding. The bride's hands and feet are decorated "
+    "with intricate henna designs while family and friends sing, dance and share stories. Modern couples often "
+    "add live music, themed decor and personalised henna motifs that celebrate their journey together.",
+    "The Sangeet is one of the most joyful pre-wedding events, bringing both families together for music and "
+    "dance performances. Many couples now hire choreographers and plan surprise acts, and a good planner can "
+    "coordinate the sound, lighting and stage so everyone can simply enjoy the evening.",
+    "Great question! When comparing venues, look beyond the headline price: check what the per-plate rate "
+    "includes, how many halls can run at once, parking, decor restrictions and the in-house catering policy. "
+    "Tell me your city and guest count and I'll find options that suit you.",
+)
+
+
+class _FunctionCall:
+    __slots__ = ('name', 'args')
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+
+class _Part:
+    __slots__ = ('text', 'function_call')
+
+    def __init__(self, text='', function_call=None):
+        self.text = text
+        self.function_call = function_call
+
+
+class _Usage:
+    __slots__ = ('prompt_token_count', 'candidates_token_count', 'total_token_count')
+
+    def __init__(self, prompt_tokens, reply_tokens):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = reply_tokens
+        self.total_token_count = prompt_tokens + reply_tokens
+
+
+class _TokenCount:
+    __slots__ = ('total_tokens',)
+
+    def __init__(self, total_tokens):
+        self.total_tokens = total_tokens
+
+
+class _Content:
+    __slots__ = ('parts', 'role')
+
+    def __init__(self, parts):
+        self.parts = parts
+        self.role = 'model'
+
+
+class _Candidate:
+    __slots__ = ('content',)
+
+    def __init__(self, parts):
+        self.content = _Content(parts)
+
+
+class StubResponse:
+    def __init__(self, parts, usage_metadata=None):
+        self.candidates = [_Candidate(parts)]
+        self.usage_metadata = usage_metadata
+
+    @property
+    def text(self):
+        return ''.join(part.text for part in self.candidates[0].content.parts)
+
+
+class StubStream:
+    """Streamed stub reply; usage_metadata is set once the last chunk has been read."""
+
+    def __init__(self, parts, usage):
+        self._parts = parts
+        self._usage = usage
+        self.usage_metadata = None
+
+    def _chunks(self):
+        for part in self._parts:
+            if part.function_call is not None:
+                yield StubResponse([part])
+                continue
+            words = part.text.split(' ')
+            for start in range(0, len(words), STUB_CHUNK_WORDS):
+                piece = ' '.join(words[start:start + STUB_CHUNK_WORDS])
+                yield StubResponse([_Part(piece if start == 0 else ' ' + piece)])
+
+    def __iter__(self):
+        _sleep(STUB_LATENCY_MS)
+        for index, chunk in enumerate(self._chunks()):
+            if index:
+                _sleep(STUB_TOKEN_MS)
+            yield chunk
+        self.usage_metadata = self._usage
+
+    async def __aiter__(self):
+        await _sleep_async(STUB_LATENCY_MS)
+        for index, chunk in enumerate(self._chunks()):
+            if index:
+                await _sleep_async(STUB_TOKEN_MS)
+            yield chunk
+        self.usage_metadata = self._usage
+
+
+def _sleep(milliseconds):
+    if milliseconds > 0:
+        time.sleep(milliseconds / 1000)
+
+
+async def _sleep_async(milliseconds):
+    if milliseconds > 0:
+        await asyncio.sleep(milliseconds / 1000)
+
+
+def _message_text(message):
+    if isinstance(message, str):
+        return message
+    return ' '.join(part for part in message.get('parts', []) if isinstance(part, str))
+
+
+def _as_messages(messages):
+    # generate_content also accepts a bare prompt string, as the summariser sends
+    return [messages] if isinstance(messages, str) else list(messages)
+
+
+def _tokens(text):
+    # Same 4-characters-per-token rule of thumb the history budget starts from
+    return max(1, len(text) // 4)
+
+
+class StubModel:
+    def __init__(self, prompt, recordings):
+        self.prompt = prompt
+        self.recordings = recordings
+
+    def _reply_parts(self, messages):
+        messages = _as_messages(messages)
+        message = _message_text(messages[-1]) if messages else ''
+        if self.prompt.name == 'summary':
+            # Deterministic "summary": the start of the transcript it was asked about
+            return [_Part(' '.join(message.split()[:60]))]
+
+        recorded = self.recordings.get(message.strip())
+        if recorded is not None:
+            if 'task' in recorded:
+                task = recorded['task']
+                return [_Part(function_call=_FunctionCall(task['task'], dict(task.get('filters', {}))))]
+            return [_Part(recorded.get('text', ''))]
+
+        task = extract_intent(message)
+        if task:
+            return [_Part(function_call=_FunctionCall(task['task'], task['filters']))]
+        return [_Part(STUB_REPLIES[zlib.crc32(message.encode()) % len(STUB_REPLIES)])]
+
+    def _usage(self, messages, parts):
+        messages = _as_messages(messages)
+        prompt_tokens = _tokens(self.prompt.text) + sum(_tokens(_message_text(message)) for message in messages)
+        reply_tokens = sum(_tokens(part.text) if part.text else 8 for part in parts)
+        return _Usage(prompt_tokens, reply_tokens)
+
+    def _fail_sometimes(self):
+        if STUB_ERROR_RATE and random.random() < STUB_ERROR_RATE:
+            raise ConnectionError('Simulated upstream failure (LLM_STUB_ERROR_RATE)')
+
+    def generate_content(self, messages, stream=False, **kwargs):
+        self._fail_sometimes()
+        parts = self._reply_parts(messages)
+        usage = self._usage(messages, parts)
+        if stream:
+            return StubStream(parts, usage)
+        _sleep(STUB_LATENCY_MS + STUB_TOKEN_MS * len(list(StubStream(parts, usage)._chunks())))
+        return StubResponse(parts, usage)
+
+    async def generate_content_async(self, messages, stream=False, **kwargs):
+        self._fail_sometimes()
+        parts = self._reply_parts(messages)
+        usage = self._usage(messages, parts)
+        if stream:
+            return StubStream(parts, usage)
+        await _sleep_async(STUB_LATENCY_MS + STUB_TOKEN_MS * len(list(StubStream(parts, usage)._chunks())))
+        return StubResponse(parts, usage)
+
+    def count_tokens(self, messages):
+        messages = _as_messages(messages)
+        return _TokenCount(_tokens(self.prompt.text) + sum(_tokens(_message_text(message)) for message in messages))
+
+
+class GeminiProvider:
+    name = 'gemini'
+
+    def model(self, prompt):
+        from gemini_client import model_for
+        return model_for(prompt)
+
+
+class StubProvider:
+    name = 'stub'
+
+    def __init__(self, recordings_path=STUB_RECORDINGS):
+        self.recordings = self._load_recordings(recordings_path) if recordings_path else {}
+        self._models = {}
+
+    @staticmethod
+    def _load_recordings(path):
+        recordings = {}
+        with open(path, encoding='utf-8') as file:
+            for line in file:
+                if line.strip():
+                    entry = json.loads(line)
+                    recordings[entry['message'].strip()] = entry
+        return recordings
+
+    def model(self, prompt):
+        key = (prompt.name, prompt.version)
+        model = self._models.get(key)
+        if model is None:
+            model = self._models.setdefault(key, StubModel(prompt, self.recordings))
+        return model
+
+
+PROVIDERS = {
+    'gemini': GeminiProvider,
+    'stub': StubProvider,
+}
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_provider():
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                if LLM_BACKEND not in PROVIDERS:
+                    raise ValueError(f"Unknown LLM_BACKEND {LLM_BACKEND!r}; expected one of {', '.join(PROVIDERS)}")
+                _provider = PROVIDERS[LLM_BACKEND]()
+    return _provider
+
+
+def model_for(prompt):
+    """Model for a prompts.Prompt from the configured backend."""
+    return get_provider().model(prompt)
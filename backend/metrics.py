@@ -0,0 +1,204 @@
+"""
+Request timing and Prometheus metrics
+span(stage) times one stage of a request: llm, parse, history, query_build,
+mongo, post_filter, catalog or serialize. Every span is observed into a
+histogram for /metrics, and the spans of the current request are also sent
+back in a Server-Timing header so one slow request can be taken apart from
+the browser or the benchmark.
+
+MongoDB's docs examined vs returned comes from explaining a sample of search
+queries (MONGO_EXPLAIN_SAMPLE, default 0.01) off the request path; when the
+examined/returned ratio climbs, a query has stopped using its index.
+"""
+import asyncio
+import contextvars
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import multiprocess
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+import tasks
+
+MONGO_EXPLAIN_SAMPLE = float(os.getenv('MONGO_EXPLAIN_SAMPLE', '0.01'))
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+REQUEST_SECONDS = Histogram(
+    'dwed_request_seconds', 'HTTP request latency', ['method', 'route', 'status'], buckets=LATENCY_BUCKETS
+)
+STAGE_SECONDS = Histogram(
+    'dwed_stage_seconds', 'Time spent in each stage of a request', ['stage'], buckets=LATENCY_BUCKETS
+)
+RESPONSES = Counter('dwed_chat_responses', 'Chat responses by result type and source', ['type', 'source'])
+LLM_TOKENS = Counter('dwed_llm_tokens', 'LLM tokens used, from usage metadata', ['kind'])
+MONGO_DOCS_RETURNED = Counter('dwed_mongo_docs_returned', 'Documents returned by search queries', ['collection'])
+EXPLAIN_DOCS_EXAMINED = Counter(
+    'dwed_mongo_explain_docs_examined', 'Documents examined by sampled, explained search queries', ['collection']
+)
+EXPLAIN_KEYS_EXAMINED = Counter(
+    'dwed_mongo_explain_keys_examined', 'Index keys examined by sampled, explained search queries', ['collection']
+)
+EXPLAIN_DOCS_RETURNED = Counter(
+    'dwed_mongo_explain_docs_returned', 'Documents returned by sampled, explained search queries', ['collection']
+)
+STARTUP_SECONDS = Gauge(
+    'dwed_startup_seconds', 'Time taken by each startup phase: imports, connections, models', ['phase'],
+    multiprocess_mode='max'
+)
+
+# Background explain tasks, referenced until done so they aren't collected mid-flight
+_explaining = set()
+
+# (stage, seconds) for the request being handled; a list per request context
+_spans = contextvars.ContextVar('spans', default=None)
+
+
+class TaskStatsCollector:
+    """Exposes tasks.stats(), the counts behind /api/stats, at scrape time."""
+
+    def collect(self):
+        stats = tasks.stats()
+        replies = CounterMetricFamily(
+            'dwed_llm_replies', 'LLM replies by how their task was found', labels=['outcome']
+        )
+        for outcome, count in sorted(stats['replies'].items()):
+            replies.add_metric([outcome], count)
+        yield replies
+        yield GaugeMetricFamily(
+            'dwed_llm_parse_failure_ratio', 'Share of task-like replies that failed to parse',
+            value=stats['parse_failure_rate']
+        )
+
+
+REGISTRY.register(TaskStatsCollector())
+
+
+def observe(stage, seconds):
+    STAGE_SECONDS.labels(stage).observe(seconds)
+    spans = _spans.get()
+    if spans is not None:
+        spans.append((stage, seconds))
+
+
+@contextmanager
+def span(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - start)
+
+
+def start_request():
+    """Start collecting spans for a new request; returns its start time."""
+    _spans.set([])
+    return time.perf_counter()
+
+
+def server_timing(spans, total=None):
+    # Stages that ran more than once (two Mongo queries, say) are summed
+    durations = {}
+    for stage, seconds in spans:
+        durations[stage] = durations.get(stage, 0.0) + seconds
+    entries = [f'{stage};dur={seconds * 1000:.2f}' for stage, seconds in durations.items()]
+    if total is not None:
+        entries.append(f'total;dur={total * 1000:.2f}')
+    return ', '.join(entries)
+
+
+def finish_request(response, method, route, started):
+    """Record the request's latency and attach its spans as a Server-Timing header."""
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    REQUEST_SECONDS.labels(method, route or 'unmatched', str(response.status_code)).observe(elapsed)
+    # Streamed responses only include the stages finished before the body starts
+    response.headers['Server-Timing'] = server_timing(_spans.get() or [], elapsed)
+    return response
+
+
+def count_response(payload):
+    RESPONSES.labels(payload.get('type', 'error'), payload.get('source', 'none')).inc()
+
+
+def count_tokens(response):
+    usage = getattr(response, 'usage_metadata', None)
+    if usage is None:
+        return
+    LLM_TOKENS.labels('prompt').inc(usage.prompt_token_count or 0)
+    LLM_TOKENS.labels('reply').inc(usage.candidates_token_count or 0)
+
+
+def exposition():
+    """Body and content type for the /metrics endpoint."""
+    if not os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+    # Preforked workers each write their metrics to files there; add them all up.
+    # Task stats live in memory, so those are still this worker's own.
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    registry.register(TaskStatsCollector())
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+# ---- MongoDB docs examined vs returned ----
+
+def _explain_command(collection, pipeline):
+    return {
+        'explain': {'aggregate': collection.name, 'pipeline': pipeline, 'cursor': {}},
+        'verbosity': 'executionStats',
+    }
+
+
+def _execution_stats(explain):
+    # executionStats is at the top for a pushed-down pipeline, or under $cursor stages
+    if isinstance(explain, dict):
+        if 'executionStats' in explain:
+            yield explain['executionStats']
+            return
+        for value in explain.values():
+            yield from _execution_stats(value)
+    elif isinstance(explain, list):
+        for value in explain:
+            yield from _execution_stats(value)
+
+
+def _record_explain(name, explain):
+    for stats in _execution_stats(explain):
+        EXPLAIN_DOCS_EXAMINED.labels(name).inc(stats.get('totalDocsExamined', 0))
+        EXPLAIN_KEYS_EXAMINED.labels(name).inc(stats.get('totalKeysExamined', 0))
+        EXPLAIN_DOCS_RETURNED.labels(name).inc(stats.get('nReturned', 0))
+
+
+def _explain(collection, pipeline):
+    try:
+        _record_explain(collection.name, collection.database.command(_explain_command(collection, pipeline)))
+    except Exception as e:
+        print(f"Error explaining {collection.name} query: {str(e)}")
+
+
+async def _explain_async(collection, pipeline):
+    try:
+        explain = await collection.database.command(_explain_command(collection, pipeline))
+        _record_explain(collection.name, explain)
+    except Exception as e:
+        print(f"Error explaining {collection.name} query: {str(e)}")
+
+
+def count_query(collection, pipeline, returned):
+    """Count a search query's results, explaining a sample of queries in the background."""
+    MONGO_DOCS_RETURNED.labels(collection.name).inc(returned)
+    if random.random() < MONGO_EXPLAIN_SAMPLE:
+        threading.Thread(target=_explain, args=(collection, pipeline), daemon=True).start()
+
+
+def count_query_async(collection, pipeline, returned):
+    """count_query for an AsyncMongoClient collection; call from the event loop."""
+    MONGO_DOCS_RETURNED.labels(collection.name).inc(returned)
+    if random.random() < MONGO_EXPLAIN_SAMPLE:
+        task = asyncio.get_running_loop().create_task(_explain_async(collection, pipeline))
+        _explaining.add(task)
+        task.add_done_callback(_explaining.discard)
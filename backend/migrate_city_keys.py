@@ -0,0 +1,38 @@
+"""
+Backfill city_key on venues and event planners
+Venues take it from "location", planners from "city". Safe to re-run: documents
+are only rewritten when their key is missing or out of date.
+
+Run with: python migrate_city_keys.py
+"""
+import os
+from pymongo import MongoClient, UpdateOne
+from dotenv import load_dotenv
+from cities import city_key
+
+# Load environment variables
+load_dotenv()
+
+
+def backfill(collection, field):
+    updates = []
+    for doc in collection.find({}, {field: 1, 'city_key': 1}):
+        key = city_key(doc.get(field))
+        if key != doc.get('city_key'):
+            updates.append(UpdateOne({'_id': doc['_id']}, {'$set': {'city_key': key}}))
+    if updates:
+        collection.bulk_write(updates, ordered=False)
+    return len(updates)
+
+
+if __name__ == "__main__":
+    client = MongoClient(os.getenv('MONGO_URI'))
+    db = client['venue_db']
+    try:
+        print("🔄 Backfilling city_key...")
+        print(f"✅ Updated {backfill(db['venues'], 'location')} venues")
+        print(f"✅ Updated {backfill(db['event_planners'], 'city')} event planners")
+    except Exception as e:
+        print(f"❌ Error backfilling city_key: {str(e)}")
+    finally:
+        client.close()
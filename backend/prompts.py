@@ -0,0 +1,132 @@
+"""
+Versioned system prompts
+The static instruction blocks sent with every Gemini call. Bump a prompt's
+version whenever its text, tools or tool config change: the version names its
+context cache and picks out its entry in prompt_tokens.json.
+
+Token counts are computed ahead of time with the API and read at runtime, so
+the per-request history budget can tell prompt tokens from history tokens
+without an extra count_tokens call:
+
+Run with: python prompts.py   (rewrite prompt_tokens.json for GEMINI_MODEL)
+     or: python prompts.py --estimate   (offline: about 4 characters a token,
+         written as "estimated_tokens" rather than "tokens" until counted
+         with the API)
+"""
+import json
+import os
+import sys
+from collections import namedtuple
+from dotenv import load_dotenv
+from tasks import TASK_TOOLS, TASK_TOOL_CONFIG
+
+Prompt = namedtuple('Prompt', ['name', 'version', 'text', 'tools', 'tool_config'])
+
+TOKEN_COUNTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prompt_tokens.json')
+
+CHAT_PROMPT = Prompt('chat', 2, """You are DWed, a sophisticated and empathetic AI wedding expert with a deep understanding of Indian weddings and event planning. Your personality is warm, engaging, and creative. You use varied, natural language and never repeat responses in the same way.
+
+PERSONALITY TRAITS:
+- Enthusiastic and positive
+- Creative in suggesting alternatives
+- Understanding of wedding planning stress
+- Knowledgeable about Indian wedding customs and event planning
+- Professional yet friendly tone
+- Remember previous conversations and build upon them
+
+RESPONSE VARIATIONS:
+When no venues or planners match the criteria, provide one of these response styles (vary them naturally):
+1. "I've explored our collection, but haven't found exact matches. However, I'd love to suggest some beautiful alternatives! Would you like to explore [suggestion1] or [suggestion2]?"
+2. "While I don't have exact matches, I'm curious - what's the most important aspect you're looking for? We can focus on that and find your perfect match!"
+3. "Let's get creative with your search! The exact match isn't available, but I know some hidden gems that might surprise you. Shall we explore different [areas/styles/options]?"
+4. "Though these specific criteria aren't matching right now, I'm excited to help you discover something even better! What aspects are non-negotiable for you?"
+
+CRITICAL INSTRUCTIONS:
+
+Task 1 (Venue Finding): 
+When the user wants to find a venue (e.g., "I need a venue in Delhi", "Show me venues for 500 people"), you MUST call the find_venue function.
+
+Task 2 (Event Planner Finding):
+When the user wants to find an event planner (e.g., "I need a planner in Mumbai", "Show me wedding planners"), you MUST call the find_planner function.
+
+Pass only the filters the user actually gave (city, guest count, price per plate, budget, style) and leave the rest out. Do not list venues or planners yourself; the app shows the search results.
+
+Examples:
+User: "venue in Delhi" → find_venue(location="Delhi")
+User: "Show venues for 500 people" → find_venue(capacity=500)
+User: "Find me a wedding planner in Mumbai" → find_planner(location="Mumbai")""", TASK_TOOLS, TASK_TOOL_CONFIG)
+
+SUMMARY_PROMPT = Prompt('summary', 1, """You summarise wedding-planning chats between a user and DWed, an AI wedding assistant.
+Write at most 120 words of plain prose. Keep every concrete requirement the user has stated (city, guest count, budget, dates, style, ceremonies, venues or planners they liked or rejected). Drop greetings and small talk.""", None, None)
+
+PROMPTS = (CHAT_PROMPT, SUMMARY_PROMPT)
+
+_token_counts = None
+
+
+def _load_token_counts():
+    global _token_counts
+    if _token_counts is None:
+        try:
+            with open(TOKEN_COUNTS_FILE, encoding='utf-8') as file:
+                _token_counts = json.load(file)
+        except (OSError, ValueError):
+            _token_counts = {}
+    return _token_counts
+
+
+def static_tokens(prompt, model_name):
+    """Tokens the prompt adds to every request (instruction plus tool declarations).
+
+    Falls back to a rough estimate when prompt_tokens.json has no measured
+    count for this prompt version and model.
+    """
+    entry = _load_token_counts().get(prompt.name)
+    if entry and entry.get('version') == prompt.version and entry.get('model') == model_name:
+        if 'tokens' in entry:
+            return entry['tokens']
+    return estimate_static_tokens(prompt)
+
+
+def estimate_static_tokens(prompt):
+    """Rough overhead of a prompt, at about 4 characters a token, tool declarations included."""
+    tools = json.dumps([prompt.tools, prompt.tool_config]) if prompt.tools else ''
+    return (len(prompt.text) + len(tools)) // 4
+
+
+def count_static_tokens(prompt, model_name):
+    """Measure a prompt's overhead as the difference between counting with and without it."""
+    import google.generativeai as genai
+    probe = 'ok'
+    with_prompt = genai.GenerativeModel(
+        model_name, system_instruction=prompt.text, tools=prompt.tools, tool_config=prompt.tool_config
+    ).count_tokens(probe).total_tokens
+    bare = genai.GenerativeModel(model_name).count_tokens(probe).total_tokens
+    return with_prompt - bare
+
+
+def main():
+    from gemini_client import GEMINI_MODEL
+
+    estimate = '--estimate' in sys.argv[1:]
+    if not estimate:
+        import google.generativeai as genai
+        load_dotenv()
+        genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
+    counts = {}
+    for prompt in PROMPTS:
+        if estimate:
+            field, tokens = 'estimated_tokens', estimate_static_tokens(prompt)
+        else:
+            field, tokens = 'tokens', count_static_tokens(prompt, GEMINI_MODEL)
+        counts[prompt.name] = {'version': prompt.version, 'model': GEMINI_MODEL, field: tokens}
+        print(f"{prompt.name} v{prompt.version}: {tokens} tokens{' (estimated)' if estimate else ''}")
+
+    with open(TOKEN_COUNTS_FILE, 'w', encoding='utf-8') as file:
+        json.dump(counts, file, indent=2)
+        file.write('\n')
+    print(f"✅ Wrote {TOKEN_COUNTS_FILE}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,270 @@
+"""
+Typed venue and event planner records
+The in-memory catalog keeps each document as a RawBSONDocument next to a small
+__slots__ record of the fields searches read. Sub-documents no search looks at
+(facilities, services, contact, descriptions...) stay undecoded bytes; the full
+document is only decoded when a detail endpoint asks for it.
+
+Building a record also checks the document's shape, and a document that fails
+is reported and left out of the catalog. Event planners come in two layouts:
+event_planner_data.py stores an "amenities" list plus one sentence per service
+category, update_event_planners.py a list of items per category (pre_wedding,
+design_decor, ...). A planner's services must follow one or the other.
+"""
+from collections.abc import Mapping
+import bson
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+
+RAW_BSON = CodecOptions(document_class=RawBSONDocument)
+
+
+class RecordError(ValueError):
+    pass
+
+
+def find_raw(collection, query=None):
+    """Documents matching query as RawBSONDocuments; nothing is decoded until it is read."""
+    return collection.with_options(codec_options=RAW_BSON).find(query or {})
+
+
+def _plain(value):
+    # Card fields are sent as JSON, so nested raw documents are decoded here
+    if isinstance(value, RawBSONDocument):
+        return bson.decode(value.raw)
+    if isinstance(value, list):
+        return [_plain(item) for item in value]
+    return value
+
+
+def _number(doc, field):
+    value = doc.get(field)
+    if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float))):
+        raise RecordError(f"{field} should be a number, got {value!r}")
+    return value
+
+
+def _text(doc, field, required=False):
+    value = doc.get(field)
+    if value is None and not required:
+        return None
+    if not isinstance(value, str) or not value.strip():
+        raise RecordError(f"{field} should be text, got {value!r}")
+    return value
+
+
+def _document(doc, field):
+    value = doc.get(field)
+    if value is not None and not isinstance(value, Mapping):
+        raise RecordError(f"{field} should be a document, got {value!r}")
+    return _plain(value)
+
+
+def _text_list(value):
+    return isinstance(value, list) and all(isinstance(item, str) for item in value)
+
+
+def _event_types(doc):
+    # Stored as a list, or as a single type on some hand-entered planners
+    value = doc.get('event_types')
+    if value is None:
+        return ()
+    if isinstance(value, str):
+        return (value,)
+    if not _text_list(value):
+        raise RecordError(f"event_types should be text or a list of text, got {value!r}")
+    return tuple(value)
+
+
+def _check_services(doc):
+    services = doc.get('services')
+    if services is None:
+        return
+    if not isinstance(services, Mapping):
+        raise RecordError(f"services should be a document, got {services!r}")
+    # update_event_planners.py: a list of items per category
+    if all(_text_list(items) for items in services.values()):
+        return
+    # event_planner_data.py: an amenities list plus one sentence per category
+    if _text_list(services.get('amenities', [])) and all(
+        isinstance(items, str) for category, items in services.items() if category != 'amenities'
+    ):
+        return
+    raise RecordError(f"services follow neither planner layout: {sorted(services)}")
+
+
+def _present(fields):
+    return {field: value for field, value in fields if value is not None}
+
+
+class Banquet:
+    __slots__ = ('name', 'capacity', 'sitting_capacity', 'floating_space', 'price', 'image')
+
+    def __init__(self, name=None, capacity=None, sitting_capacity=None, floating_space=None, price=None, image=None):
+        self.name = name
+        self.capacity = capacity
+        self.sitting_capacity = sitting_capacity
+        self.floating_space = floating_space
+        self.price = price
+        self.image = image
+
+    @classmethod
+    def from_document(cls, doc):
+        if not isinstance(doc, Mapping):
+            raise RecordError(f"banquets should hold documents, got {doc!r}")
+        return cls(
+            name=doc.get('name'),
+            capacity=_number(doc, 'capacity'),
+            sitting_capacity=_plain(doc.get('sitting_capacity')),
+            floating_space=_plain(doc.get('floating_space')),
+            price=_number(doc, 'price'),
+            image=doc.get('image'),
+        )
+
+    def card_fields(self):
+        """The hall as shown on a venue card (search.venue_card_pipeline's best_hall)."""
+        return _present((
+            ('name', self.name),
+            ('capacity', self.capacity),
+            ('sitting_capacity', self.sitting_capacity),
+            ('floating_space', self.floating_space),
+            ('price', self.price),
+        ))
+
+
+class Venue:
+    __slots__ = ('id', 'name', 'location', 'city_key', 'rating', 'hotel_stars', 'pricing', 'rental', 'banquets', 'raw')
+
+    def __init__(self, id, name, location=None, city_key=None, rating=None, hotel_stars=None,
+                 pricing=None, rental=None, banquets=(), raw=None):
+        self.id = id
+        self.name = name
+        self.location = location
+        self.city_key = city_key
+        self.rating = rating
+        self.hotel_stars = hotel_stars
+        self.pricing = pricing
+        self.rental = rental
+        self.banquets = banquets
+        self.raw = raw
+
+    @classmethod
+    def from_document(cls, doc):
+        try:
+            halls = doc.get('banquets') or []
+            if not isinstance(halls, list):
+                raise RecordError(f"banquets should be a list, got {halls!r}")
+            return cls(
+                id=doc['_id'],
+                name=_text(doc, 'name', required=True),
+                location=doc.get('location'),
+                city_key=doc.get('city_key'),
+                rating=_number(doc, 'rating'),
+                hotel_stars=_number(doc, 'hotelStars'),
+                pricing=_document(doc, 'pricing'),
+                rental=_document(doc, 'rental'),
+                banquets=tuple(Banquet.from_document(hall) for hall in halls),
+                raw=doc,
+            )
+        except RecordError as e:
+            raise RecordError(f"venue {doc.get('_id')}: {str(e)}")
+
+    def card_fields(self):
+        """Fields copied as-is onto the venue's search card."""
+        return _present((
+            ('name', self.name),
+            ('location', self.location),
+            ('city_key', self.city_key),
+            ('rating', self.rating),
+            ('hotelStars', self.hotel_stars),
+            ('pricing', self.pricing),
+            ('rental', self.rental),
+        ))
+
+    def document(self):
+        """The full stored document, decoded afresh for each call."""
+        return bson.decode(self.raw.raw)
+
+
+class EventPlanner:
+    __slots__ = (
+        'id', 'name', 'city', 'city_key', 'location', 'rating', 'experience_years', 'price_range',
+        'min_budget', 'pricing', 'rental', 'total_events_planned', 'event_types', 'image', 'raw',
+    )
+
+    def __init__(self, id, name, city, city_key=None, location=None, rating=None, experience_years=None,
+                 price_range=None, min_budget=None, pricing=None, rental=None, total_events_planned=None,
+                 event_types=(), image=None, raw=None):
+        self.id = id
+        self.name = name
+        self.city = city
+        self.city_key = city_key
+        self.location = location
+        self.rating = rating
+        self.experience_years = experience_years
+        self.price_range = price_range
+        self.min_budget = min_budget
+        self.pricing = pricing
+        self.rental = rental
+        self.total_events_planned = total_events_planned
+        self.event_types = event_types
+        self.image = image
+        self.raw = raw
+
+    @classmethod
+    def from_document(cls, doc):
+        try:
+            _check_services(doc)
+            _document(doc, 'contact')
+            images = doc.get('portfolio_images')
+            if images is not None and not isinstance(images, list):
+                raise RecordError(f"portfolio_images should be a list, got {images!r}")
+            return cls(
+                id=doc['_id'],
+                name=_text(doc, 'name', required=True),
+                city=_text(doc, 'city', required=True),
+                city_key=doc.get('city_key'),
+                location=_text(doc, 'location'),
+                rating=_number(doc, 'rating'),
+                experience_years=_number(doc, 'experience_years'),
+                price_range=_text(doc, 'price_range'),
+                min_budget=_number(doc, 'min_budget'),
+                pricing=_document(doc, 'pricing'),
+                rental=_document(doc, 'rental'),
+                total_events_planned=_number(doc, 'total_events_planned'),
+                event_types=_event_types(doc),
+                image=images[0] if images else None,
+                raw=doc,
+            )
+        except RecordError as e:
+            raise RecordError(f"event planner {doc.get('_id')}: {str(e)}")
+
+    def card_fields(self):
+        """Fields copied as-is onto the planner's search card."""
+        return _present((
+            ('name', self.name),
+            ('city', self.city),
+            ('location', self.location),
+            ('rating', self.rating),
+            ('experience_years', self.experience_years),
+            ('price_range', self.price_range),
+            ('min_budget', self.min_budget),
+            ('pricing', self.pricing),
+            ('rental', self.rental),
+            ('total_events_planned', self.total_events_planned),
+        ))
+
+    def document(self):
+        """The full stored document, decoded afresh for each call."""
+        return bson.decode(self.raw.raw)
+
+
+def build_records(record_class, documents):
+    """Records for documents; documents that fail validation are reported and left out."""
+    records = []
+    for doc in documents:
+        try:
+            records.append(record_class.from_document(doc))
+        except RecordError as e:
+            print(f"Skipping invalid document: {str(e)}")
+    return records
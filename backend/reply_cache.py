@@ -0,0 +1,242 @@
+"""
+LLM reply cache with single-flight coalescing
+Replies are cached under a hash of the backend, model, prompt name and
+version, and the effective history (after compaction) plus the new message,
+with whitespace and case normalised. Identical first-turn messages ("show me
+venues in Delhi") then cost one model call per LLM_CACHE_TTL seconds instead
+of one each. Entries are evicted least recently used beyond LLM_CACHE_SIZE
+(0 turns the cache off), and replies longer than LLM_CACHE_MAX_CHARS are not
+stored.
+
+Concurrent requests for the same key share one upstream call: the first
+claims the key and the rest wait for its reply (or its error) instead of
+sending their own. Only the claimant, identified by the token claim() gave
+it, can end that wait.
+
+What is cached is the reply's content parts, so a hit is handled exactly like
+a fresh reply; streamed requests get a cached reply as a single chunk.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from prometheus_client import Counter
+from tasks import content_parts, parts_text
+
+LLM_CACHE_SIZE = int(os.getenv('LLM_CACHE_SIZE', '1000'))
+LLM_CACHE_TTL = float(os.getenv('LLM_CACHE_TTL', '600'))
+LLM_CACHE_MAX_CHARS = int(os.getenv('LLM_CACHE_MAX_CHARS', '20000'))
+
+CACHE_EVENTS = Counter('dwed_llm_cache_events', 'LLM reply cache hits, misses and coalesced waits', ['event'])
+
+
+def _normalise(text):
+    return ' '.join(text.split()).casefold()
+
+
+def reply_key(backend, model_name, prompt, messages):
+    """Cache key for a model call: backend, model, prompt version and normalised messages."""
+    normalised = [
+        [message['role'], [_normalise(part) if isinstance(part, str) else part for part in message['parts']]]
+        for message in messages
+    ]
+    payload = json.dumps([backend, model_name, prompt.name, prompt.version, normalised], ensure_ascii=False)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class _Flight:
+    """A call in progress that other requests for the same key are waiting on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.parts = None
+        self.error = None
+
+
+class ReplyCache:
+    def __init__(self, max_entries=LLM_CACHE_SIZE, ttl=LLM_CACHE_TTL, max_chars=LLM_CACHE_MAX_CHARS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_chars = max_chars
+        self._lock = threading.Lock()
+        # key -> (parts, expires at), least recently used first
+        self._entries = OrderedDict()
+        self._flights = {}
+        self._async_flights = {}
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def reset(self):
+        """Drop entries and waiters inherited from a parent process (used in forked workers)."""
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._flights = {}
+        self._async_flights = {}
+
+    def _cached(self, key):
+        # Caller holds self._lock
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        parts, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return parts
+
+    def _store(self, key, parts):
+        if not parts or len(parts_text(parts)) > self.max_chars:
+            return
+        with self._lock:
+            self._entries[key] = (parts, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _land(self, flights, key, token):
+        # Caller holds self._lock. Only the leader's token ends a flight: a
+        # waiter that timed out and called the model itself must not pop it
+        if token is not None and flights.get(key) is token:
+            return flights.pop(key)
+        return None
+
+    def claim(self, key, timeout=None):
+        """(parts, token): cached or coalesced parts for key, or None when the caller should call the model.
+
+        A fresh claim gets no parts and a token, making the caller the key's
+        leader; it must then call finish() or abandon() with that token. If
+        waiting on another request's call times out, both are None: the
+        caller makes its own call and leaves the leader's flight alone.
+        """
+        if not self.enabled:
+            return None, None
+        with self._lock:
+            parts = self._cached(key)
+            if parts is not None:
+                CACHE_EVENTS.labels('hit').inc()
+                return parts, None
+            flight = self._flights.get(key)
+            if flight is None:
+                CACHE_EVENTS.labels('miss').inc()
+                flight = self._flights[key] = _Flight()
+                return None, flight
+
+        CACHE_EVENTS.labels('coalesced').inc()
+        if not flight.done.wait(timeout):
+            return None, None
+        if flight.error is not None:
+            raise flight.error
+        return flight.parts, None
+
+    def finish(self, key, parts, token=None):
+        """Store a reply; from the leader, also hand it to everyone waiting on it."""
+        if not self.enabled:
+            return
+        self._store(key, parts)
+        with self._lock:
+            flight = self._land(self._flights, key, token)
+        if flight is not None:
+            flight.parts = parts
+            flight.done.set()
+
+    def abandon(self, key, error=None, token=None):
+        """The leader's call failed; waiting requests get the same error.
+
+        With no error (the leader was cancelled) they make their own calls instead.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            flight = self._land(self._flights, key, token)
+        if flight is not None:
+            flight.error = error
+            flight.done.set()
+
+    def fetch(self, key, produce, timeout=None):
+        """(parts, response) for key, calling produce() for a response only when needed.
+
+        response is None when the parts came from the cache or another request's call.
+        """
+        parts, token = self.claim(key, timeout)
+        if parts is not None:
+            return parts, None
+        try:
+            response = produce()
+        except BaseException as e:
+            self.abandon(key, e if isinstance(e, Exception) else None, token)
+            raise
+        parts = content_parts(response)
+        self.finish(key, parts, token)
+        return parts, response
+
+    async def claim_async(self, key, timeout=None):
+        """claim() for the event loop: waiting on another request's call doesn't block it."""
+        if not self.enabled:
+            return None, None
+        with self._lock:
+            parts = self._cached(key)
+            if parts is not None:
+                CACHE_EVENTS.labels('hit').inc()
+                return parts, None
+            future = self._async_flights.get(key)
+            if future is None:
+                CACHE_EVENTS.labels('miss').inc()
+                future = self._async_flights[key] = asyncio.get_running_loop().create_future()
+                return None, future
+
+        CACHE_EVENTS.labels('coalesced').inc()
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout), None
+        except asyncio.TimeoutError:
+            return None, None
+
+    def finish_async(self, key, parts, token=None):
+        if not self.enabled:
+            return
+        self._store(key, parts)
+        with self._lock:
+            future = self._land(self._async_flights, key, token)
+        if future is not None and not future.done():
+            future.set_result(parts)
+
+    async def fetch_async(self, key, produce, timeout=None):
+        """fetch() for a coroutine function produce."""
+        parts, token = await self.claim_async(key, timeout)
+        if parts is not None:
+            return parts, None
+        try:
+            response = await produce()
+        except BaseException as e:
+            # Includes cancellation, which mustn't leave the key claimed
+            self.abandon_async(key, e if isinstance(e, Exception) else None, token)
+            raise
+        parts = content_parts(response)
+        self.finish_async(key, parts, token)
+        return parts, response
+
+    def abandon_async(self, key, error=None, token=None):
+        if not self.enabled:
+            return
+        with self._lock:
+            future = self._land(self._async_flights, key, token)
+        if future is None or future.done():
+            return
+        if error is None:
+            future.set_result(None)
+        else:
+            future.set_exception(error)
+            # Nobody may be waiting; don't log "exception never retrieved"
+            future.exception()
+
+
+# Shared by every chat request in the process
+reply_cache = ReplyCache()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=reply_cache.reset)
@@ -0,0 +1,321 @@
+"""
+Deadlines, retries, circuit breaking and hedging for LLM calls
+Every chat request gets LLM_DEADLINE seconds for its model call in total. A
+retryable failure (5xx, 429, timeouts, dropped connections) is retried up to
+LLM_RETRIES times after an exponential, fully jittered backoff. Once
+LLM_BREAKER_FAILURES calls in a row have failed, the circuit breaker opens
+and calls fail immediately for LLM_BREAKER_RESET seconds, so workers aren't
+tied up waiting on an upstream that is down. After that a single trial call
+decides whether it closes again. A call counts once however many attempts it
+made, and a streamed reply only counts once the stream has been read.
+
+With LLM_HEDGE_AFTER set, a call that hasn't answered after that many
+seconds is raced against a second, identical call and the first answer wins.
+LLM_HEDGE_AFTER=auto hedges after the p95 of recent call latencies. Hedging
+is off by default because a hedged call can be billed twice.
+
+Callers get LLMUnavailable when no reply could be had, and turn it into a 503.
+"""
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from prometheus_client import Counter, Gauge
+
+LLM_DEADLINE = float(os.getenv('LLM_DEADLINE', '30'))
+LLM_RETRIES = int(os.getenv('LLM_RETRIES', '2'))
+LLM_RETRY_BASE = float(os.getenv('LLM_RETRY_BASE', '0.5'))
+LLM_RETRY_MAX = float(os.getenv('LLM_RETRY_MAX', '4'))
+LLM_BREAKER_FAILURES = int(os.getenv('LLM_BREAKER_FAILURES', '5'))
+LLM_BREAKER_RESET = float(os.getenv('LLM_BREAKER_RESET', '30'))
+# Seconds, "auto" for the recent p95, or empty / 0 for no hedging
+LLM_HEDGE_AFTER = os.getenv('LLM_HEDGE_AFTER', '')
+
+# Latencies kept for the auto hedge threshold, and how many are needed before it is used
+LATENCY_SAMPLES = 200
+MIN_LATENCY_SAMPLES = 20
+
+RESILIENCE_EVENTS = Counter(
+    'dwed_llm_resilience_events', 'LLM call retries, hedges, timeouts and breaker rejections', ['event']
+)
+BREAKER_OPEN = Gauge('dwed_llm_breaker_open', '1 while the LLM circuit breaker is open', multiprocess_mode='max')
+
+UNAVAILABLE_MESSAGE = "I'm having trouble reaching the assistant right now. Please try again in a few seconds."
+
+
+class LLMUnavailable(Exception):
+    """No reply could be had: the breaker is open, the deadline passed or retries ran out."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def unavailable_body(error):
+    """Response body for an LLMUnavailable: a message to show the user and when to retry."""
+    return {'error': UNAVAILABLE_MESSAGE, 'retry_after': error.retry_after}
+
+
+def is_retryable(error):
+    if isinstance(error, (TimeoutError, ConnectionError, asyncio.TimeoutError)):
+        return True
+    # Imported here so loading this module doesn't pull in the Gemini SDK
+    try:
+        from google.api_core import exceptions as api_exceptions
+    except ImportError:
+        return False
+    return isinstance(error, (api_exceptions.ServerError, api_exceptions.TooManyRequests))
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold=LLM_BREAKER_FAILURES, reset_timeout=LLM_BREAKER_RESET):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+
+    def allow(self):
+        """Whether a call may go ahead; once the reset timeout has passed, lets one trial call through."""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._trial_running or time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            self._trial_running = True
+            return True
+
+    def retry_after(self):
+        with self._lock:
+            if self._opened_at is None:
+                return 1
+            return max(1, int(self.reset_timeout - (time.monotonic() - self._opened_at)) + 1)
+
+    def is_open(self):
+        """Whether the breaker is open, without claiming the trial call."""
+        with self._lock:
+            return self._opened_at is not None
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+        BREAKER_OPEN.set(0)
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures >= self.failure_threshold:
+                # A failed trial call starts a new open period
+                self._opened_at = time.monotonic()
+                self._trial_running = False
+                opened = True
+            else:
+                opened = False
+        if opened:
+            BREAKER_OPEN.set(1)
+
+    def release(self):
+        # A trial call that ended without a verdict (say, a bad request) lets the next one try
+        with self._lock:
+            self._trial_running = False
+
+
+class ResilientCaller:
+    """Runs calls of the form call(timeout) under the deadline, retry, breaker and hedging policy."""
+
+    def __init__(self, deadline=LLM_DEADLINE, retries=LLM_RETRIES, hedge_after=LLM_HEDGE_AFTER, breaker=None):
+        self.deadline = deadline
+        self.retries = retries
+        self.hedge_after = hedge_after
+        self.breaker = breaker or CircuitBreaker()
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def reset(self):
+        """Forget threads and locks inherited from a parent process (used in forked workers)."""
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self.breaker = CircuitBreaker(self.breaker.failure_threshold, self.breaker.reset_timeout)
+
+    def hedge_delay(self):
+        """Seconds to wait before hedging, or None when hedging is off."""
+        if self.hedge_after == 'auto':
+            latencies = sorted(self._latencies)
+            if len(latencies) < MIN_LATENCY_SAMPLES:
+                return None
+            return latencies[int(len(latencies) * 0.95)]
+        try:
+            delay = float(self.hedge_after or 0)
+        except ValueError:
+            return None
+        return delay if delay > 0 else None
+
+    def _backoff(self, attempt):
+        # Full jitter: anywhere between zero and the exponential cap
+        return random.uniform(0, min(LLM_RETRY_MAX, LLM_RETRY_BASE * 2 ** attempt))
+
+    def _unavailable(self, message, error=None):
+        unavailable = LLMUnavailable(message, self.breaker.retry_after())
+        unavailable.__cause__ = error
+        return unavailable
+
+    def _pool(self):
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix='llm-hedge')
+        return self._executor
+
+    def _attempt(self, call, remaining, hedge):
+        delay = self.hedge_delay() if hedge else None
+        if delay is None or delay >= remaining:
+            return call(remaining)
+
+        started = time.monotonic()
+        pending = {self._pool().submit(call, remaining)}
+        done, pending = wait(pending, timeout=delay)
+        if not done:
+            RESILIENCE_EVENTS.labels('hedge').inc()
+            pending.add(self._pool().submit(call, remaining - delay))
+        error = None
+        while True:
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+            left = remaining - (time.monotonic() - started)
+            if not pending or left <= 0:
+                break
+            done, pending = wait(pending, timeout=left, return_when=FIRST_COMPLETED)
+        # Losing calls finish in the background; their results are dropped
+        raise error or TimeoutError('LLM call timed out')
+
+    def _give_up(self, attempt, error, wait_for, deadline):
+        """The error to end a call with after a retryable failure, or None to retry it."""
+        if attempt >= self.retries or time.monotonic() + wait_for >= deadline:
+            RESILIENCE_EVENTS.labels('gave_up').inc()
+            unavailable = self._unavailable(f"LLM call failed after {attempt + 1} attempt(s): {str(error)}", error)
+        elif self.breaker.is_open():
+            # Other calls have tripped the breaker meanwhile; stop retrying into it
+            RESILIENCE_EVENTS.labels('rejected').inc()
+            unavailable = self._unavailable('LLM circuit breaker is open', error)
+        else:
+            return None
+        # However many attempts it took, the breaker counts one failed call
+        self.breaker.record_failure()
+        return unavailable
+
+    def settle(self, error=None):
+        """Record how a call made with settle=False ended, once its stream has been read.
+
+        A retryable error counts as a failed call; any other error (the client
+        going away, say) gives no verdict.
+        """
+        if error is None:
+            self.breaker.record_success()
+        elif isinstance(error, Exception) and is_retryable(error):
+            self.breaker.record_failure()
+        else:
+            self.breaker.release()
+
+    def call(self, call, hedge=True, settle=True):
+        """Result of call(timeout), retried and hedged within the deadline.
+
+        A streaming call only opens the stream; with settle=False its outcome
+        is left for the caller to report through settle() after reading it.
+        """
+        if not self.breaker.allow():
+            RESILIENCE_EVENTS.labels('rejected').inc()
+            raise self._unavailable('LLM circuit breaker is open')
+
+        deadline = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            started = time.monotonic()
+            try:
+                result = self._attempt(call, remaining, hedge)
+            except Exception as e:
+                if not is_retryable(e):
+                    self.breaker.release()
+                    raise
+                wait_for = self._backoff(attempt)
+                unavailable = self._give_up(attempt, e, wait_for, deadline)
+                if unavailable is not None:
+                    raise unavailable
+                RESILIENCE_EVENTS.labels('retry').inc()
+                time.sleep(wait_for)
+                attempt += 1
+                continue
+            if settle:
+                self._latencies.append(time.monotonic() - started)
+                self.breaker.record_success()
+            return result
+
+    async def _attempt_async(self, call, remaining, hedge):
+        delay = self.hedge_delay() if hedge else None
+        first = asyncio.ensure_future(asyncio.wait_for(call(remaining), remaining))
+        if delay is None or delay >= remaining:
+            return await first
+
+        done, pending = await asyncio.wait({first}, timeout=delay)
+        if not done:
+            RESILIENCE_EVENTS.labels('hedge').inc()
+            pending.add(asyncio.ensure_future(asyncio.wait_for(call(remaining - delay), remaining - delay)))
+        error = None
+        try:
+            while True:
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+                if not pending:
+                    raise error
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def call_async(self, call, hedge=True, settle=True):
+        """call() for a coroutine function call(timeout); the deadline is enforced by cancellation."""
+        if not self.breaker.allow():
+            RESILIENCE_EVENTS.labels('rejected').inc()
+            raise self._unavailable('LLM circuit breaker is open')
+
+        deadline = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            started = time.monotonic()
+            try:
+                result = await self._attempt_async(call, remaining, hedge)
+            except Exception as e:
+                if not is_retryable(e):
+                    self.breaker.release()
+                    raise
+                wait_for = self._backoff(attempt)
+                unavailable = self._give_up(attempt, e, wait_for, deadline)
+                if unavailable is not None:
+                    raise unavailable
+                RESILIENCE_EVENTS.labels('retry').inc()
+                await asyncio.sleep(wait_for)
+                attempt += 1
+                continue
+            if settle:
+                self._latencies.append(time.monotonic() - started)
+                self.breaker.record_success()
+            return result
+
+
+# Shared by every chat request in the process
+llm_calls = ResilientCaller()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=llm_calls.reset)
@@ -0,0 +1,195 @@
+"""
+MongoDB and Gemini resources shared by the API, created on first use
+Importing this module neither connects to MongoDB nor imports the Gemini SDK.
+The MongoDB client, catalog, conversation store, rate limiter, history
+compactor and chat model are built the first time a request needs them, or
+all at once by warm_up() when a server would rather pay at boot (before
+forking workers, say) than on its first requests.
+
+How long each of those took is kept for startup_report(), printed at boot and
+exported on /metrics as dwed_startup_seconds{phase}.
+"""
+import os
+import threading
+import time
+import pymongo
+from catalog import Catalog
+from conversation_store import MongoConversationStore, create_store
+from admission import MongoRateLimiter, create_rate_limiter
+from history import HistoryCompactor
+from indexes import STORE_INDEXES, ensure_indexes_in_background
+from gemini_client import GEMINI_MODEL
+from llm import model_for
+from prompts import CHAT_PROMPT, SUMMARY_PROMPT, static_tokens
+from metrics import STARTUP_SECONDS
+
+DATABASE = 'venue_db'
+
+
+def mongo_options():
+    """Client settings shared by the sync and async MongoDB clients."""
+    return {
+        # Bounded pool: when every connection is busy, fail after MONGO_WAIT_QUEUE_TIMEOUT_MS instead of queueing forever
+        'maxPoolSize': int(os.getenv('MONGO_MAX_POOL_SIZE', '100')),
+        'waitQueueTimeoutMS': int(os.getenv('MONGO_WAIT_QUEUE_TIMEOUT_MS', '5000')),
+        # With no reachable server, give up after this instead of pymongo's 30 s
+        'serverSelectionTimeoutMS': int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', '5000')),
+    }
+
+
+def connect_mongo():
+    return pymongo.MongoClient(os.getenv('MONGO_URI'), **mongo_options())
+
+
+class Resources:
+    def __init__(self):
+        # Reentrant: building the history compactor builds the conversation store, which connects
+        self._lock = threading.RLock()
+        self._built = {}
+        self.timings = {}
+
+    def record(self, phase, seconds):
+        """Note how long a startup phase took."""
+        self.timings[phase] = seconds
+        STARTUP_SECONDS.labels(phase).set(seconds)
+
+    def startup_report(self):
+        """One line with every startup phase timed so far, slowest first."""
+        phases = sorted(self.timings.items(), key=lambda item: -item[1])
+        return ', '.join(f'{phase} {seconds * 1000:.0f} ms' for phase, seconds in phases)
+
+    def is_built(self, name):
+        """Whether the resource has been created yet, so reading it costs nothing."""
+        return name in self._built
+
+    def _get(self, name, build):
+        if name in self._built:
+            return self._built[name]
+        with self._lock:
+            if name not in self._built:
+                started = time.perf_counter()
+                self._built[name] = build()
+                self.record(name, time.perf_counter() - started)
+            return self._built[name]
+
+    @property
+    def client(self):
+        return self._get('mongo_client', connect_mongo)
+
+    @property
+    def db(self):
+        return self.client[DATABASE]
+
+    @property
+    def catalog(self):
+        """In-memory copy of venues and planners (set CATALOG_CACHE=0 to always query MongoDB)."""
+        def build():
+            catalog = Catalog(self.db)
+            if os.getenv('CATALOG_CACHE', '1') != '0':
+                catalog.start()
+            return catalog
+        return self._get('catalog', build)
+
+    def _ensure_store_indexes(self, collection_name):
+        # Off the request path: an unreachable database mustn't hold up building the store
+        if os.getenv('ENSURE_INDEXES', '1') != '0':
+            ensure_indexes_in_background(self.db, {collection_name: STORE_INDEXES[collection_name]})
+
+    @property
+    def conversation_store(self):
+        """Conversation history, kept separately for each chat session."""
+        def build():
+            store = create_store(self.db['conversations'])
+            if isinstance(store, MongoConversationStore):
+                self._ensure_store_indexes('conversations')
+            return store
+        return self._get('conversation_store', build)
+
+    @property
+    def rate_limiter(self):
+        """Per-client token buckets on the chat routes, or None when rate limiting is off."""
+        def build():
+            limiter = create_rate_limiter(self.db['rate_limits'])
+            if isinstance(limiter, MongoRateLimiter):
+                self._ensure_store_indexes('rate_limits')
+            return limiter
+        return self._get('rate_limiter', build)
+
+    @property
+    def history_compactor(self):
+        """Windows and summarises each session's history before it is sent to Gemini."""
+        return self._get('history_compactor', lambda: HistoryCompactor(
+            self.conversation_store,
+            lambda: model_for(SUMMARY_PROMPT),
+            static_tokens=static_tokens(CHAT_PROMPT, GEMINI_MODEL)
+        ))
+
+    def chat_model(self):
+        """The shared chat model, with the venue / planner searches declared as functions."""
+        # Not kept here: model_for() caches it and renews its context cache when due
+        if 'chat_model' in self.timings:
+            return model_for(CHAT_PROMPT)
+        started = time.perf_counter()
+        model = model_for(CHAT_PROMPT)
+        self.record('chat_model', time.perf_counter() - started)
+        return model
+
+    def warm_up(self):
+        """Build everything now rather than on the first requests.
+
+        The first MongoDB round trip happens on a background thread, so a slow
+        or unreachable database doesn't hold up boot.
+        """
+        # Create any missing indexes without holding up startup (set ENSURE_INDEXES=0 to skip)
+        if os.getenv('ENSURE_INDEXES', '1') != '0':
+            ensure_indexes_in_background(self.db)
+        # Reading each one builds it
+        self.catalog
+        self.rate_limiter
+        self.history_compactor
+        self.chat_model()
+        threading.Thread(target=self._first_connection, name='mongo-ping', daemon=True).start()
+
+    def _first_connection(self):
+        started = time.perf_counter()
+        try:
+            self.client.admin.command('ping')
+        except Exception as e:
+            print(f"Error connecting to MongoDB: {str(e)}")
+            return
+        self.record('mongo_first_connection', time.perf_counter() - started)
+        print(f"Connected to MongoDB in {self.timings['mongo_first_connection'] * 1000:.0f} ms")
+
+    def after_fork(self):
+        """Give a worker forked from a preloaded server its own MongoDB client and threads.
+
+        Sockets and threads don't survive fork(), so whatever was built before
+        the fork is pointed at a new client and gets its background threads
+        restarted; anything not built yet is still created on first use. The
+        chat model is rebuilt too, since gemini_client drops the parent's at
+        fork. Called from gunicorn_conf.post_fork.
+        """
+        self._lock = threading.RLock()
+        if 'mongo_client' in self._built:
+            self._built['mongo_client'] = connect_mongo()
+            db = self.db
+            if 'catalog' in self._built:
+                self._built['catalog'].after_fork(db)
+            if isinstance(self._built.get('conversation_store'), MongoConversationStore):
+                self._built['conversation_store'].collection = db['conversations']
+            if isinstance(self._built.get('rate_limiter'), MongoRateLimiter):
+                self._built['rate_limiter'].collection = db['rate_limits']
+            if 'history_compactor' in self._built:
+                self._built['history_compactor'].reset()
+        if 'chat_model' in self.timings:
+            model_for(CHAT_PROMPT)
+
+    def close(self):
+        """Close the MongoDB client, if one was opened."""
+        client = self._built.get('mongo_client')
+        if client is not None:
+            client.close()
+
+
+# Shared by every request in the process
+resources = Resources()
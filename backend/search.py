@@ -0,0 +1,320 @@
+"""
+Venue and event planner search
+Turns the filters produced for a find_venue / find_planner task into MongoDB
+queries and runs them.
+
+Results come back a page at a time, best rated first. Each page carries an
+opaque next_cursor token (keyset pagination on rating and _id, never skip), so
+the cost of a page doesn't depend on how deep into the results it is.
+"""
+import base64
+import binascii
+import json
+import os
+from bson.objectid import ObjectId
+from cities import city_key
+from metrics import span, count_query, count_query_async
+
+
+# Largest acceptable hall, as guests above the requested capacity
+CAPACITY_WINDOW = int(os.getenv('CAPACITY_WINDOW', '100'))
+
+# Results per page, and the most a client may ask for
+PAGE_SIZE = int(os.getenv('SEARCH_PAGE_SIZE', '10'))
+MAX_PAGE_SIZE = 50
+
+# Stable order for both result types; _id breaks rating ties
+SORT = {'rating': -1, '_id': 1}
+
+# Planner style -> event types that count as that style
+STYLE_EVENT_TYPES = {
+    'traditional': ['Traditional Ceremonies', 'Wedding'],
+    'modern': ['Birthday Parties', 'Corporate Events'],
+    'luxury': ['Destination Weddings', 'Beach Weddings'],
+}
+
+
+# Filters a cursor may carry for each kind of result, and their types
+CURSOR_FILTERS = {
+    'venues': {'location': str, 'capacity': int, 'price_min': int, 'price_max': int},
+    'event_planners': {'location': str, 'budget_min': int, 'budget_max': int, 'style': str},
+}
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _valid_filters(filters, kind):
+    # Tokens come back from clients, so only filters this search understands get through
+    if not isinstance(filters, dict):
+        return False
+    types = CURSOR_FILTERS[kind]
+    return all(
+        key in types and isinstance(value, types[key]) and not isinstance(value, bool)
+        for key, value in filters.items()
+    )
+
+
+def encode_cursor(kind, filters, last_card):
+    # Anything else in the filters plays no part in the search
+    filters = {key: value for key, value in filters.items() if key in CURSOR_FILTERS[kind]}
+    data = {'k': kind, 'f': filters, 'r': last_card.get('rating'), 'i': last_card['_id']}
+    return base64.urlsafe_b64encode(json.dumps(data, separators=(',', ':')).encode()).decode()
+
+
+def decode_cursor(token, kind):
+    """Return (filters, after) for a next_cursor token issued for this kind of result."""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(token.encode()))
+        if data['k'] != kind or not ObjectId.is_valid(data['i']) or not _valid_filters(data['f'], kind):
+            raise InvalidCursor('Invalid cursor')
+        if data['r'] is not None and (not isinstance(data['r'], (int, float)) or isinstance(data['r'], bool)):
+            raise InvalidCursor('Invalid cursor')
+        return data['f'], (data['r'], ObjectId(data['i']))
+    except (binascii.Error, UnicodeDecodeError, ValueError, KeyError, TypeError):
+        raise InvalidCursor('Invalid cursor')
+
+
+def _after(after):
+    """Match documents that sort strictly after (rating, _id) under SORT."""
+    rating, last_id = after
+    if rating is None:
+        # Unrated documents sort last, so only later ids among them remain
+        return {'rating': None, '_id': {'$gt': last_id}}
+    return {'$or': [
+        {'rating': {'$lt': rating}},
+        {'rating': None},
+        {'rating': rating, '_id': {'$gt': last_id}}
+    ]}
+
+
+def _page_stages(query, after, limit):
+    # Sort and cut the page before projecting so only one page of cards is built
+    match = {'$and': [query, _after(after)]} if after else query
+    return [{'$match': match}, {'$sort': SORT}, {'$limit': limit + 1}]
+
+
+def split_page(cards, kind, filters, limit):
+    """Split the limit + 1 fetched cards into this page and the next page's cursor."""
+    if len(cards) > limit:
+        cards = cards[:limit]
+        return cards, encode_cursor(kind, filters, cards[-1])
+    return cards, None
+
+
+def page_size(requested):
+    try:
+        return max(1, min(int(requested), MAX_PAGE_SIZE))
+    except (TypeError, ValueError):
+        return PAGE_SIZE
+
+
+def build_venue_query(filters, capacity_window=CAPACITY_WINDOW):
+    mongo_query = {}
+
+    # Location filter - exact match on the normalised, indexed city key
+    if 'location' in filters:
+        mongo_query['city_key'] = city_key(filters['location'])
+
+    # Capacity and price both describe one banquet hall, so they go in a single
+    # $elemMatch: the hall that fits the guests must also be the one in budget
+    hall_query = {}
+    if 'capacity' in filters:
+        # A hall that fits everyone without being far too big for the party
+        requested_capacity = filters['capacity']
+        hall_query['capacity'] = {'$gte': requested_capacity, '$lte': requested_capacity + capacity_window}
+
+    price_query = {}
+    if 'price_min' in filters:
+        price_query['$gte'] = filters['price_min']
+    if 'price_max' in filters:
+        price_query['$lte'] = filters['price_max']
+    if price_query:
+        hall_query['price'] = price_query
+
+    if hall_query:
+        mongo_query['banquets'] = {'$elemMatch': hall_query}
+
+    return mongo_query
+
+
+def _hall_condition(filters, capacity_window):
+    """The banquet $elemMatch as an aggregation expression over $$hall."""
+    conditions = []
+    if 'capacity' in filters:
+        conditions.append({'$gte': ['$$hall.capacity', filters['capacity']]})
+        conditions.append({'$lte': ['$$hall.capacity', filters['capacity'] + capacity_window]})
+    if 'price_min' in filters:
+        conditions.append({'$gte': ['$$hall.price', filters['price_min']]})
+    if 'price_max' in filters:
+        conditions.append({'$lte': ['$$hall.price', filters['price_max']]})
+    return {'$and': conditions} if conditions else True
+
+
+def venue_card_pipeline(filters, after=None, limit=PAGE_SIZE, capacity_window=CAPACITY_WINDOW):
+    """Aggregation returning card-sized venues: only what a search result shows.
+
+    Full documents (every hall, facilities, descriptions) are served by
+    get_venue when a card is opened.
+    """
+    matching_halls = {'$filter': {
+        'input': {'$ifNull': ['$banquets', []]},
+        'as': 'hall',
+        'cond': _hall_condition(filters, capacity_window)
+    }}
+    if 'capacity' in filters:
+        # Tightest fit: the smallest hall that still seats everyone
+        best_hall = {'$reduce': {
+            'input': matching_halls,
+            'initialValue': None,
+            'in': {'$cond': [
+                {'$or': [{'$eq': ['$$value', None]}, {'$lt': ['$$this.capacity', '$$value.capacity']}]},
+                '$$this',
+                '$$value'
+            ]}
+        }}
+    else:
+        best_hall = {'$arrayElemAt': [matching_halls, 0]}
+
+    return _page_stages(build_venue_query(filters, capacity_window), after, limit) + [
+        {'$addFields': {'best_hall': best_hall}},
+        {'$project': {
+            '_id': {'$toString': '$_id'},
+            'name': 1,
+            'location': 1,
+            'city_key': 1,
+            'rating': 1,
+            'hotelStars': 1,
+            'pricing': 1,
+            'rental': 1,
+            'price_range': {'min': {'$min': '$banquets.price'}, 'max': {'$max': '$banquets.price'}},
+            'best_hall': {
+                'name': '$best_hall.name',
+                'capacity': '$best_hall.capacity',
+                'sitting_capacity': '$best_hall.sitting_capacity',
+                'floating_space': '$best_hall.floating_space',
+                'price': '$best_hall.price'
+            },
+            'image': {'$ifNull': ['$best_hall.image', {'$arrayElemAt': ['$banquets.image', 0]}]},
+            # Add the requested capacity to the venue object
+            'requestedCapacity': {'$literal': filters.get('capacity', 0)}
+        }}
+    ]
+
+
+def find_venues(venues_collection, filters, after=None, limit=PAGE_SIZE):
+    """One page of venue cards and the cursor for the next page (None on the last page)."""
+    with span('query_build'):
+        pipeline = venue_card_pipeline(filters, after, limit)
+    with span('mongo'):
+        cards = list(venues_collection.aggregate(pipeline))
+    count_query(venues_collection, pipeline, len(cards))
+    with span('post_filter'):
+        return split_page(cards, 'venues', filters, limit)
+
+
+async def find_venues_async(venues_collection, filters, after=None, limit=PAGE_SIZE):
+    """find_venues for an AsyncMongoClient collection."""
+    with span('query_build'):
+        pipeline = venue_card_pipeline(filters, after, limit)
+    with span('mongo'):
+        cursor = await venues_collection.aggregate(pipeline)
+        cards = await cursor.to_list(None)
+    count_query_async(venues_collection, pipeline, len(cards))
+    with span('post_filter'):
+        return split_page(cards, 'venues', filters, limit)
+
+
+def build_planner_query(filters):
+    mongo_query = {}
+
+    # Location filter - exact match on the normalised, indexed city key
+    if 'location' in filters:
+        mongo_query['city_key'] = city_key(filters['location'])
+
+    # Budget filter
+    budget_query = {}
+    if 'budget_min' in filters:
+        budget_query['$gte'] = filters['budget_min']
+    if 'budget_max' in filters:
+        budget_query['$lte'] = filters['budget_max']
+    if budget_query:
+        mongo_query['min_budget'] = budget_query
+
+    # Style/Event type filter
+    if 'style' in filters:
+        event_types = STYLE_EVENT_TYPES.get(filters['style'].lower())
+        if event_types:
+            mongo_query['event_types'] = {'$in': event_types}
+
+    return mongo_query
+
+
+def planner_card_pipeline(filters, after=None, limit=PAGE_SIZE):
+    """Aggregation returning card-sized planners (no service lists, portfolio or description)."""
+    return _page_stages(build_planner_query(filters), after, limit) + [
+        {'$project': {
+            '_id': {'$toString': '$_id'},
+            'name': 1,
+            'city': 1,
+            'location': 1,
+            'rating': 1,
+            'experience_years': 1,
+            'price_range': 1,
+            'min_budget': 1,
+            'pricing': 1,
+            'rental': 1,
+            'total_events_planned': 1,
+            'image': {'$arrayElemAt': ['$portfolio_images', 0]}
+        }}
+    ]
+
+
+def find_planners(event_planners_collection, filters, after=None, limit=PAGE_SIZE):
+    """One page of planner cards and the cursor for the next page (None on the last page)."""
+    with span('query_build'):
+        pipeline = planner_card_pipeline(filters, after, limit)
+    with span('mongo'):
+        cards = list(event_planners_collection.aggregate(pipeline))
+    count_query(event_planners_collection, pipeline, len(cards))
+    with span('post_filter'):
+        return split_page(cards, 'event_planners', filters, limit)
+
+
+async def find_planners_async(event_planners_collection, filters, after=None, limit=PAGE_SIZE):
+    """find_planners for an AsyncMongoClient collection."""
+    with span('query_build'):
+        pipeline = planner_card_pipeline(filters, after, limit)
+    with span('mongo'):
+        cursor = await event_planners_collection.aggregate(pipeline)
+        cards = await cursor.to_list(None)
+    count_query_async(event_planners_collection, pipeline, len(cards))
+    with span('post_filter'):
+        return split_page(cards, 'event_planners', filters, limit)
+
+
+def _parse_id(doc_id):
+    return ObjectId(doc_id) if ObjectId.is_valid(doc_id) else None
+
+
+def get_venue(venues_collection, venue_id):
+    """Full venue document, or None for an unknown or malformed id."""
+    object_id = _parse_id(venue_id)
+    return venues_collection.find_one({'_id': object_id}) if object_id else None
+
+
+def get_planner(event_planners_collection, planner_id):
+    """Full event planner document, or None for an unknown or malformed id."""
+    object_id = _parse_id(planner_id)
+    return event_planners_collection.find_one({'_id': object_id}) if object_id else None
+
+
+async def get_venue_async(venues_collection, venue_id):
+    object_id = _parse_id(venue_id)
+    return await venues_collection.find_one({'_id': object_id}) if object_id else None
+
+
+async def get_planner_async(event_planners_collection, planner_id):
+    object_id = _parse_id(planner_id)
+    return await event_planners_collection.find_one({'_id': object_id}) if object_id else None
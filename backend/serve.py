@@ -0,0 +1,85 @@
+"""
+Production launcher for the DWed API
+SERVER=wsgi (the default) serves the Flask app with gunicorn's preforked,
+threaded workers as configured in gunicorn_conf.py. gunicorn doesn't run on
+Windows, so there the app is served by waitress in one process on
+SERVER_THREADS threads. SERVER=asgi serves asgi_app on uvicorn with
+WEB_CONCURRENCY worker processes (1 unless CONVERSATION_STORE=mongo; see
+gunicorn_conf.py).
+
+All servers take HOST, PORT, WEB_CONCURRENCY and the SERVER_* settings
+described in gunicorn_conf.py.
+
+Run with: python serve.py
+"""
+import os
+import shutil
+import sys
+import gunicorn_conf as settings
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def serve_gunicorn():
+    # Replace this process so signals (and graceful shutdown) go straight to gunicorn's master
+    config = os.path.join(BACKEND_DIR, 'gunicorn_conf.py')
+    os.execv(sys.executable, [
+        sys.executable, '-m', 'gunicorn', '--config', config, '--chdir', BACKEND_DIR, 'app:create_app()'
+    ])
+
+
+def serve_waitress():
+    from waitress import serve
+    from app import create_app
+    # channel_timeout only closes connections with no request in progress, like keep-alive
+    serve(
+        create_app(), host=settings.HOST, port=settings.PORT, threads=settings.threads,
+        channel_timeout=settings.keepalive
+    )
+
+
+def serve_uvicorn():
+    import uvicorn
+    for problem in settings.worker_warnings():
+        print(f"⚠️ Warning: {problem}")
+    # Workers are spawned rather than forked, so each one imports the app and connects itself
+    uvicorn.run(
+        'asgi_app:app',
+        host=settings.HOST,
+        port=settings.PORT,
+        workers=settings.workers,
+        app_dir=BACKEND_DIR,
+        timeout_keep_alive=settings.keepalive,
+        timeout_graceful_shutdown=settings.graceful_timeout,
+        limit_max_requests=settings.max_requests or None,
+        access_log=settings.accesslog is not None
+    )
+
+
+def clear_metrics_dir():
+    # Metric files left by a previous run would otherwise be added to this one's
+    multiproc_dir = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+    if multiproc_dir and os.path.isdir(multiproc_dir):
+        for name in os.listdir(multiproc_dir):
+            path = os.path.join(multiproc_dir, name)
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+
+
+def main():
+    clear_metrics_dir()
+    server = os.getenv('SERVER', 'wsgi').lower()
+    if server == 'asgi':
+        serve_uvicorn()
+    elif server != 'wsgi':
+        raise ValueError(f"Unknown SERVER: {server}")
+    elif os.name == 'nt':
+        serve_waitress()
+    else:
+        serve_gunicorn()
+
+
+if __name__ == '__main__':
+    main()
@@ -6,15 +6,15 @@ import subprocess
 import sys
 import os
 
-os.chdir(r'd:\gemini_dwed\backend')
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
 print("=" * 60)
 print("🚀 Starting DWed Backend Server")
 print("=" * 60)
 print()
 
 try:
-    # Run Flask app
-    subprocess.run([sys.executable, 'app.py'])
+    # Run the production server (see serve.py)
+    subprocess.run([sys.executable, 'serve.py'])
 except KeyboardInterrupt:
     print("\n\n✋ Server stopped by user")
 except Exception as e:
@@ -1,6 +1,6 @@
 @echo off
-cd /d d:\gemini_dwed\backend
+cd /d %~dp0
 echo Starting DWed Backend Server...
 echo.
-python app.py
+python serve.py
 pause
@@ -0,0 +1,36 @@
+"""
+Helpers for streaming chat replies as Server-Sent Events
+"""
+from json_provider import dumps
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {dumps(data)}\n\n"
+
+
+class ReplySplitter:
+    """Decides, chunk by chunk, whether a streamed Gemini reply is forwardable text.
+
+    Replies that open like JSON are task objects and are held back until
+    complete; anything else is conversational text that can be sent as it
+    arrives.
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.structured = None
+
+    def feed(self, text):
+        """Add a chunk and return the text that may be sent to the client now."""
+        self.chunks.append(text)
+        if self.structured is None:
+            head = ''.join(self.chunks).lstrip()
+            if not head:
+                return ''
+            self.structured = head[0] in '{`'
+            return '' if self.structured else ''.join(self.chunks)
+        return '' if self.structured else text
+
+    @property
+    def text(self):
+        return ''.join(self.chunks).strip()
@@ -0,0 +1,181 @@
+"""
+Venue / planner task extraction from Gemini replies
+The two search tasks are declared to Gemini as functions with typed filter
+parameters, so a search comes back as a function call rather than JSON text.
+Replies in the older text form ({"task": ..., "filters": ...}, possibly inside
+a ``` fence or after a sentence) are still recognised, and every reply is
+counted by how its task was found so parse failures show up in /api/stats.
+"""
+import json
+import re
+import threading
+from collections import Counter
+
+TASKS = ('find_venue', 'find_planner')
+
+TASK_TOOLS = [{'function_declarations': [
+    {
+        'name': 'find_venue',
+        'description': 'Search wedding venues (banquet halls, hotels, lawns). Results are shown to the user as cards.',
+        'parameters': {
+            'type': 'object',
+            'properties': {
+                'location': {'type': 'string', 'description': 'City name, e.g. "Delhi"'},
+                'capacity': {'type': 'integer', 'description': 'Number of guests the hall must seat'},
+                'price_min': {'type': 'integer', 'description': 'Minimum price per plate in rupees'},
+                'price_max': {'type': 'integer', 'description': 'Maximum price per plate in rupees'},
+            },
+        },
+    },
+    {
+        'name': 'find_planner',
+        'description': 'Search wedding / event planners. Results are shown to the user as cards.',
+        'parameters': {
+            'type': 'object',
+            'properties': {
+                'location': {'type': 'string', 'description': 'City name, e.g. "Mumbai"'},
+                'budget_min': {'type': 'integer', 'description': 'Minimum total budget in rupees'},
+                'budget_max': {'type': 'integer', 'description': 'Maximum total budget in rupees'},
+                'style': {'type': 'string', 'enum': ['traditional', 'modern', 'luxury']},
+            },
+        },
+    },
+]}]
+
+# Let Gemini choose between calling a task and replying in text
+TASK_TOOL_CONFIG = {'function_calling_config': {'mode': 'AUTO'}}
+
+# How each reply's task was found: function_call, json, recovered (fenced or
+# prefixed JSON), failed (looked like a task but couldn't be read) or text
+_stats_lock = threading.Lock()
+_stats = Counter()
+
+
+def _count(outcome):
+    with _stats_lock:
+        _stats[outcome] += 1
+
+
+def stats():
+    """Reply counts by outcome, plus the share of task-like replies that failed to parse."""
+    with _stats_lock:
+        counts = dict(_stats)
+    task_like = sum(counts.get(outcome, 0) for outcome in ('function_call', 'json', 'recovered', 'failed'))
+    return {
+        'replies': counts,
+        'parse_failure_rate': counts.get('failed', 0) / task_like if task_like else 0.0,
+    }
+
+
+# Declared parameters of each task, by name
+TASK_PARAMETERS = {
+    declaration['name']: declaration['parameters']['properties']
+    for declaration in TASK_TOOLS[0]['function_declarations']
+}
+
+
+def _filter_value(schema, value):
+    """The value as its declared type, or None if it can't be read as one."""
+    if schema['type'] == 'integer':
+        # Struct numbers arrive as floats and JSON replies may quote them; whole numbers are what the filters mean
+        if isinstance(value, bool):
+            return None
+        if isinstance(value, int):
+            return value
+        if isinstance(value, float):
+            return int(value) if value.is_integer() else None
+        if isinstance(value, str) and value.strip().isdigit():
+            return int(value)
+        return None
+    if not isinstance(value, str) or not value.strip():
+        return None
+    if 'enum' in schema:
+        value = value.strip().lower()
+        return value if value in schema['enum'] else None
+    return value
+
+
+def _task(name, filters):
+    if name not in TASKS or not isinstance(filters, dict):
+        return None
+    parameters = TASK_PARAMETERS[name]
+    typed = {}
+    for key, value in filters.items():
+        # Undeclared and empty filters don't narrow the search
+        if key not in parameters or value is None:
+            continue
+        typed[key] = _filter_value(parameters[key], value)
+        if typed[key] is None:
+            return None
+    return {'task': name, 'filters': typed}
+
+
+def _json_objects(text):
+    decoder = json.JSONDecoder()
+    for match in re.finditer(r'\{', text):
+        try:
+            yield decoder.raw_decode(text, match.start())[0]
+        except json.JSONDecodeError:
+            continue
+
+
+def extract_task(text):
+    """Task from a text reply, or None. Returns (task, outcome)."""
+    stripped = text.strip()
+    try:
+        parsed = json.loads(stripped)
+        if isinstance(parsed, dict):
+            task = _task(parsed.get('task'), parsed.get('filters', {}))
+            if task:
+                return task, 'json'
+            return None, 'failed' if 'task' in parsed else 'text'
+    except json.JSONDecodeError:
+        pass
+
+    if '"task"' not in stripped:
+        return None, 'text'
+    # Fenced or prefixed: use the first embedded object that is a task
+    for parsed in _json_objects(stripped):
+        if isinstance(parsed, dict):
+            task = _task(parsed.get('task'), parsed.get('filters', {}))
+            if task:
+                return task, 'recovered'
+    return None, 'failed'
+
+
+def content_parts(response):
+    """Parts of the first candidate of a response or stream chunk (none if it was blocked)."""
+    if not response.candidates:
+        return []
+    return list(response.candidates[0].content.parts)
+
+
+def parts_text(parts):
+    # response.text raises when a part is a function call, so join the text parts directly
+    return ''.join(part.text for part in parts if part.text)
+
+
+def parse_reply(parts, text, count=True):
+    """Task for a finished reply, or None for a conversational one.
+
+    A function call wins; otherwise the text is checked for a task object in
+    the older JSON form. count=False leaves the reply out of stats(), for
+    replies already counted when the model sent them (cache hits).
+    """
+    for part in parts:
+        function_call = part.function_call
+        if function_call and function_call.name:
+            task = _task(function_call.name, dict(function_call.args))
+            if count:
+                _count('function_call' if task else 'failed')
+            return task
+
+    task, outcome = extract_task(text)
+    if count:
+        _count(outcome)
+    return task
+
+
+def history_text(task, text):
+    """The model turn to store: the task as JSON (as the local fast path does) or the reply text."""
+    return json.dumps(task) if task else text
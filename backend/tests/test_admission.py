@@ -0,0 +1,157 @@
+import asyncio
+import threading
+import mongomock
+import pytest
+from pymongo.errors import ServerSelectionTimeoutError
+import admission
+from admission import AdmissionGate, MemoryRateLimiter, MongoRateLimiter, Rejected, client_address
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(admission.time, 'monotonic', clock)
+    return clock
+
+
+def test_memory_bucket_allows_burst_then_refills(clock):
+    limiter = MemoryRateLimiter(rate=1, burst=2)
+    assert [limiter.take('a') for _ in range(3)] == [None, None, 1]
+    # Clients have separate buckets
+    assert limiter.take('b') is None
+    clock.now += 1
+    assert limiter.take('a') is None
+    assert limiter.take('a') == 1
+
+
+def test_memory_bucket_forgets_least_recent_clients(clock):
+    limiter = MemoryRateLimiter(rate=1, burst=1, max_clients=2)
+    limiter.take('a')
+    limiter.take('b')
+    limiter.take('c')
+    # 'a' was dropped, so it starts again with a full bucket
+    assert limiter.take('a') is None
+    assert limiter.take('c') == 1
+
+
+def test_mongo_bucket_shares_limit():
+    collection = mongomock.MongoClient().db.rate_limits
+    first, second = MongoRateLimiter(collection, rate=1, burst=2), MongoRateLimiter(collection, rate=1, burst=2)
+    assert [first.take('a'), second.take('a'), first.take('a')] == [None, None, 1]
+
+
+class Request:
+    def __init__(self, forwarded=None, remote_addr='10.0.0.1'):
+        self.headers = {'X-Forwarded-For': forwarded} if forwarded is not None else {}
+        self.remote_addr = remote_addr
+
+
+@pytest.mark.parametrize('trusted, forwarded, expected', [
+    (0, '1.1.1.1', '10.0.0.1'),
+    (1, '1.1.1.1', '1.1.1.1'),
+    # A client-supplied entry to the left of the proxy's is ignored
+    (1, 'spoofed, 2.2.2.2', '2.2.2.2'),
+    (2, 'spoofed, 3.3.3.3, 172.16.0.5', '3.3.3.3'),
+    # Fewer entries than trusted proxies: the header can't be trusted
+    (2, '3.3.3.3', '10.0.0.1'),
+    (1, None, '10.0.0.1'),
+])
+def test_client_address(monkeypatch, trusted, forwarded, expected):
+    monkeypatch.setattr(admission, 'RATE_LIMIT_TRUST_PROXY', trusted)
+    assert client_address(Request(forwarded)) == expected
+
+
+def test_gate_rejects_when_queue_is_full():
+    gate = AdmissionGate(max_in_flight=1, max_queue=0, queue_timeout=1)
+    gate.acquire()
+    with pytest.raises(Rejected) as rejected:
+        gate.acquire()
+    assert (rejected.value.status, rejected.value.reason) == (503, 'queue_full')
+    gate.release()
+    gate.acquire()
+    gate.release()
+
+
+def test_gate_times_out_queued_request():
+    gate = AdmissionGate(max_in_flight=1, max_queue=1, queue_timeout=0.05)
+    gate.acquire()
+    with pytest.raises(Rejected) as rejected:
+        gate.acquire()
+    assert rejected.value.reason == 'queue_timeout'
+    assert gate._waiting == 0
+
+
+def test_gate_admits_queued_request_when_slot_frees():
+    gate = AdmissionGate(max_in_flight=1, max_queue=1, queue_timeout=5)
+    gate.acquire()
+    admitted = threading.Event()
+
+    def waiter():
+        gate.acquire()
+        admitted.set()
+
+    thread = threading.Thread(target=waiter)
+    thread.start()
+    assert not admitted.wait(0.05)
+    gate.release()
+    assert admitted.wait(5)
+    thread.join()
+    assert gate._in_flight == 1
+
+
+def test_async_gate():
+    gate = AdmissionGate(max_in_flight=1, max_queue=1, queue_timeout=0.05)
+
+    async def run():
+        await gate.acquire_async()
+        with pytest.raises(Rejected):
+            await gate.acquire_async()
+        waiter = asyncio.ensure_future(gate.call_async(lambda: asyncio.sleep(0, 'done')))
+        await asyncio.sleep(0)
+        await gate.release_async()
+        return await waiter
+
+    assert asyncio.run(run()) == 'done'
+    assert gate._in_flight == 0
+
+
+class UnreachableLimiter:
+    def take(self, client):
+        raise ServerSelectionTimeoutError('no servers')
+
+
+class EmptyLimiter:
+    def take(self, client):
+        return 7
+
+
+@pytest.fixture
+def flask_app():
+    from app import create_app
+    return create_app(warm_up=False)
+
+
+def test_chat_fails_open_when_limiter_store_is_down(flask_app, monkeypatch):
+    from app import limit_chat_rate
+    from resources import resources
+    monkeypatch.setitem(resources._built, 'rate_limiter', UnreachableLimiter())
+    with flask_app.test_request_context('/api/chat', method='POST'):
+        assert limit_chat_rate() is None
+
+
+def test_chat_rate_limited(flask_app, monkeypatch):
+    from app import limit_chat_rate
+    from resources import resources
+    monkeypatch.setitem(resources._built, 'rate_limiter', EmptyLimiter())
+    with flask_app.test_request_context('/api/chat', method='POST'):
+        body, status, headers = limit_chat_rate()
+    assert status == 429
+    assert headers['Retry-After'] == '7'
@@ -0,0 +1,291 @@
+import bson
+import mongomock
+import pytest
+import catalog
+import search
+from bson.objectid import ObjectId
+from bson.raw_bson import RawBSONDocument
+from catalog import Catalog
+from search import decode_cursor
+
+
+def venue(name, city, rating=None, halls=None, **fields):
+    doc = {'_id': ObjectId(), 'name': name, 'location': city.title(), 'city_key': city, **fields}
+    if rating is not None:
+        doc['rating'] = rating
+    if halls is not None:
+        doc['banquets'] = halls
+    return doc
+
+
+def hall(name, capacity, price, **fields):
+    return {'name': name, 'capacity': capacity, 'price': price, 'sitting_capacity': capacity // 2, **fields}
+
+
+VENUES = [
+    venue('Grand', 'delhi', 4.8, [hall('Durbar', 800, 2500, image='durbar.jpg'), hall('Lawn', 400, 1200)],
+          hotelStars=5, pricing={'veg': 1500}),
+    venue('Regal', 'delhi', 4.8, [hall('Crystal', 550, 1400, image='crystal.jpg'), hall('Terrace', 150, 900)]),
+    venue('Palm', 'delhi', 4.1, [hall('Palm Court', 300, 1100)]),
+    venue('Heritage', 'delhi', 3.9, [hall('Courtyard', 500, 1500), hall('Baradari', 420, 1600)]),
+    venue('Unpriced', 'delhi', 3.5, [{'name': 'Annex', 'capacity': 450}, hall('Garden', 200, 900)]),
+    venue('Empty', 'delhi', 3.0, []),
+    venue('Unrated', 'delhi', None, [hall('Main', 350, 1000)]),
+    venue('Hall-less', 'delhi'),
+    venue('Seaside', 'mumbai', 4.6, [hall('Bay', 600, 3000), hall('Deck', 250, 1800)]),
+    venue('Harbour', 'mumbai', 4.2, [hall('Pier', 1000, 2200, image='pier.jpg')]),
+    venue('Fort', 'jaipur', 4.9, [hall('Sheesh Mahal', 200, 5000)]),
+]
+
+PLANNERS = [
+    {'_id': ObjectId(), 'name': 'Shaadi Co', 'city_key': 'delhi', 'rating': 4.7, 'min_budget': 500000,
+     'event_types': ['Wedding', 'Destination Wedding'], 'portfolio_images': ['a.jpg', 'b.jpg'], 'city': 'Delhi'},
+    {'_id': ObjectId(), 'name': 'Vows', 'city_key': 'delhi', 'rating': 4.2, 'min_budget': 1500000,
+     'event_types': 'Luxury Wedding', 'experience_years': 12, 'city': 'Delhi'},
+    {'_id': ObjectId(), 'name': 'Budget Baraat', 'city_key': 'delhi', 'min_budget': 200000,
+     'event_types': ['Wedding'], 'portfolio_images': [], 'city': 'Delhi'},
+    {'_id': ObjectId(), 'name': 'Coastal', 'city': 'Mumbai', 'city_key': 'mumbai', 'rating': 4.5,
+     'event_types': ['Beach Wedding']},
+]
+
+# Left out of the catalog (see records.py); MongoDB queries would still match them
+INVALID_VENUES = [
+    venue('Misprinted', 'delhi', 4.0, [hall('Main', 500, '1500')]),
+    venue('Stray', 'delhi', 4.0, [hall('Main', 500, 1500), 'not a hall']),
+]
+INVALID_PLANNERS = [
+    {'_id': ObjectId(), 'name': 'Nameless', 'city_key': 'delhi', 'min_budget': '800000'},
+]
+
+# Filters without capacity run the full card pipeline under mongomock; the
+# capacity pipeline's tightest-fit $reduce isn't implemented there, so those
+# are compared on the venues matched by build_venue_query
+CARD_FILTERS = [
+    {},
+    {'location': 'Delhi'},
+    {'location': 'mumbai'},
+    {'location': 'Atlantis'},
+    {'price_max': 1500},
+    {'location': 'Delhi', 'price_min': 1000, 'price_max': 1400},
+    {'price_min': 2000},
+]
+CAPACITY_FILTERS = [
+    {'capacity': 400},
+    {'capacity': 500, 'location': 'Delhi'},
+    {'capacity': 500, 'price_max': 1500},
+    {'capacity': 150, 'price_min': 800, 'price_max': 1000},
+    {'capacity': 5000},
+]
+PLANNER_FILTERS = [
+    {},
+    {'location': 'Delhi'},
+    {'budget_max': 1000000},
+    {'location': 'Delhi', 'budget_min': 300000, 'budget_max': 2000000},
+    {'style': 'luxury'},
+    {'location': 'Mumbai', 'budget_min': 0},
+]
+
+
+def raw(doc):
+    return RawBSONDocument(bson.encode(doc))
+
+
+def find_raw(collection, query=None):
+    # mongomock can't return RawBSONDocuments itself
+    return [raw(doc) for doc in collection.find(query or {})]
+
+
+@pytest.fixture
+def db(monkeypatch):
+    monkeypatch.setattr(catalog, 'find_raw', find_raw)
+    db = mongomock.MongoClient().dwed
+    db.venues.insert_many([dict(doc) for doc in VENUES])
+    db.event_planners.insert_many([dict(doc) for doc in PLANNERS])
+    return db
+
+
+@pytest.fixture
+def with_invalid(db):
+    db.venues.insert_many([dict(doc) for doc in INVALID_VENUES])
+    db.event_planners.insert_many([dict(doc) for doc in INVALID_PLANNERS])
+    return db
+
+
+@pytest.fixture(params=[True, False], ids=['hall-index', 'per-venue'])
+def loaded(request, db, monkeypatch):
+    monkeypatch.setattr(catalog, 'NUMPY_AVAILABLE', request.param and catalog.NUMPY_AVAILABLE)
+    if request.param and not catalog.NUMPY_AVAILABLE:
+        pytest.skip('numpy not installed')
+    memory = Catalog(db)
+    memory.load()
+    return memory
+
+
+def all_pages(find, kind, filters, limit=2):
+    cards, after = [], None
+    while True:
+        page, cursor = find(filters, after, limit)
+        cards.extend(page)
+        if cursor is None:
+            return cards
+        _, after = decode_cursor(cursor, kind)
+
+
+def comparable(cards):
+    # mongomock gives up on $min/$max and the $banquets.image fallback when a
+    # hall lacks the field, where MongoDB skips that hall; those two fields are
+    # checked against MongoDB's behaviour in test_derived_card_fields instead
+    return [{field: value for field, value in card.items() if field not in ('price_range', 'image')}
+            for card in cards]
+
+
+def mongo_venue_ids(db, filters):
+    found = db.venues.find(search.build_venue_query(filters)).sort(list(search.SORT.items()))
+    return [str(doc['_id']) for doc in found]
+
+
+@pytest.mark.parametrize('filters', CARD_FILTERS)
+def test_venue_cards_match_pipeline(db, loaded, filters):
+    expected = all_pages(lambda f, after, limit: search.find_venues(db.venues, f, after, limit), 'venues', filters)
+    assert comparable(all_pages(loaded.find_venues, 'venues', filters)) == comparable(expected)
+
+
+def test_derived_card_fields(loaded):
+    cards = {card['name']: card for card in all_pages(loaded.find_venues, 'venues', {'location': 'Delhi'})}
+    # Price range over every priced hall, ignoring ones without a price or that aren't halls at all
+    assert cards['Grand']['price_range'] == {'min': 1200, 'max': 2500}
+    assert cards['Unpriced']['price_range'] == {'min': 900, 'max': 900}
+    assert cards['Heritage']['price_range'] == {'min': 1500, 'max': 1600}
+    assert cards['Hall-less']['price_range'] == {'min': None, 'max': None}
+    assert cards['Empty']['price_range'] == {'min': None, 'max': None}
+    # The best hall's image, else the first hall image the venue has
+    assert cards['Grand']['image'] == 'durbar.jpg'
+    assert 'image' not in cards['Palm']
+    cheap, _ = loaded.find_venues({'location': 'Delhi', 'price_max': 1000})
+    cheap = {card['name']: card for card in cheap}
+    assert cheap['Regal']['best_hall']['name'] == 'Terrace'
+    assert cheap['Regal']['image'] == 'crystal.jpg'
+
+
+@pytest.mark.parametrize('filters', CAPACITY_FILTERS)
+def test_capacity_matches_query(db, loaded, filters):
+    cards = all_pages(loaded.find_venues, 'venues', filters)
+    assert [card['_id'] for card in cards] == mongo_venue_ids(db, filters)
+    window = search.CAPACITY_WINDOW
+    for card in cards:
+        # The tightest-fitting hall that matches every condition
+        capacity = card['best_hall']['capacity']
+        assert filters['capacity'] <= capacity <= filters['capacity'] + window
+        assert card['requestedCapacity'] == filters['capacity']
+
+
+def test_capacity_picks_tightest_hall(loaded):
+    cards, _ = loaded.find_venues({'capacity': 400, 'location': 'Delhi'})
+    best = {card['name']: card['best_hall']['name'] for card in cards}
+    assert best == {'Grand': 'Lawn', 'Unpriced': 'Annex', 'Heritage': 'Baradari'}
+
+
+@pytest.mark.parametrize('filters', PLANNER_FILTERS)
+def test_planner_cards_match_pipeline(db, loaded, filters):
+    expected = all_pages(lambda f, after, limit: search.find_planners(db.event_planners, f, after, limit),
+                         'event_planners', filters)
+    assert all_pages(loaded.find_planners, 'event_planners', filters) == expected
+
+
+def change(operation, collection, doc_id, doc=None):
+    event = {'operationType': operation, 'ns': {'db': 'dwed', 'coll': collection}, 'documentKey': {'_id': doc_id}}
+    if operation != 'delete':
+        event['fullDocument'] = raw(doc) if doc is not None else None
+    return event
+
+
+def apply_changes(db, memory):
+    """Apply the same writes to MongoDB and, as change events, to the catalog."""
+    added = venue('Lotus', 'delhi', 4.3, [hall('Lotus Hall', 450, 1300)])
+    db.venues.insert_one(dict(added))
+    memory._apply(change('insert', 'venues', added['_id'], added))
+
+    # Re-rated, so it moves in sort order
+    palm = db.venues.find_one({'name': 'Palm'})
+    db.venues.update_one({'_id': palm['_id']}, {'$set': {'rating': 5.0}})
+    memory._apply(change('update', 'venues', palm['_id'], db.venues.find_one({'_id': palm['_id']})))
+
+    regal = db.venues.find_one({'name': 'Regal'})
+    replacement = venue('Regal', 'mumbai', 4.0, [hall('Crystal', 550, 1400)])
+    replacement['_id'] = regal['_id']
+    db.venues.replace_one({'_id': regal['_id']}, replacement)
+    memory._apply(change('replace', 'venues', regal['_id'], replacement))
+
+    grand = db.venues.find_one({'name': 'Grand'})
+    db.venues.delete_one({'_id': grand['_id']})
+    memory._apply(change('delete', 'venues', grand['_id']))
+
+    vows = db.event_planners.find_one({'name': 'Vows'})
+    db.event_planners.delete_one({'_id': vows['_id']})
+    memory._apply(change('delete', 'event_planners', vows['_id']))
+
+    # An update to a document deleted since comes without fullDocument
+    memory._apply(change('update', 'venues', ObjectId(), None))
+    return added
+
+
+@pytest.mark.parametrize('filters', CARD_FILTERS)
+def test_change_events_match_pipeline(db, loaded, filters):
+    apply_changes(db, loaded)
+    expected = all_pages(lambda f, after, limit: search.find_venues(db.venues, f, after, limit), 'venues', filters)
+    assert comparable(all_pages(loaded.find_venues, 'venues', filters)) == comparable(expected)
+
+
+@pytest.mark.parametrize('filters', CAPACITY_FILTERS)
+def test_change_events_match_query(db, loaded, filters):
+    apply_changes(db, loaded)
+    cards = all_pages(loaded.find_venues, 'venues', filters)
+    assert [card['_id'] for card in cards] == mongo_venue_ids(db, filters)
+
+
+def test_change_events_match_reload(db, loaded):
+    added = apply_changes(db, loaded)
+    reloaded = Catalog(db)
+    reloaded.load()
+    for name in catalog.COLLECTIONS:
+        documents = [record.document() for record in loaded._snapshots[name].ordered]
+        assert documents == [record.document() for record in reloaded._snapshots[name].ordered]
+        assert loaded._snapshots[name].keys == reloaded._snapshots[name].keys
+    assert loaded.get_venue(str(added['_id'])) == added
+    assert loaded.get_planner(str(PLANNERS[1]['_id'])) is None
+
+
+def test_detail_is_the_full_document(loaded):
+    grand = loaded.get_venue(str(VENUES[0]['_id']))
+    assert grand == VENUES[0]
+    # Decoded afresh, so callers can't change the catalog's copy
+    grand['name'] = 'Changed'
+    assert loaded.get_venue(str(VENUES[0]['_id']))['name'] == 'Grand'
+
+
+def test_invalid_documents_are_left_out(with_invalid, capsys):
+    memory = Catalog(with_invalid)
+    memory.load()
+    assert 'Skipping invalid document' in capsys.readouterr().out
+    names = {card['name'] for card in all_pages(memory.find_venues, 'venues', {'location': 'Delhi'})}
+    assert names.isdisjoint({'Misprinted', 'Stray'})
+    assert memory.get_planner(str(INVALID_PLANNERS[0]['_id'])) is None
+
+
+def test_update_making_a_document_invalid_removes_it(loaded):
+    palm = dict(VENUES[2], rating='five')
+    loaded._apply(change('update', 'venues', palm['_id'], palm))
+    assert loaded.get_venue(str(palm['_id'])) is None
+
+
+def test_drop_reloads(db, loaded):
+    db.venues.drop()
+    loaded._apply({'operationType': 'drop', 'ns': {'db': 'dwed', 'coll': 'venues'}})
+    assert loaded.find_venues({}) == ([], None)
+
+
+def test_unloaded_catalog_falls_through_to_mongo(db):
+    memory = Catalog(db)
+    assert memory.find_planners({'location': 'Delhi'}) == search.find_planners(db.event_planners, {'location': 'Delhi'})
+    assert memory.get_venue(str(VENUES[0]['_id']))['name'] == 'Grand'
+    assert memory.get_venue('not-an-id') is None
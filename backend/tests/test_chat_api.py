@@ -0,0 +1,179 @@
+import asyncio
+import json
+import bson
+import mongomock
+import pytest
+import catalog
+import llm
+from admission import Rejected
+from bson.raw_bson import RawBSONDocument
+from conversation_store import MemoryConversationStore
+from history import HistoryCompactor
+from llm import StubModel, StubProvider
+from prompts import SUMMARY_PROMPT
+from reply_cache import reply_cache
+from resilience import LLMUnavailable
+from resources import resources
+
+RECORDINGS = [
+    {'message': 'somewhere lovely for the wedding', 'task': {'task': 'find_venue', 'filters': {'location': 'Delhi'}}},
+    {'message': 'what is a sangeet?', 'text': 'A Sangeet is an evening of music and dance before the wedding.'},
+    {'message': 'reply in json', 'text': '{"note": "not a task"}'},
+]
+
+
+def find_raw(collection, query=None):
+    # mongomock can't return RawBSONDocuments itself
+    return [RawBSONDocument(bson.encode(doc)) for doc in collection.find(query or {})]
+
+
+@pytest.fixture(autouse=True)
+def stub_resources(monkeypatch, tmp_path):
+    recordings = tmp_path / 'recordings.jsonl'
+    recordings.write_text('\n'.join(json.dumps(entry) for entry in RECORDINGS))
+    monkeypatch.setattr(llm, '_provider', StubProvider(str(recordings)))
+
+    db = mongomock.MongoClient().venue_db
+    db.venues.insert_many([
+        {'name': 'Grand', 'city_key': 'delhi', 'rating': 4.8, 'banquets': [{'name': 'Durbar', 'capacity': 500, 'price': 1500}]},
+        {'name': 'Seaside', 'city_key': 'mumbai', 'rating': 4.6, 'banquets': []},
+    ])
+    monkeypatch.setattr(catalog, 'find_raw', find_raw)
+    memory = catalog.Catalog(db)
+    memory.load()
+
+    store = MemoryConversationStore()
+    for name, value in {
+        'catalog': memory,
+        'conversation_store': store,
+        'rate_limiter': None,
+        'history_compactor': HistoryCompactor(store, lambda: StubModel(SUMMARY_PROMPT, {})),
+    }.items():
+        monkeypatch.setitem(resources._built, name, value)
+    reply_cache.reset()
+    return store
+
+
+class FlaskClient:
+    def __init__(self):
+        from app import create_app
+        self.client = create_app(warm_up=False).test_client()
+
+    def post(self, path, body, headers=None):
+        response = self.client.post(path, json=body, headers=headers)
+        return response.status_code, response.headers, response.get_data(as_text=True)
+
+
+class QuartClient:
+    def __init__(self):
+        from asgi_app import app
+        self.client = app.test_client()
+
+    def post(self, path, body, headers=None):
+        async def send():
+            response = await self.client.post(path, json=body, headers=headers)
+            return response.status_code, response.headers, await response.get_data(as_text=True)
+        return asyncio.run(send())
+
+
+@pytest.fixture(params=[FlaskClient, QuartClient], ids=['flask', 'quart'])
+def client(request):
+    return request.param()
+
+
+def events(body):
+    """(event, data) pairs of a Server-Sent Events body."""
+    parsed = []
+    for block in body.strip().split('\n\n'):
+        lines = dict(line.split(': ', 1) for line in block.split('\n'))
+        parsed.append((lines['event'], json.loads(lines['data'])))
+    return parsed
+
+
+def test_local_search(client, stub_resources):
+    status, headers, body = client.post('/api/chat', {'message': 'show me venues in Delhi'})
+    payload = json.loads(body)
+    assert status == 200
+    assert payload['type'] == 'venues' and payload['source'] == 'local'
+    assert [venue['name'] for venue in payload['data']] == ['Grand']
+    session_id = headers['X-Session-Id']
+    assert len(stub_resources.get(session_id).turns) == 2
+
+
+def test_model_search_and_text(client):
+    status, headers, body = client.post('/api/chat', {'message': 'somewhere lovely for the wedding'})
+    payload = json.loads(body)
+    assert status == 200 and payload['type'] == 'venues' and payload['next_cursor'] is None
+
+    session = {'X-Session-Id': headers['X-Session-Id']}
+    status, headers, body = client.post('/api/chat', {'message': 'what is a sangeet?'}, session)
+    assert json.loads(body) == {'type': 'text', 'data': RECORDINGS[1]['text'], 'source': llm.LLM_BACKEND}
+    # The session id was the client's own, so none is minted
+    assert 'X-Session-Id' not in headers
+
+
+def test_message_required(client):
+    for path in ('/api/chat', '/api/chat/stream'):
+        status, _, body = client.post(path, {'message': ''})
+        assert status == 400
+        assert json.loads(body) == {'error': 'Message is required'}
+
+
+def test_stream_local_search(client):
+    status, _, body = client.post('/api/chat/stream', {'message': 'show me venues in Delhi'})
+    assert status == 200
+    assert [event for event, _ in events(body)] == ['result', 'done']
+    assert events(body)[1][1] == {'source': 'local'}
+
+
+def test_stream_text_reply(client):
+    _, _, body = client.post('/api/chat/stream', {'message': 'what is a sangeet?'})
+    streamed = events(body)
+    assert [event for event, _ in streamed][-2:] == ['result', 'done']
+    tokens = ''.join(data['text'] for event, data in streamed if event == 'token')
+    assert tokens == RECORDINGS[1]['text']
+    assert streamed[-2][1]['data'] == RECORDINGS[1]['text']
+
+
+def test_stream_search_reply_sends_no_tokens(client):
+    _, _, body = client.post('/api/chat/stream', {'message': 'somewhere lovely for the wedding'})
+    streamed = events(body)
+    assert [event for event, _ in streamed] == ['result', 'done']
+    assert streamed[0][1]['type'] == 'venues'
+
+
+def test_stream_json_text_is_sent_once_complete(client):
+    _, _, body = client.post('/api/chat/stream', {'message': 'reply in json'})
+    assert events(body)[:2] == [
+        ('token', {'text': RECORDINGS[2]['text']}),
+        ('result', {'type': 'text', 'data': RECORDINGS[2]['text'], 'source': llm.LLM_BACKEND}),
+    ]
+
+
+@pytest.mark.parametrize('error, status, retry_after', [
+    (LLMUnavailable('breaker open', 30), 503, '30'),
+    (Rejected('too many requests in flight', 503, 2, 'queue_full'), 503, '2'),
+    (RuntimeError('mongodb://user:secret@db'), 500, None),
+])
+def test_failures(client, monkeypatch, error, status, retry_after):
+    def fail():
+        raise error
+    monkeypatch.setattr(resources, 'chat_model', fail)
+
+    got_status, headers, body = client.post('/api/chat', {'message': 'what is a sangeet?'})
+    assert got_status == status
+    assert headers.get('Retry-After') == retry_after
+    assert 'secret' not in body
+
+    _, _, body = client.post('/api/chat/stream', {'message': 'what is a sangeet?'})
+    (event, data), = events(body)
+    assert event == 'error'
+    assert data == json.loads(client.post('/api/chat', {'message': 'what is a sangeet?'})[2])
+
+
+def test_reset(client, stub_resources):
+    _, headers, _ = client.post('/api/chat', {'message': 'show me venues in Delhi'})
+    session = {'X-Session-Id': headers['X-Session-Id']}
+    status, _, body = client.post('/api/chat/reset', {}, session)
+    assert status == 200 and json.loads(body)['status'] == 'OK'
+    assert stub_resources.get(headers['X-Session-Id']).turns == []
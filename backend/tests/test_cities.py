@@ -0,0 +1,30 @@
+import pytest
+from cities import city_key
+
+CASES = [
+    # City names, as typed in a search
+    ('Delhi', 'delhi'),
+    ('Bengaluru', 'bangalore'),
+    ('delhi ncr', 'delhi'),
+    ('Jaipur', 'jaipur'),
+    # Addresses resolve from their trailing parts
+    ('Indiranagar, Bengaluru', 'bangalore'),
+    ('Juhu, Mumbai, Maharashtra, India', 'mumbai'),
+    ('Sector 29, Gurugram, Haryana 122001', 'gurgaon'),
+    ('Connaught Place, New Delhi 110001, India', 'delhi'),
+    ('Calangute, Goa', 'goa'),
+    # A city named earlier in the address (a road, a landmark) doesn't count
+    ('Old Mumbai-Pune Hwy, Lonavala, Maharashtra', 'lonavala'),
+    ('Lonavala, Maharashtra - 410401', 'lonavala'),
+    ('Near Delhi Gate, Agra, Uttar Pradesh', 'agra'),
+    # Nothing left once states and PIN codes are skipped
+    ('Maharashtra', None),
+    ('400001', None),
+    ('', None),
+    (None, None),
+]
+
+
+@pytest.mark.parametrize('name, expected', CASES)
+def test_city_key(name, expected):
+    assert city_key(name) == expected
@@ -0,0 +1,108 @@
+import pytest
+import gemini_client
+import prompts
+from gemini_client import LocalCachedContent, model_for
+from prompts import CHAT_PROMPT, SUMMARY_PROMPT
+
+MODEL = 'gemini-2.5-flash'
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(gemini_client.time, 'monotonic', clock)
+    return clock
+
+
+@pytest.fixture(autouse=True)
+def local_cache(monkeypatch):
+    monkeypatch.setattr(gemini_client, 'CONTEXT_CACHE', 'local')
+    gemini_client.reset()
+    LocalCachedContent.clear()
+    yield LocalCachedContent
+    gemini_client.reset()
+    LocalCachedContent.clear()
+
+
+def test_cache_is_created_once_and_reused(clock):
+    first = model_for(CHAT_PROMPT, MODEL)
+    second = model_for(CHAT_PROMPT, MODEL)
+
+    assert second is first
+    assert LocalCachedContent.calls == [('lookup', None), ('create', 'dwed-chat-v2')]
+    # Sent inline, as with CONTEXT_CACHE=off
+    assert first is gemini_client.get_model(CHAT_PROMPT.text, MODEL, CHAT_PROMPT.tools, CHAT_PROMPT.tool_config)
+
+
+def test_each_prompt_version_has_its_own_cache(clock):
+    model_for(CHAT_PROMPT, MODEL)
+    model_for(SUMMARY_PROMPT, MODEL)
+    model_for(CHAT_PROMPT._replace(version=3), MODEL)
+    assert [name for call, name in LocalCachedContent.calls if call == 'create'] == [
+        'dwed-chat-v2', 'dwed-summary-v1', 'dwed-chat-v3'
+    ]
+
+
+def test_cache_is_renewed_before_it_expires(clock):
+    model_for(CHAT_PROMPT, MODEL)
+    ttl, refresh = gemini_client.CONTEXT_CACHE_TTL, gemini_client.CONTEXT_CACHE_REFRESH
+
+    clock.now += ttl - refresh - 1
+    model_for(CHAT_PROMPT, MODEL)
+    assert len(LocalCachedContent.calls) == 2
+
+    clock.now += 2
+    model_for(CHAT_PROMPT, MODEL)
+    assert LocalCachedContent.calls[2:] == [('lookup', None), ('update', 'dwed-chat-v2')]
+    assert len(LocalCachedContent.caches) == 1
+
+
+def test_other_workers_cache_is_extended(clock):
+    model_for(CHAT_PROMPT, MODEL)
+    # A forked worker starts with no models of its own, but the cache is still registered
+    gemini_client.reset()
+    model_for(CHAT_PROMPT, MODEL)
+    assert LocalCachedContent.calls[2:] == [('lookup', None), ('update', 'dwed-chat-v2')]
+
+
+def test_failed_creation_falls_back_to_uncached_model(clock, monkeypatch):
+    def unavailable(cls, **kwargs):
+        cls.calls.append(('create', kwargs['display_name']))
+        raise ValueError('Cached content is too small')
+
+    monkeypatch.setattr(LocalCachedContent, 'create', classmethod(unavailable))
+    model = model_for(CHAT_PROMPT, MODEL)
+    assert model is gemini_client.get_model(CHAT_PROMPT.text, MODEL, CHAT_PROMPT.tools, CHAT_PROMPT.tool_config)
+
+    # Not retried on every request, only after CONTEXT_CACHE_REFRESH
+    model_for(CHAT_PROMPT, MODEL)
+    assert LocalCachedContent.calls == [('lookup', None), ('create', 'dwed-chat-v2')]
+    clock.now += gemini_client.CONTEXT_CACHE_REFRESH + 1
+    model_for(CHAT_PROMPT, MODEL)
+    assert len(LocalCachedContent.calls) == 4
+
+
+def test_off_skips_the_cache(monkeypatch):
+    monkeypatch.setattr(gemini_client, 'CONTEXT_CACHE', 'off')
+    model_for(CHAT_PROMPT, MODEL)
+    assert LocalCachedContent.calls == []
+
+
+def test_static_tokens_only_trust_measured_counts(monkeypatch):
+    counts = {
+        'chat': {'version': 2, 'model': MODEL, 'tokens': 900},
+        'summary': {'version': 1, 'model': MODEL, 'estimated_tokens': 12},
+    }
+    monkeypatch.setattr(prompts, '_token_counts', counts)
+    assert prompts.static_tokens(CHAT_PROMPT, MODEL) == 900
+    assert prompts.static_tokens(CHAT_PROMPT, 'gemini-2.5-pro') == prompts.estimate_static_tokens(CHAT_PROMPT)
+    assert prompts.static_tokens(CHAT_PROMPT._replace(version=3), MODEL) == prompts.estimate_static_tokens(CHAT_PROMPT)
+    assert prompts.static_tokens(SUMMARY_PROMPT, MODEL) == prompts.estimate_static_tokens(SUMMARY_PROMPT)
@@ -0,0 +1,100 @@
+import mongomock
+import pytest
+import conversation_store
+from conversation_store import EMPTY_CONVERSATION, MemoryConversationStore, MongoConversationStore
+from indexes import STORE_INDEXES, ensure_indexes
+
+
+def turn(text):
+    return {'role': 'user', 'content': text}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(conversation_store.time, 'monotonic', clock)
+    return clock
+
+
+def test_memory_store_keeps_last_turns():
+    store = MemoryConversationStore(max_turns=3)
+    store.append('a', turn('1'), turn('2'))
+    store.append('a', turn('3'), turn('4'))
+    conversation = store.get('a')
+    assert [t['content'] for t in conversation.turns] == ['2', '3', '4']
+    assert conversation.total == 4
+
+
+def test_memory_store_evicts_least_recently_used():
+    store = MemoryConversationStore(max_sessions=2)
+    store.append('a', turn('a'))
+    store.append('b', turn('b'))
+    store.get('a')
+    store.append('c', turn('c'))
+    assert store.get('b') == EMPTY_CONVERSATION
+    assert store.get('a').total == 1
+    assert store.get('c').total == 1
+
+
+def test_memory_store_forgets_idle_sessions(clock):
+    store = MemoryConversationStore(idle_ttl=60)
+    store.append('old', turn('x'))
+    clock.now += 30
+    store.append('new', turn('y'))
+    clock.now += 45
+    assert store.get('old') == EMPTY_CONVERSATION
+    assert store.get('new').total == 1
+
+
+def test_memory_store_clear():
+    store = MemoryConversationStore()
+    store.append('a', turn('x'))
+    store.set_summary('a', 'summary', 1)
+    store.clear('a')
+    assert store.get('a') == EMPTY_CONVERSATION
+    store.clear('missing')
+
+
+def test_summary_never_goes_backwards():
+    store = MemoryConversationStore()
+    store.append('a', turn('x'))
+    store.set_summary('a', 'newer', 6)
+    store.set_summary('a', 'older', 4)
+    assert store.get('a').summary == 'newer'
+
+
+@pytest.mark.parametrize('store_class', [MemoryConversationStore, MongoConversationStore])
+def test_rejects_max_turns_below_one(store_class):
+    args = () if store_class is MemoryConversationStore else (mongomock.MongoClient().db.conversations,)
+    with pytest.raises(ValueError):
+        store_class(*args, max_turns=0)
+
+
+def test_mongo_store_round_trip():
+    collection = mongomock.MongoClient().db.conversations
+    store = MongoConversationStore(collection, max_turns=3)
+    store.append('a', turn('1'), turn('2'))
+    store.append('a', turn('3'), turn('4'))
+    store.set_summary('a', 'summary', 2)
+    conversation = store.get('a')
+    assert [t['content'] for t in conversation.turns] == ['2', '3', '4']
+    assert (conversation.total, conversation.summary, conversation.summary_covers) == (4, 'summary', 2)
+    store.clear('a')
+    assert store.get('a') == EMPTY_CONVERSATION
+
+
+def test_mongo_store_leaves_indexes_to_ensure_indexes():
+    collection = mongomock.MongoClient().db.conversations
+    MongoConversationStore(collection)
+    assert 'updated_at_ttl' not in [index['name'] for index in collection.list_indexes()]
+    ensure_indexes(collection.database, STORE_INDEXES)
+    ttl = {index['name']: index for index in collection.list_indexes()}['updated_at_ttl']
+    assert ttl['expireAfterSeconds'] == conversation_store.IDLE_TTL
@@ -0,0 +1,116 @@
+import json
+from conversation_store import MemoryConversationStore
+from history import HistoryCompactor, compact_turn
+from llm import StubModel
+from prompts import SUMMARY_PROMPT
+
+USER_TURN = {'role': 'user', 'content': 'and in mumbai?'}
+
+
+def summary_model():
+    return StubModel(SUMMARY_PROMPT, {})
+
+
+def failing_model():
+    raise ConnectionError('summariser unreachable')
+
+
+def chat(store, session_id, exchanges):
+    for index in range(exchanges):
+        store.append(session_id,
+                     {'role': 'user', 'content': f'question {index}'},
+                     {'role': 'model', 'content': f'answer {index}'})
+
+
+def compactor(store, factory=summary_model, verbatim_turns=4):
+    return HistoryCompactor(store, factory, verbatim_turns=verbatim_turns, token_budget=10000)
+
+
+def settle(history):
+    # Wait for background summaries
+    history._executor.shutdown(wait=True)
+    history.reset()
+
+
+def texts(messages):
+    return [message['parts'][0] for message in messages]
+
+
+def test_no_summary_below_threshold():
+    store = MemoryConversationStore()
+    chat(store, 's', 2)
+    history = compactor(store)
+
+    messages = history.build('s', store.get('s'), USER_TURN)
+    settle(history)
+
+    assert texts(messages) == ['question 0', 'answer 0', 'question 1', 'answer 1', 'and in mumbai?']
+    assert store.get('s').summary is None
+
+
+def test_summary_replaces_older_turns_and_keeps_recent_window():
+    store = MemoryConversationStore()
+    chat(store, 's', 4)
+    history = compactor(store)
+
+    # Until the summary is written, older turns still go verbatim
+    messages = history.build('s', store.get('s'), USER_TURN)
+    assert len(messages) == 9
+    settle(history)
+
+    conversation = store.get('s')
+    assert conversation.summary_covers == 4
+    assert 'question 0' in conversation.summary and 'answer 1' in conversation.summary
+
+    messages = history.build('s', conversation, USER_TURN)
+    settle(history)
+    assert messages[0]['parts'][0] == 'Summary of our conversation so far: ' + conversation.summary
+    assert texts(messages[2:]) == ['question 2', 'answer 2', 'question 3', 'answer 3', 'and in mumbai?']
+
+
+def test_summary_catches_up_from_previous_summary():
+    store = MemoryConversationStore()
+    chat(store, 's', 4)
+    history = compactor(store)
+    history.build('s', store.get('s'), USER_TURN)
+    settle(history)
+
+    chat(store, 's', 1)
+    history.build('s', store.get('s'), USER_TURN)
+    settle(history)
+    assert store.get('s').summary_covers == 6
+
+
+def test_summariser_failure_keeps_turns_verbatim():
+    store = MemoryConversationStore()
+    chat(store, 's', 4)
+    history = compactor(store, factory=failing_model)
+
+    messages = history.build('s', store.get('s'), USER_TURN)
+    settle(history)
+    assert store.get('s').summary is None
+    assert len(messages) == 9
+
+    # The failed session isn't left pending: the next request retries
+    history.summary_model_factory = summary_model
+    history.build('s', store.get('s'), USER_TURN)
+    settle(history)
+    assert store.get('s').summary_covers == 4
+
+
+def test_budget_drops_oldest_turns_but_not_the_new_message():
+    store = MemoryConversationStore()
+    chat(store, 's', 4)
+    history = HistoryCompactor(store, summary_model, verbatim_turns=8, token_budget=20)
+
+    messages = history.build('s', store.get('s'), USER_TURN)
+    assert messages[-1]['parts'] == ['and in mumbai?']
+    assert messages[0]['role'] == 'user'
+    assert len(messages) < 9
+
+
+def test_compact_turn_keeps_task_and_filters():
+    reply = {'task': 'find_venue', 'filters': {'location': 'Delhi'}, 'results': [1, 2, 3]}
+    turn = compact_turn({'role': 'model', 'content': json.dumps(reply)})
+    assert json.loads(turn['content']) == {'task': 'find_venue', 'filters': {'location': 'Delhi'}}
+    assert compact_turn({'role': 'model', 'content': 'plain text'})['content'] == 'plain text'
@@ -0,0 +1,49 @@
+import pytest
+from intent import extract_intent
+
+VENUE = 'find_venue'
+PLANNER = 'find_planner'
+
+CASES = [
+    # Formulaic searches answered locally
+    ('show me venues in Delhi', VENUE, {'location': 'Delhi'}),
+    ('venue in Delhi for 500 people', VENUE, {'capacity': 500, 'location': 'Delhi'}),
+    ('banquet halls in mumbai for 300', VENUE, {'capacity': 300, 'location': 'Mumbai'}),
+    ('venues in delhi under 1500 per plate', VENUE, {'price_max': 1500, 'location': 'Delhi'}),
+    ('venues in delhi budget 1500 per plate', VENUE, {'price_max': 1500, 'location': 'Delhi'}),
+    ('venues in pune 1000-2000 per plate', VENUE, {'price_min': 1000, 'price_max': 2000, 'location': 'Pune'}),
+    ('wedding planners in mumbai', PLANNER, {'location': 'Mumbai'}),
+    ('luxury planners in delhi', PLANNER, {'location': 'Delhi', 'style': 'luxury'}),
+    ('planners in mumbai budget of 10 lakhs', PLANNER, {'budget_max': 1000000, 'location': 'Mumbai'}),
+    ('planners in delhi between 5 and 10 lakhs', PLANNER,
+     {'budget_min': 500000, 'budget_max': 1000000, 'location': 'Delhi'}),
+    # Planner filters have no capacity slot
+    ('planners in delhi for 500 guests', PLANNER, {'location': 'Delhi'}),
+
+    # Left to Gemini
+    ('halls in mumbai for 2 days', None, None),
+    ('venues in delhi for 3 nights', None, None),
+    ('find me a good place to eat in delhi', None, None),
+    ('venues in delhi with budget of 10 lakhs', None, None),
+    ('venues in delhi under 2 lakh', None, None),
+    # "for" followed by money is a total budget, not a head count
+    ('venue in delhi for 2 lakh', None, None),
+    ('banquet hall in mumbai for ₹3 lakh', None, None),
+    ('venue in delhi for rs 50000', None, None),
+    ('find a venue for 5 lakhs in pune', None, None),
+    ('venue in delhi for 1 crore', None, None),
+    ('venue in delhi for 50000 rupees', None, None),
+    ('venue in delhi for 20000', None, None),
+    ('which venues in delhi are best?', None, None),
+    ('venues and planners in delhi', None, None),
+    ('modern venues in delhi', None, None),
+    ('venues in atlantis', None, None),
+    ('show me those venues again', None, None),
+    ('hello', None, None),
+]
+
+
+@pytest.mark.parametrize('message, task, filters', CASES)
+def test_extract_intent(message, task, filters):
+    expected = {'task': task, 'filters': filters} if task else None
+    assert extract_intent(message) == expected
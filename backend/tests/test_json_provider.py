@@ -0,0 +1,24 @@
+import datetime
+import decimal
+import json
+import pytest
+from bson.decimal128 import Decimal128
+from bson.objectid import ObjectId
+import json_provider
+
+
+@pytest.mark.parametrize('value, expected', [
+    (ObjectId('64b7f0c2a1b2c3d4e5f60718'), '64b7f0c2a1b2c3d4e5f60718'),
+    (datetime.datetime(2026, 10, 18, 9, 30), '2026-10-18T09:30:00'),
+    (datetime.date(2026, 10, 18), '2026-10-18'),
+    (decimal.Decimal('1499.50'), '1499.50'),
+    (Decimal128('1499.50'), '1499.50'),
+    (Decimal128('12345678901234567890.123456789'), '12345678901234567890.123456789'),
+])
+def test_encodes_mongo_values(value, expected):
+    assert json.loads(json_provider.dumps({'value': value})) == {'value': expected}
+
+
+def test_rejects_unknown_types():
+    with pytest.raises(TypeError):
+        json_provider.dumps({'value': object()})
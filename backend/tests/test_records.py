@@ -0,0 +1,96 @@
+import bson
+import pytest
+from bson.objectid import ObjectId
+from bson.raw_bson import RawBSONDocument
+from event_planner_data import event_planners_data
+from records import EventPlanner, RecordError, Venue, build_records
+
+# The layout update_event_planners.py writes: a list of items per category
+ITEMISED_PLANNER = {
+    'name': 'Royal Wedding Planners',
+    'city': 'Mumbai',
+    'rating': 4.8,
+    'experience_years': 12,
+    'services': {
+        'pre_wedding': ['Concept & theme creation', 'Budget planning'],
+        'design_decor': ['Venue styling', 'Floral arrangements'],
+    },
+    'portfolio_images': ['royal_wedding_1.jpg', 'royal_wedding_2.jpg'],
+    'contact': {'phone': '+91 98XXXXXXXX', 'email': 'info@royalweddings.com'},
+}
+
+VENUE = {
+    'name': 'Grand',
+    'location': 'Delhi',
+    'city_key': 'delhi',
+    'rating': 4.8,
+    'hotelStars': 5,
+    'pricing': {'veg': 1500, 'non_veg': 1800},
+    'facilities': {'amenities': ['Valet parking', 'Bridal suite']},
+    'banquets': [
+        {'name': 'Durbar', 'capacity': 800, 'sitting_capacity': 500, 'price': 2500, 'image': 'durbar.jpg'},
+        {'name': 'Lawn', 'capacity': 400},
+    ],
+}
+
+
+def raw(doc):
+    return RawBSONDocument(bson.encode(dict(doc, _id=ObjectId())))
+
+
+@pytest.mark.parametrize('doc', event_planners_data + [ITEMISED_PLANNER], ids=lambda doc: doc['name'])
+def test_both_planner_layouts_are_valid(doc):
+    planner = EventPlanner.from_document(raw(doc))
+    assert planner.name == doc['name']
+    assert planner.image == doc['portfolio_images'][0]
+
+
+def test_venue_record():
+    doc = raw(VENUE)
+    venue = Venue.from_document(doc)
+    assert venue.card_fields() == {
+        'name': 'Grand', 'location': 'Delhi', 'city_key': 'delhi', 'rating': 4.8, 'hotelStars': 5,
+        'pricing': {'veg': 1500, 'non_veg': 1800},
+    }
+    # Card fields are plain values, ready to be sent as JSON
+    assert type(venue.card_fields()['pricing']) is dict
+    assert [hall.capacity for hall in venue.banquets] == [800, 400]
+    assert venue.banquets[1].price is None
+    assert venue.banquets[0].card_fields() == {'name': 'Durbar', 'capacity': 800, 'sitting_capacity': 500, 'price': 2500}
+    assert venue.document() == bson.decode(doc.raw)
+
+
+@pytest.mark.parametrize('doc, error', [
+    ({'city': 'Delhi'}, 'name should be text'),
+    ({'name': 'No City'}, 'city should be text'),
+    ({'name': 'P', 'city': 'Delhi', 'min_budget': '500000'}, 'min_budget should be a number'),
+    ({'name': 'P', 'city': 'Delhi', 'rating': True}, 'rating should be a number'),
+    ({'name': 'P', 'city': 'Delhi', 'event_types': ['Wedding', 5]}, 'event_types'),
+    ({'name': 'P', 'city': 'Delhi', 'portfolio_images': 'a.jpg'}, 'portfolio_images'),
+    ({'name': 'P', 'city': 'Delhi', 'contact': '+91 98XXXXXXXX'}, 'contact should be a document'),
+    ({'name': 'P', 'city': 'Delhi', 'services': ['decor']}, 'services should be a document'),
+    # Sentences without the amenities list, lists mixed with sentences
+    ({'name': 'P', 'city': 'Delhi', 'services': {'amenities': 'DJ, lights', 'decor': 'Florals'}}, 'neither planner layout'),
+    ({'name': 'P', 'city': 'Delhi', 'services': {'pre_wedding': ['Budget'], 'decor': 'Florals'}}, 'neither planner layout'),
+])
+def test_invalid_planners(doc, error):
+    with pytest.raises(RecordError, match=error):
+        EventPlanner.from_document(raw(doc))
+
+
+@pytest.mark.parametrize('banquets, error', [
+    ([{'name': 'Main', 'capacity': '500'}], 'capacity should be a number'),
+    ([{'name': 'Main', 'price': False}], 'price should be a number'),
+    (['Main'], 'banquets should hold documents'),
+    ({'name': 'Main'}, 'banquets should be a list'),
+])
+def test_invalid_venues(banquets, error):
+    with pytest.raises(RecordError, match=error):
+        Venue.from_document(raw(dict(VENUE, banquets=banquets)))
+
+
+def test_build_records_skips_invalid_documents(capsys):
+    docs = [raw(ITEMISED_PLANNER), raw({'name': 'No City'}), raw(event_planners_data[0])]
+    planners = build_records(EventPlanner, docs)
+    assert [planner.name for planner in planners] == ['Royal Wedding Planners', event_planners_data[0]['name']]
+    assert 'city should be text' in capsys.readouterr().out
@@ -0,0 +1,148 @@
+import asyncio
+import threading
+import time
+import pytest
+import tasks
+from llm import StubModel
+from prompts import CHAT_PROMPT
+from reply_cache import ReplyCache
+from tasks import content_parts, parse_reply, parts_text
+
+
+@pytest.fixture
+def model():
+    return StubModel(CHAT_PROMPT, {})
+
+
+def reply_parts(model, message):
+    return content_parts(model.generate_content([{'role': 'user', 'parts': [message]}]))
+
+
+def slow_producer(model, message, started=None, delay=0.1):
+    calls = []
+
+    def produce():
+        calls.append(message)
+        if started is not None:
+            started.set()
+        time.sleep(delay)
+        return model.generate_content([{'role': 'user', 'parts': [message]}])
+    return produce, calls
+
+
+def test_concurrent_callers_share_one_upstream_call(model):
+    cache = ReplyCache()
+    started = threading.Event()
+    produce, calls = slow_producer(model, 'hello', started)
+    results = {}
+
+    def leader():
+        results['leader'] = cache.fetch('key', produce, timeout=5)
+
+    def waiter():
+        started.wait(5)
+        results['waiter'] = cache.fetch('key', produce, timeout=5)
+
+    threads = [threading.Thread(target=leader), threading.Thread(target=waiter)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert calls == ['hello']
+    leader_parts, leader_response = results['leader']
+    waiter_parts, waiter_response = results['waiter']
+    assert leader_response is not None and waiter_response is None
+    assert waiter_parts is leader_parts
+    # Later callers are served from the cache
+    assert cache.claim('key') == (leader_parts, None)
+
+
+def test_timed_out_waiter_leaves_leaders_flight(model):
+    cache = ReplyCache()
+    _, leader = cache.claim('key')
+    assert leader is not None
+
+    # The waiter gives up and calls the model itself
+    assert cache.claim('key', timeout=0.01) == (None, None)
+    waiter_parts = reply_parts(model, 'hello')
+    cache.finish('key', waiter_parts, None)
+    assert not leader.done.is_set()
+    assert cache._flights['key'] is leader
+
+    # Anyone arriving now still hits the cache the waiter filled
+    assert cache.claim('key')[0] == waiter_parts
+
+    leader_parts = reply_parts(model, 'hello')
+    cache.finish('key', leader_parts, leader)
+    assert leader.done.is_set() and leader.parts is leader_parts
+    assert 'key' not in cache._flights
+
+
+def test_timed_out_waiter_cannot_abandon_leaders_flight():
+    cache = ReplyCache()
+    _, leader = cache.claim('key')
+    assert cache.claim('key', timeout=0.01) == (None, None)
+    cache.abandon('key', ConnectionError('waiter failed'), None)
+    assert not leader.done.is_set()
+
+    cache.abandon('key', ConnectionError('leader failed'), leader)
+    assert isinstance(leader.error, ConnectionError)
+    assert 'key' not in cache._flights
+
+
+def test_leader_error_reaches_waiters():
+    cache = ReplyCache()
+    started = threading.Event()
+    errors = []
+
+    def produce():
+        started.set()
+        time.sleep(0.1)
+        raise ConnectionError('upstream down')
+
+    def waiter():
+        started.wait(5)
+        try:
+            cache.fetch('key', produce, timeout=5)
+        except ConnectionError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=waiter)
+    thread.start()
+    with pytest.raises(ConnectionError):
+        cache.fetch('key', produce, timeout=5)
+    thread.join(5)
+    assert len(errors) == 1
+    assert 'key' not in cache._flights
+
+
+def test_async_callers_share_one_upstream_call(model):
+    cache = ReplyCache()
+    calls = []
+
+    async def produce():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return await model.generate_content_async([{'role': 'user', 'parts': ['hello']}])
+
+    async def main():
+        return await asyncio.gather(*(cache.fetch_async('key', produce, timeout=5) for _ in range(3)))
+
+    results = asyncio.run(main())
+    assert calls == [1]
+    assert sum(response is not None for _, response in results) == 1
+    assert all(parts is results[0][0] for parts, _ in results)
+
+
+def test_cache_hits_are_not_counted_twice(model):
+    cache = ReplyCache()
+    message = 'show me venues in Delhi'
+    produce, _ = slow_producer(model, message, delay=0)
+
+    before = tasks.stats()['replies'].get('function_call', 0)
+    for _ in range(3):
+        parts, response = cache.fetch('key', produce)
+        task = parse_reply(parts, parts_text(parts), count=response is not None)
+        assert task['task'] == 'find_venue'
+    assert tasks.stats()['replies'].get('function_call', 0) == before + 1
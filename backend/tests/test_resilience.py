@@ -0,0 +1,90 @@
+import pytest
+import resilience
+from resilience import CircuitBreaker, LLMUnavailable, ResilientCaller
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(resilience, 'LLM_RETRY_BASE', 0)
+
+
+def failing(error):
+    calls = []
+
+    def call(timeout):
+        calls.append(timeout)
+        raise error
+    return call, calls
+
+
+def test_retried_call_counts_one_failure():
+    breaker = CircuitBreaker(failure_threshold=3)
+    caller = ResilientCaller(deadline=5, retries=2, breaker=breaker)
+    call, calls = failing(TimeoutError())
+    with pytest.raises(LLMUnavailable):
+        caller.call(call)
+    assert len(calls) == 3
+    assert breaker._failures == 1
+    assert not breaker.is_open()
+
+
+def test_breaker_opens_after_threshold_calls():
+    breaker = CircuitBreaker(failure_threshold=2)
+    caller = ResilientCaller(deadline=5, retries=1, breaker=breaker)
+    call, calls = failing(ConnectionError())
+    for _ in range(2):
+        with pytest.raises(LLMUnavailable):
+            caller.call(call)
+    assert breaker.is_open()
+    with pytest.raises(LLMUnavailable):
+        caller.call(call)
+    assert len(calls) == 4
+
+
+def test_non_retryable_error_is_not_a_failure():
+    breaker = CircuitBreaker(failure_threshold=1)
+    caller = ResilientCaller(deadline=5, retries=2, breaker=breaker)
+    call, calls = failing(ValueError('bad request'))
+    with pytest.raises(ValueError):
+        caller.call(call)
+    assert len(calls) == 1
+    assert breaker._failures == 0
+
+
+def test_unsettled_stream_waits_for_its_outcome():
+    breaker = CircuitBreaker(failure_threshold=1)
+    caller = ResilientCaller(deadline=5, retries=0, breaker=breaker)
+    assert caller.call(lambda timeout: 'stream', settle=False) == 'stream'
+    # A stream that breaks while being read counts as a failed call
+    caller.settle(TimeoutError())
+    assert breaker.is_open()
+
+
+def test_stream_settles_after_reading():
+    breaker = CircuitBreaker(failure_threshold=2)
+    caller = ResilientCaller(deadline=5, retries=0, breaker=breaker)
+    breaker.record_failure()
+    caller.call(lambda timeout: 'stream', settle=False)
+    assert breaker._failures == 1
+    caller.settle()
+    assert breaker._failures == 0
+    # The client going away says nothing about the upstream
+    caller.call(lambda timeout: 'stream', settle=False)
+    caller.settle(GeneratorExit())
+    assert breaker._failures == 0
+
+
+def test_async_retried_call_counts_one_failure():
+    import asyncio
+    breaker = CircuitBreaker(failure_threshold=3)
+    caller = ResilientCaller(deadline=5, retries=2, breaker=breaker)
+    calls = []
+
+    async def call(timeout):
+        calls.append(timeout)
+        raise TimeoutError()
+
+    with pytest.raises(LLMUnavailable):
+        asyncio.run(caller.call_async(call, hedge=False))
+    assert len(calls) == 3
+    assert breaker._failures == 1
@@ -0,0 +1,47 @@
+import base64
+import json
+import pytest
+from bson.objectid import ObjectId
+from search import InvalidCursor, decode_cursor, encode_cursor
+
+LAST_ID = str(ObjectId())
+
+
+def token(data):
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).decode()
+
+
+def cursor(filters, kind='venues', rating=4.5):
+    return token({'k': kind, 'f': filters, 'r': rating, 'i': LAST_ID})
+
+
+def test_round_trip():
+    filters = {'location': 'Delhi', 'capacity': 500, 'price_max': 1500}
+    decoded, after = decode_cursor(encode_cursor('venues', filters, {'rating': 4.5, '_id': LAST_ID}), 'venues')
+    assert decoded == filters
+    assert after == (4.5, ObjectId(LAST_ID))
+
+
+def test_round_trip_drops_unknown_filters():
+    filters = {'location': 'Delhi', 'style': 'luxury', 'note': 'x'}
+    decoded, _ = decode_cursor(encode_cursor('event_planners', filters, {'_id': LAST_ID}), 'event_planners')
+    assert decoded == {'location': 'Delhi', 'style': 'luxury'}
+
+
+@pytest.mark.parametrize('value', [
+    'not base64!',
+    token(['venues']),
+    cursor({'location': 'Delhi'}, kind='event_planners'),
+    token({'k': 'venues', 'f': {}, 'r': 4.5, 'i': 'nope'}),
+    cursor({}, rating='4.5'),
+    cursor({'capacity': '500'}),
+    cursor({'capacity': True}),
+    cursor({'capacity': 500.5}),
+    cursor({'location': 5}),
+    cursor({'style': 'luxury'}),
+    cursor(['location', 'Delhi']),
+    cursor(None),
+])
+def test_rejects_tampered_cursor(value):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(value, 'venues')
@@ -0,0 +1,57 @@
+import json
+import pytest
+import tasks
+from tasks import extract_task
+
+CASES = [
+    # Typed as declared in TASK_TOOLS
+    ({'task': 'find_venue', 'filters': {'location': 'Delhi', 'capacity': 500}},
+     {'task': 'find_venue', 'filters': {'location': 'Delhi', 'capacity': 500}}),
+    ({'task': 'find_venue', 'filters': {'capacity': '500', 'price_max': 1500.0}},
+     {'task': 'find_venue', 'filters': {'capacity': 500, 'price_max': 1500}}),
+    ({'task': 'find_planner', 'filters': {'style': 'Luxury', 'budget_max': 1000000}},
+     {'task': 'find_planner', 'filters': {'style': 'luxury', 'budget_max': 1000000}}),
+    # Undeclared and null filters are dropped
+    ({'task': 'find_planner', 'filters': {'location': 'Mumbai', 'capacity': 500, 'style': None}},
+     {'task': 'find_planner', 'filters': {'location': 'Mumbai'}}),
+    ({'task': 'find_venue'}, {'task': 'find_venue', 'filters': {}}),
+    # Values that can't be read as their type
+    ({'task': 'find_venue', 'filters': {'capacity': 'five hundred'}}, None),
+    ({'task': 'find_venue', 'filters': {'capacity': 500.5}}, None),
+    ({'task': 'find_venue', 'filters': {'capacity': True}}, None),
+    ({'task': 'find_venue', 'filters': {'location': 5}}, None),
+    ({'task': 'find_venue', 'filters': {'location': ['Delhi']}}, None),
+    ({'task': 'find_planner', 'filters': {'style': 'rustic'}}, None),
+    ({'task': 'find_venue', 'filters': ['Delhi']}, None),
+    ({'task': 'find_caterer', 'filters': {}}, None),
+]
+
+
+@pytest.mark.parametrize('reply, expected', CASES)
+def test_extract_task(reply, expected):
+    task, outcome = extract_task(json.dumps(reply))
+    assert task == expected
+    assert outcome == ('json' if expected else 'failed')
+
+
+def test_recovers_fenced_task():
+    text = 'Sure!\n```json\n{"task": "find_venue", "filters": {"capacity": "300"}}\n```'
+    assert extract_task(text) == ({'task': 'find_venue', 'filters': {'capacity': 300}}, 'recovered')
+
+
+class FunctionCall:
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+
+class Part:
+    def __init__(self, function_call):
+        self.function_call = function_call
+        self.text = ''
+
+
+def test_bad_function_call_counts_as_failed():
+    before = tasks.stats()['replies'].get('failed', 0)
+    assert tasks.parse_reply([Part(FunctionCall('find_venue', {'capacity': 'lots'}))], '') is None
+    assert tasks.stats()['replies']['failed'] == before + 1
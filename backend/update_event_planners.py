@@ -1,6 +1,7 @@
 from pymongo import MongoClient
 import os
 from dotenv import load_dotenv
+from cities import add_city_key
 
 # Load environment variables
 load_dotenv()
@@ -129,6 +130,6 @@ event_planners = [
 
 # Drop existing collection and insert new data
 event_planners_collection.drop()
-event_planners_collection.insert_many(event_planners)
+event_planners_collection.insert_many([add_city_key(planner, 'city') for planner in event_planners])
 
 print("Event planners data updated successfully!")
\ No newline at end of file
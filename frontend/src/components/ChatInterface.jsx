@@ -14,6 +14,8 @@ function ChatInterface() {
   const [isOpen, setIsOpen] = useState(true);
   const [isMobile, setIsMobile] = useState(false);
   const messagesEndRef = useRef(null);
+  // Session id issued by the backend, so each browser tab keeps its own history
+  const sessionIdRef = useRef(sessionStorage.getItem('dwedSessionId'));
 
   // Check screen size
   useEffect(() => {
@@ -72,37 +74,91 @@ What would you like to know about?`
     setIsLoading(true);
 
     try {
-      // Send request to backend
-      const response = await fetch('http://127.0.0.1:5000/api/chat', {
+      // Send request to backend; the reply arrives as Server-Sent Events
+      const response = await fetch('http://127.0.0.1:5000/api/chat/stream', {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
+          ...(sessionIdRef.current && { 'X-Session-Id': sessionIdRef.current }),
         },
         body: JSON.stringify({ message: currentInput }),
       });
 
+      const newSessionId = response.headers.get('X-Session-Id');
+      if (newSessionId) {
+        sessionIdRef.current = newSessionId;
+        sessionStorage.setItem('dwedSessionId', newSessionId);
+      }
+
       if (!response.ok) {
-        throw new Error('Failed to get response from server');
+        // Overload and upstream outages come back with a message meant for the user
+        const body = await response.json().catch(() => ({}));
+        const error = new Error(body.error || 'Failed to get response from server');
+        error.userMessage = body.retry_after ? body.error : null;
+        throw error;
       }
 
-      const data = await response.json();
-      
-      // Add bot response to messages
-      if (data.type === 'venues') {
-        setMessages(prev => [...prev, { sender: 'venues', content: data.data }]);
-        setTimeout(scrollToBottom, 150);
-      } else if (data.type === 'event_planners') {
-        setMessages(prev => [...prev, { sender: 'event_planners', content: data.data }]);
-        setTimeout(scrollToBottom, 150);
-      } else if (data.type === 'text') {
-        setMessages(prev => [...prev, { sender: 'bot', content: data.data }]);
-        setTimeout(scrollToBottom, 50);
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      let streamedText = null;
+
+      const handleEvent = (event, data) => {
+        if (event === 'token') {
+          // Show text as it is generated, growing a single bot message
+          setIsLoading(false);
+          if (streamedText === null) {
+            streamedText = data.text;
+            setMessages(prev => [...prev, { sender: 'bot', content: streamedText }]);
+          } else {
+            streamedText += data.text;
+            const content = streamedText;
+            setMessages(prev => [...prev.slice(0, -1), { sender: 'bot', content }]);
+          }
+          scrollToBottom();
+        } else if (event === 'result') {
+          // Add bot response to messages
+          if (data.type === 'venues') {
+            setMessages(prev => [...prev, { sender: 'venues', content: data.data, nextCursor: data.next_cursor }]);
+            setTimeout(scrollToBottom, 150);
+          } else if (data.type === 'event_planners') {
+            setMessages(prev => [...prev, { sender: 'event_planners', content: data.data, nextCursor: data.next_cursor }]);
+            setTimeout(scrollToBottom, 150);
+          } else if (data.type === 'text' && streamedText === null) {
+            setMessages(prev => [...prev, { sender: 'bot', content: data.data }]);
+            setTimeout(scrollToBottom, 50);
+          }
+        } else if (event === 'error') {
+          const error = new Error(data.error);
+          error.userMessage = data.retry_after ? data.error : null;
+          throw error;
+        }
+      };
+
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        // Events are separated by a blank line
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+          const rawEvent = buffer.slice(0, boundary);
+          buffer = buffer.slice(boundary + 2);
+          let event = 'message';
+          let data = '';
+          rawEvent.split('\n').forEach(line => {
+            if (line.startsWith('event: ')) event = line.slice(7);
+            else if (line.startsWith('data: ')) data += line.slice(6);
+          });
+          handleEvent(event, data ? JSON.parse(data) : {});
+        }
       }
     } catch (error) {
       console.error('Error:', error);
       setMessages(prev => [...prev, { 
         sender: 'bot', 
-        content: 'Sorry, I encountered an error. Please make sure the backend server is running.' 
+        content: error.userMessage || 'Sorry, I encountered an error. Please make sure the backend server is running.' 
       }]);
     } finally {
       setIsLoading(false);
@@ -1,10 +1,50 @@
-import React from 'react';
+import React, { useState } from 'react';
 import { motion } from 'framer-motion';
 import { messageItemVariants } from '../styles/motionVariants';
 import VenueCard from './VenueCard';
 import EventPlannerCard from './EventPlannerCard';
 
+// Follow-up pages of a search, fetched with the cursor the previous page returned
+const PAGE_URLS = {
+  venues: 'http://127.0.0.1:5000/api/venues',
+  event_planners: 'http://127.0.0.1:5000/api/planners'
+};
+
 function ChatMessage({ message }) {
+  const [moreResults, setMoreResults] = useState([]);
+  const [cursor, setCursor] = useState(message.nextCursor || null);
+  const [loadingMore, setLoadingMore] = useState(false);
+
+  const loadMore = async () => {
+    setLoadingMore(true);
+    try {
+      const response = await fetch(`${PAGE_URLS[message.sender]}?cursor=${encodeURIComponent(cursor)}`);
+      const data = await response.json();
+      if (!response.ok) {
+        throw new Error(data.error || 'Failed to load more results');
+      }
+      setMoreResults(prev => [...prev, ...data.data]);
+      setCursor(data.next_cursor);
+    } catch (error) {
+      console.error('Error loading more results:', error);
+      setCursor(null);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  const showMoreButton = cursor && (
+    <motion.button
+      whileHover={{ scale: 1.02 }}
+      whileTap={{ scale: 0.98 }}
+      onClick={loadMore}
+      disabled={loadingMore}
+      className="justify-self-start px-4 py-2 rounded-full border border-[#6f4465] text-[#6f4465] text-sm hover:bg-[#6f4465] hover:text-white transition-colors duration-200 disabled:opacity-50"
+    >
+      {loadingMore ? 'Loading...' : 'Show more'}
+    </motion.button>
+  );
+
   // User message - right aligned
   if (message.sender === 'user') {
     return (
@@ -120,9 +160,10 @@ function ChatMessage({ message }) {
         exit={{ opacity: 0, y: -20 }}
         className="grid grid-cols-1 gap-4"
       >
-        {message.content.map((venue, index) => (
+        {[...message.content, ...moreResults].map((venue, index) => (
           <VenueCard key={venue._id || index} venue={venue} />
         ))}
+        {showMoreButton}
       </motion.div>
     );
   }
@@ -169,9 +210,10 @@ function ChatMessage({ message }) {
         exit={{ opacity: 0, y: -20 }}
         className="grid grid-cols-1 gap-4"
       >
-        {message.content.map((eventPlanner, index) => (
+        {[...message.content, ...moreResults].map((eventPlanner, index) => (
           <EventPlannerCard key={eventPlanner._id || index} eventPlanner={eventPlanner} />
         ))}
+        {showMoreButton}
       </motion.div>
     );
   }
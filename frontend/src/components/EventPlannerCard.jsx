@@ -9,6 +9,8 @@ function EventPlannerCard({ eventPlanner }) {
   const [showAbout, setShowAbout] = useState(false);
   const [showContact, setShowContact] = useState(false);
   const [showPortfolio, setShowPortfolio] = useState(false);
+  // Search results are card-sized; the full planner is fetched the first time it is expanded
+  const [details, setDetails] = useState(null);
 
   // Auto-open first section on mount
   useEffect(() => {
@@ -20,6 +22,22 @@ function EventPlannerCard({ eventPlanner }) {
 
   if (!eventPlanner) return null;
 
+  const fullPlanner = details || eventPlanner;
+
+  const toggleExpanded = async () => {
+    setIsExpanded(!isExpanded);
+    if (!details && eventPlanner._id) {
+      try {
+        const response = await fetch(`http://127.0.0.1:5000/api/planners/${eventPlanner._id}`);
+        if (response.ok) {
+          setDetails(await response.json());
+        }
+      } catch (error) {
+        console.error('Error loading event planner details:', error);
+      }
+    }
+  };
+
   // Generate event planner ID from name
   const plannerId = eventPlanner.name.toLowerCase().replace(/\s+/g, '-').replace(/[^a-z0-9-]/g, '');
 
@@ -38,7 +56,7 @@ function EventPlannerCard({ eventPlanner }) {
           {eventPlanner.name}
         </h3>
         <Button
-          onClick={() => setIsExpanded(!isExpanded)}
+          onClick={toggleExpanded}
           variant="outline"
           size="sm"
           className="hover:bg-muted px-3"
@@ -145,11 +163,11 @@ function EventPlannerCard({ eventPlanner }) {
                     >
                       <div className="space-y-2">
                         {/* Services */}
-                        {eventPlanner.services && eventPlanner.services.amenities && eventPlanner.services.amenities.length > 0 && (
+                        {fullPlanner.services && fullPlanner.services.amenities && fullPlanner.services.amenities.length > 0 && (
                           <div>
                             <h5 className="text-sm font-medium text-foreground mb-1">Services:</h5>
                             <div className="grid grid-cols-2 md:grid-cols-3 gap-1">
-                              {eventPlanner.services.amenities.map((service, index) => (
+                              {fullPlanner.services.amenities.map((service, index) => (
                                 <motion.div
                                   key={index}
                                   initial={{ opacity: 0, scale: 0.9 }}
@@ -165,11 +183,11 @@ function EventPlannerCard({ eventPlanner }) {
                         )}
 
                         {/* Event Types */}
-                        {eventPlanner.event_types && eventPlanner.event_types.length > 0 && (
+                        {fullPlanner.event_types && fullPlanner.event_types.length > 0 && (
                           <div>
                             <h5 className="text-sm font-medium text-foreground mb-1">Event Types:</h5>
                             <div className="flex flex-wrap gap-1">
-                              {eventPlanner.event_types.map((eventType, index) => (
+                              {fullPlanner.event_types.map((eventType, index) => (
                                 <motion.span
                                   key={index}
                                   initial={{ opacity: 0, scale: 0.8 }}
@@ -216,16 +234,16 @@ function EventPlannerCard({ eventPlanner }) {
                     >
                       <div className="bg-secondary/10 backdrop-blur-sm rounded-md p-3 border border-secondary/20">
                         <p className="text-sm text-black leading-relaxed">
-                          {eventPlanner.description || "Professional event planning company with extensive experience in organizing memorable events and celebrations."}
+                          {fullPlanner.description || "Professional event planning company with extensive experience in organizing memorable events and celebrations."}
                         </p>
-                        {eventPlanner.services && (
+                        {fullPlanner.services && (
                           <div className="mt-3">
                             <h6 className="text-xs font-semibold text-foreground mb-1">Key Services:</h6>
                             <ul className="text-xs text-black space-y-1">
-                              {eventPlanner.services.decor && <li>• {eventPlanner.services.decor}</li>}
-                              {eventPlanner.services.catering && <li>• {eventPlanner.services.catering}</li>}
-                              {eventPlanner.services.entertainment && <li>• {eventPlanner.services.entertainment}</li>}
-                              {eventPlanner.services.photography && <li>• {eventPlanner.services.photography}</li>}
+                              {fullPlanner.services.decor && <li>• {fullPlanner.services.decor}</li>}
+                              {fullPlanner.services.catering && <li>• {fullPlanner.services.catering}</li>}
+                              {fullPlanner.services.entertainment && <li>• {fullPlanner.services.entertainment}</li>}
+                              {fullPlanner.services.photography && <li>• {fullPlanner.services.photography}</li>}
                             </ul>
                           </div>
                         )}
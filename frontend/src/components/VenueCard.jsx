@@ -9,9 +9,27 @@ function VenueCard({ venue }) {
   const [showAbout, setShowAbout] = useState(false);
   const [showContact, setShowContact] = useState(false);
   const [showPolicies, setShowPolicies] = useState(false);
+  // Search results are card-sized; the full venue is fetched the first time it is expanded
+  const [details, setDetails] = useState(null);
 
   if (!venue) return null;
 
+  const fullVenue = details || venue;
+
+  const toggleExpanded = async () => {
+    setIsExpanded(!isExpanded);
+    if (!details && venue._id) {
+      try {
+        const response = await fetch(`http://127.0.0.1:5000/api/venues/${venue._id}`);
+        if (response.ok) {
+          setDetails(await response.json());
+        }
+      } catch (error) {
+        console.error('Error loading venue details:', error);
+      }
+    }
+  };
+
   // Generate venue ID from name
   const venueId = venue.name.toLowerCase().replace(/\s+/g, '-').replace(/[^a-z0-9-]/g, '');
 
@@ -30,7 +48,7 @@ function VenueCard({ venue }) {
           {venue.name}
         </h3>
         <Button
-          onClick={() => setIsExpanded(!isExpanded)}
+          onClick={toggleExpanded}
           variant="outline"
           size="sm"
           className="hover:bg-muted px-3"
@@ -78,22 +96,22 @@ function VenueCard({ venue }) {
             Capacity
           </h4>
           <div className="space-y-1">
-            {venue.banquets && venue.banquets.length > 0 && venue.banquets.slice(0, 1).map((banquet, index) => (
-              <div key={index}>
-                {banquet.sitting_capacity && (
+            {venue.best_hall && (
+              <div>
+                {venue.best_hall.sitting_capacity && (
                   <div className="flex items-center gap-1">
                     <span className="text-secondary text-xs">🪑</span>
-                    <span className="text-xs text-foreground">Sitting: <span className="font-medium text-foreground">{banquet.sitting_capacity}</span></span>
+                    <span className="text-xs text-foreground">Sitting: <span className="font-medium text-foreground">{venue.best_hall.sitting_capacity}</span></span>
                   </div>
                 )}
-                {banquet.floating_space && (
+                {venue.best_hall.floating_space && (
                   <div className="flex items-center gap-1">
                     <span className="text-accent text-xs">🌊</span>
-                    <span className="text-xs text-foreground">Standing: <span className="font-medium text-foreground">{banquet.floating_space}</span></span>
+                    <span className="text-xs text-foreground">Standing: <span className="font-medium text-foreground">{venue.best_hall.floating_space}</span></span>
                   </div>
                 )}
               </div>
-            ))}
+            )}
           </div>
         </div>
 
@@ -158,11 +176,11 @@ function VenueCard({ venue }) {
                     >
                       <div className="space-y-2">
                         {/* Facilities */}
-                        {venue.facilities && venue.facilities.amenities && venue.facilities.amenities.length > 0 && (
+                        {fullVenue.facilities && fullVenue.facilities.amenities && fullVenue.facilities.amenities.length > 0 && (
                           <div>
                             <h5 className="text-sm font-medium text-foreground mb-1">Facilities:</h5>
                             <div className="grid grid-cols-2 md:grid-cols-3 gap-1">
-                              {venue.facilities.amenities.map((facility, index) => (
+                              {fullVenue.facilities.amenities.map((facility, index) => (
                                 <motion.div
                                   key={index}
                                   initial={{ opacity: 0, scale: 0.9 }}
@@ -178,11 +196,11 @@ function VenueCard({ venue }) {
                         )}
 
                         {/* Amenities */}
-                        {venue.facilities && venue.facilities.amenities && venue.facilities.amenities.length > 0 && (
+                        {fullVenue.facilities && fullVenue.facilities.amenities && fullVenue.facilities.amenities.length > 0 && (
                           <div>
                             <h5 className="text-sm font-medium text-foreground mb-1">Amenities:</h5>
                             <div className="flex flex-wrap gap-1">
-                              {venue.facilities.amenities.map((amenity, index) => (
+                              {fullVenue.facilities.amenities.map((amenity, index) => (
                                 <motion.span
                                   key={index}
                                   initial={{ opacity: 0, scale: 0.8 }}
@@ -229,16 +247,16 @@ function VenueCard({ venue }) {
                     >
                       <div className="bg-secondary/10 backdrop-blur-sm rounded-md p-3 border border-secondary/20">
                         <p className="text-sm text-foreground leading-relaxed">
-                          {venue.description || "This premium wedding venue offers world-class facilities and exceptional service for your special day. With modern amenities and elegant spaces, we ensure your celebration is memorable and flawless."}
+                          {fullVenue.description || "This premium wedding venue offers world-class facilities and exceptional service for your special day. With modern amenities and elegant spaces, we ensure your celebration is memorable and flawless."}
                         </p>
-                        {venue.facilities && (
+                        {fullVenue.facilities && (
                           <div className="mt-3">
                             <h6 className="text-xs font-semibold text-foreground mb-1">Key Features:</h6>
                             <ul className="text-xs text-foreground space-y-1">
-                              {venue.facilities.parking && <li>• {venue.facilities.parking}</li>}
-                              {venue.facilities.catering && <li>• {venue.facilities.catering}</li>}
-                              {venue.facilities.decor && <li>• {venue.facilities.decor}</li>}
-                              {venue.facilities.rooms && <li>• {venue.facilities.rooms}</li>}
+                              {fullVenue.facilities.parking && <li>• {fullVenue.facilities.parking}</li>}
+                              {fullVenue.facilities.catering && <li>• {fullVenue.facilities.catering}</li>}
+                              {fullVenue.facilities.decor && <li>• {fullVenue.facilities.decor}</li>}
+                              {fullVenue.facilities.rooms && <li>• {fullVenue.facilities.rooms}</li>}
                             </ul>
                           </div>
                         )}